@@ -41,5 +41,15 @@ setup(
 
     packages=['thorlabs_mtd415t'],
 
-    install_requires=required
+    install_requires=required,
+
+    extras_require={
+        'numpy': ['numpy'],
+    },
+
+    entry_points={
+        'console_scripts': [
+            'mtd415t=thorlabs_mtd415t.cli:main',
+        ],
+    }
 )
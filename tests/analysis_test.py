@@ -0,0 +1,132 @@
+import math
+
+from pytest import approx, importorskip, raises
+
+np = importorskip('numpy')
+
+from thorlabs_mtd415t import analysis  # noqa: E402
+from thorlabs_mtd415t.reading import ReadingArray  # noqa: E402
+
+
+def relay_test(relay_amplitude=1.0, gain=15.0, time_constant=30.0,
+               dead_time=2.0, dt=0.1, duration=1200):
+    # first-order load with dead time under relay feedback
+    decay = math.exp(-dt / time_constant)
+    delayed = [0.0] * int(round(dead_time / dt))
+
+    times = np.arange(int(duration / dt)) * dt
+    temp, current = np.empty(len(times)), np.empty(len(times))
+    value = 0.0
+    for idx in range(len(times)):
+        output = relay_amplitude if value < 0 else -relay_amplitude
+        delayed.append(output)
+        value = value * decay + gain * (1 - decay) * delayed.pop(0)
+        temp[idx], current[idx] = value + 22, output
+
+    return times, temp, current
+
+
+def step_test(gain=15.0, time_constant=30.0, dead_time=2.0, dt=0.1,
+              duration=600):
+    times = np.arange(int(duration / dt)) * dt
+    current = np.where(times >= 10, 1.0, 0.0)
+
+    elapsed = np.clip(times - 10 - dead_time, 0, None)
+    temp = 22 + gain * (1 - np.exp(-elapsed / time_constant))
+
+    return times, temp, current
+
+
+# .zero_crossing_period
+def test_it_returns_period_from_zero_crossings():
+    times = np.arange(0, 200, 0.01)
+    values = np.sin(2 * np.pi * times / 7) + 0.05 * times
+
+    assert analysis.zero_crossing_period(times, values) == approx(7, rel=1e-3)
+
+
+def test_it_ignores_noise_at_zero_crossings():
+    times = np.arange(0, 200, 0.01)
+    values = np.sin(2 * np.pi * times / 7) + \
+        0.02 * np.random.RandomState(0).randn(len(times))
+
+    assert analysis.zero_crossing_period(times, values) == approx(7, rel=1e-2)
+
+
+def test_it_returns_none_without_oscillation():
+    times = np.arange(0, 10, 0.01)
+
+    assert analysis.zero_crossing_period(times, times) is None
+
+
+# .fft_period
+def test_it_returns_period_from_spectrum():
+    times = np.arange(0, 200, 0.01)
+    values = np.sin(2 * np.pi * times / 7)
+
+    assert analysis.fft_period(times, values) == approx(7, rel=1e-3)
+
+
+def test_it_resamples_uneven_times():
+    times = np.sort(np.random.RandomState(0).uniform(0, 200, 20000))
+    values = np.sin(2 * np.pi * times / 7)
+
+    assert analysis.fft_period(times, values) == approx(7, rel=1e-2)
+
+
+# .analyze_relay
+def test_it_estimates_critical_values_from_relay_test():
+    times, temp, current = relay_test()
+    result = analysis.analyze_relay(times, temp, current, settle=100)
+
+    assert result.period_zero_crossing == approx(8.0, rel=1e-2)
+    assert result.period_fft == approx(8.0, rel=2e-2)
+    assert result.relay_amplitude == approx(1.0)
+    assert result.critical_gain == approx(4 / (math.pi * result.amplitude))
+
+
+def test_it_accepts_reading_arrays():
+    times, temp, current = relay_test()
+    readings = ReadingArray('Te', '° C')
+    for timestamp, value in zip(times, temp):
+        readings.append_raw(int(round(value * 1e3)), timestamp)
+
+    result = analysis.analyze_relay(readings, readings, relay_amplitude=1.0,
+                                    settle=100)
+
+    assert result.critical_period == approx(8.0, rel=1e-2)
+
+
+def test_it_returns_config_ready_to_write():
+    times, temp, current = relay_test()
+    config = analysis.analyze_relay(times, temp, current, settle=100).config()
+
+    assert sorted(config) == ['critical_gain', 'critical_period']
+    assert config['critical_period'] == round(config['critical_period'], 3)
+
+
+def test_it_requires_relay_amplitude():
+    times, temp, _ = relay_test(duration=100)
+
+    with raises(ValueError):
+        analysis.analyze_relay(times, temp)
+
+
+# .analyze_step
+def test_it_estimates_model_from_step_test():
+    times, temp, current = step_test()
+    result = analysis.analyze_step(times, temp, current)
+
+    assert result.process_gain == approx(15.0, rel=1e-2)
+    assert result.time_constant == approx(30.0, rel=2e-2)
+    assert result.dead_time == approx(2.0, abs=0.2)
+    assert result.critical_period == approx(7.8, rel=5e-2)
+    assert result.critical_gain == approx(1.6, rel=5e-2)
+
+
+def test_it_raises_value_error_without_step():
+    times = np.arange(0, 100, 0.1)
+
+    with raises(ValueError):
+        analysis.analyze_step(times, np.zeros(len(times)),
+                              np.zeros(len(times)))
@@ -0,0 +1,164 @@
+import io
+import json
+import struct
+
+from thorlabs_mtd415t import MTD415TDevice, cli
+from pytest import fixture, mark, raises
+from support import MockSerial
+
+
+@fixture
+def mock_serial(monkeypatch):
+    mock_serial = MockSerial('loop://', 115200)
+
+    def open_device(port, timeout):
+        device = MTD415TDevice('loop://')
+        device._serial = mock_serial
+
+        return device
+
+    monkeypatch.setattr(cli, '_open_device', open_device)
+
+    return mock_serial
+
+
+def run(*argv):
+    out = io.StringIO()
+    status = cli.main(list(argv), out)
+
+    return status, out.getvalue()
+
+
+# status
+def test_it_prints_status(mock_serial):
+    mock_serial.in_buffer.extend(reversed(
+        ['MTD415T\n', 'ABC\n', '15020\n', '15000\n', '120\n', '350\n',
+         '0\n']))
+    status, output = run('status', '/dev/ttyUSB0')
+
+    assert status == 0
+    assert output == ('/dev/ttyUSB0\n  idn: MTD415T\n  uid: ABC\n'
+                      '  temp: 15.02\n  temp_setpoint: 15.0\n'
+                      '  tec_current: 0.12\n  tec_voltage: 0.35\n'
+                      '  errors: -\n')
+
+
+def test_it_prints_status_as_json(mock_serial):
+    mock_serial.in_buffer.extend(reversed(
+        ['MTD415T\n', 'ABC\n', '15020\n', '15000\n', '120\n', '350\n',
+         '1\n']))
+    status, output = run('status', '/dev/ttyUSB0', '--json')
+
+    assert json.loads(output)['errors'] == ['not enabled']
+
+
+# get
+def test_it_prints_settings(mock_serial):
+    mock_serial.in_buffer.extend(reversed(['15020\n', '10\n']))
+    status, output = run('get', '/dev/ttyUSB0', 'temp', 'status_delay')
+
+    assert output == 'temp: 15.02\nstatus_delay: 10\n'
+
+
+# set
+def test_it_writes_settings(mock_serial):
+    mock_serial.in_buffer.extend(('\n', '\n', '\n'))
+    run('set', '/dev/ttyUSB0', 'temp_setpoint=15.025', 'status_delay=10',
+        '--save')
+
+    assert mock_serial.out_buffer == [b'T15025\n', b'd10\n', b'M\n']
+
+
+def test_it_rejects_unknown_setting(mock_serial):
+    status, output = run('set', '/dev/ttyUSB0', 'temp=15')
+
+    assert status == 1
+    assert mock_serial.out_buffer == []
+
+
+# apply-config
+def test_it_applies_config(mock_serial, tmpdir):
+    path = tmpdir.join('config.json')
+    path.write(json.dumps({'p_gain': 1.5, 'i_gain': 0.1}))
+    mock_serial.in_buffer.extend(('\n', '\n', '\n'))
+    run('apply-config', '/dev/ttyUSB0', '--config', str(path))
+
+    assert mock_serial.out_buffer == [b'I100\n', b'P1500\n', b'M\n']
+
+
+# monitor
+def test_it_streams_csv(mock_serial):
+    mock_serial.in_buffer.extend(reversed(['15020\n', '120\n', '15030\n',
+                                           '130\n']))
+    out = io.BytesIO()
+    cli.main(['monitor', '/dev/ttyUSB0', '--interval', '0', '--count', '2'],
+             out)
+    lines = out.getvalue().decode('utf-8').splitlines()
+
+    assert lines[0] == 'time,port,temp,tec_current'
+    assert [line.split(',', 1)[1] for line in lines[1:]] == \
+        ['/dev/ttyUSB0,15.02,0.12', '/dev/ttyUSB0,15.03,0.13']
+
+
+def test_it_streams_json_lines(mock_serial):
+    mock_serial.in_buffer.append('15020\n')
+    out = io.BytesIO()
+    cli.main(['monitor', '/dev/ttyUSB0', '--settings', 'temp', '--count',
+              '1', '--format', 'jsonl'], out)
+    row = json.loads(out.getvalue().decode('utf-8'))
+
+    assert (row['port'], row['temp']) == ('/dev/ttyUSB0', 15.02)
+
+
+def test_it_streams_binary_records(mock_serial):
+    mock_serial.in_buffer.extend(reversed(['15020\n', '-120\n']))
+    out = io.BytesIO()
+    cli.main(['monitor', '/dev/ttyUSB0', '--count', '1', '--format',
+              'binary'], out)
+    index, timestamp, temp, current = struct.unpack('<Hdii', out.getvalue())
+
+    assert (index, temp, current) == (0, 15020, -120)
+
+
+def test_it_skips_failed_samples(mock_serial, capsys):
+    # no response to the second sample
+    mock_serial.in_buffer.extend(reversed(['15020\n', '', '15030\n']))
+    out = io.BytesIO()
+    cli.main(['monitor', '/dev/ttyUSB0', '--settings', 'temp', '--interval',
+              '0', '--count', '3'], out)
+    lines = out.getvalue().decode('utf-8').splitlines()
+
+    assert [line.split(',', 2)[2] for line in lines[1:]] == \
+        ['15.02', '15.03']
+    assert '1 failed samples skipped' in capsys.readouterr().err
+
+
+@mark.parametrize('settings', ['tmp', 'temp,errors'])
+def test_it_rejects_unknown_monitor_settings(mock_serial, capsys, settings):
+    with raises(SystemExit) as e:
+        cli.main(['monitor', '/dev/ttyUSB0', '--settings', settings,
+                  '--count', '1'], io.BytesIO())
+
+    assert e.value.code == 2
+    assert 'invalid setting' in capsys.readouterr().err
+    assert mock_serial.out_buffer == []
+
+
+def test_it_reads_monitor_settings_in_single_batch(mock_serial):
+    mock_serial.in_buffer.extend(reversed(['15020\n', '120\n']))
+    cli.main(['monitor', '/dev/ttyUSB0', '--count', '1'], io.BytesIO())
+
+    assert mock_serial.out_buffer == [b'Te?\nA?\n']
+
+
+# provision
+def test_it_prints_provisioning_report(mock_serial, tmpdir):
+    path = tmpdir.join('config.json')
+    path.write(json.dumps({'i_gain': 0.2}))
+    mock_serial.in_buffer.extend(reversed(['ABC\n', '100\n', '\n', '\n',
+                                           '200\n']))
+    status, output = run('provision', '/dev/ttyUSB0', '--config', str(path))
+
+    assert status == 0
+    assert output == ('/dev/ttyUSB0 (ABC): 1 changed, 0 unchanged, ok\n'
+                      '  i_gain: 0.1 -> 0.2\n')
@@ -3,3 +3,15 @@ import os
 
 current_path = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, os.path.join(current_path, '..'))
+
+from thorlabs_mtd415t import MTD415TDevice  # noqa: E402
+from pytest import fixture  # noqa: E402
+from support import MockSerial  # noqa: E402
+
+
+@fixture
+def mtd415t_device_with_mock_serial():
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = MockSerial('/dev/ttyUSB0', 115200)
+
+    return mtd415t, mtd415t._serial
@@ -0,0 +1,115 @@
+from thorlabs_mtd415t.control import ControlLoop, Histogram
+from pytest import raises
+
+
+# .run
+def test_it_sends_setpoint_and_reads_in_one_batch(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('0\n15020\n120\n')
+    loop = ControlLoop(mtd415t, lambda readings: 20.5, rate=100)
+    loop.run(iterations=1)
+
+    assert mock_serial.out_buffer == [b'T20500\nTe?\nA?\n']
+
+
+def test_it_passes_readings_to_callback(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(('15030\n130\n', '15020\n120\n'))
+    calls = []
+    loop = ControlLoop(mtd415t, lambda readings: calls.append(readings),
+                       rate=100)
+    loop.run(iterations=2)
+
+    assert calls == [{}, {'temp': 15.02, 'tec_current': 0.12}]
+    assert loop.readings == {'temp': 15.03, 'tec_current': 0.13}
+
+
+def test_it_does_not_save_setpoint(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.auto_save = True
+    mock_serial.in_buffer.append('0\n15020\n120\n')
+    loop = ControlLoop(mtd415t, lambda readings: 20.5, rate=100)
+    loop.run(iterations=1)
+
+    assert b'M\n' not in mock_serial.out_buffer
+
+
+def test_it_counts_failed_reads(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('unknown command\n120\n')
+    loop = ControlLoop(mtd415t, lambda readings: None, rate=100)
+    loop.run(iterations=1)
+
+    assert loop.readings == {'temp': None, 'tec_current': 0.12}
+    assert loop.stats.errors == 1
+
+
+def test_it_counts_timeouts_as_errors(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.timeout = 0.001
+    loop = ControlLoop(mtd415t, lambda readings: None, rate=100)
+    loop.run(iterations=1)
+
+    assert loop.stats.errors == 1
+
+
+def test_it_records_iteration_statistics(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(['15020\n120\n'] * 5)
+    loop = ControlLoop(mtd415t, lambda readings: None, rate=200)
+    loop.run(iterations=5)
+
+    assert loop.stats.iterations == 5
+    assert loop.stats.jitter.count == 5
+    assert loop.stats.latency.count == 5
+
+
+def test_it_counts_deadline_misses(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(['15020\n120\n'] * 2)
+    loop = ControlLoop(mtd415t, lambda readings: sum(range(100000)) and None,
+                       rate=1e5)
+    loop.run(iterations=2)
+
+    assert loop.stats.deadline_misses == 2
+    assert loop.stats.skipped >= 2
+
+
+def test_it_rejects_unknown_reads(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    with raises(ValueError):
+        ControlLoop(mtd415t, lambda readings: None, rate=1, reads=('uid',))
+
+
+def test_it_rejects_invalid_setpoint(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    loop = ControlLoop(mtd415t, lambda readings: 50, rate=100)
+
+    with raises(ValueError):
+        loop.run(iterations=1)
+
+
+# Histogram
+def test_it_estimates_percentiles():
+    histogram = Histogram(edges=(1, 2, 3))
+    for value in (0.5, 0.5, 1.5, 2.5):
+        histogram.add(value)
+
+    assert (histogram.percentile(50), histogram.percentile(100)) == (1, 3)
+
+
+def test_it_returns_maximum_for_overflow_bin():
+    histogram = Histogram(edges=(1,))
+    histogram.add(5)
+
+    assert histogram.percentile(99) == 5
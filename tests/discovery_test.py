@@ -0,0 +1,87 @@
+from thorlabs_mtd415t import discovery
+from thorlabs_mtd415t.discovery import IdentityCache, discover, probe
+from pytest import fixture
+
+
+@fixture
+def ports(monkeypatch):
+    candidates = [('/dev/ttyUSB0', 'A1'), ('/dev/ttyUSB1', 'B2'),
+                  ('/dev/ttyS0', None)]
+    identities = {
+        '/dev/ttyUSB0': ('MTD415T FW0.6.8', 'ABC'),
+        '/dev/ttyUSB1': ('MTD415T FW0.6.8', 'DEF'),
+        '/dev/ttyS0': None
+    }
+    probed = []
+
+    def fake_probe(port, timeout=0.5):
+        probed.append(port)
+        return identities[port]
+
+    monkeypatch.setattr(discovery, 'candidate_ports', lambda: candidates)
+    monkeypatch.setattr(discovery, 'probe', fake_probe)
+
+    return probed
+
+
+# .probe
+def test_it_returns_none_for_port_without_response():
+    assert probe('loop://', timeout=0.01) is None
+
+
+# .discover
+def test_it_returns_ports_by_uid(ports):
+    assert discover() == {'ABC': '/dev/ttyUSB0', 'DEF': '/dev/ttyUSB1'}
+
+
+def test_it_probes_all_candidate_ports(ports):
+    discover()
+
+    assert sorted(ports) == ['/dev/ttyS0', '/dev/ttyUSB0', '/dev/ttyUSB1']
+
+
+def test_it_probes_given_ports_only(ports):
+    discover(ports=['/dev/ttyUSB1'])
+
+    assert ports == ['/dev/ttyUSB1']
+
+
+def test_it_writes_identity_cache(ports, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    discover(cache_path=path)
+
+    cache = IdentityCache(path)
+
+    assert cache.get('/dev/ttyUSB0', 'A1') == ('MTD415T FW0.6.8', 'ABC')
+
+
+def test_it_does_not_probe_cached_ports(ports, tmpdir):
+    path = str(tmpdir.join('cache.json'))
+    discover(cache_path=path)
+    del ports[:]
+
+    result = discover(cache_path=path)
+
+    assert ports == ['/dev/ttyS0']
+    assert result == {'ABC': '/dev/ttyUSB0', 'DEF': '/dev/ttyUSB1'}
+
+
+# IdentityCache
+def test_it_ignores_missing_cache_file(tmpdir):
+    cache = IdentityCache(str(tmpdir.join('missing.json')))
+
+    assert cache.get('/dev/ttyUSB0', 'A1') is None
+
+
+def test_it_does_not_return_cached_identity_without_serial_number(tmpdir):
+    cache = IdentityCache(str(tmpdir.join('cache.json')))
+    cache.set('/dev/ttyS0', None, 'MTD415T', 'ABC')
+
+    assert cache.get('/dev/ttyS0', None) is None
+
+
+def test_it_does_not_return_cached_identity_for_other_serial_number(tmpdir):
+    cache = IdentityCache(str(tmpdir.join('cache.json')))
+    cache.set('/dev/ttyUSB0', 'A1', 'MTD415T', 'ABC')
+
+    assert cache.get('/dev/ttyUSB0', 'C3') is None
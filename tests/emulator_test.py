@@ -0,0 +1,85 @@
+from time import perf_counter
+
+from thorlabs_mtd415t import MTD415TDevice
+from thorlabs_mtd415t.emulator import EmulatedSerial
+from pytest import approx, fixture
+
+
+@fixture
+def emulated_mtd415t_device():
+    mtd415t = MTD415TDevice('loop://', timeout=0.5)
+    mtd415t._serial = EmulatedSerial(uid='ABC', idn='MTD415T FW0.6.8')
+
+    return mtd415t, mtd415t._serial
+
+
+# .write
+def test_it_answers_identity(emulated_mtd415t_device):
+    mtd415t, emulated_serial = emulated_mtd415t_device
+
+    assert mtd415t.idn == 'MTD415T FW0.6.8'
+    assert mtd415t.uid == 'ABC'
+
+
+def test_it_stores_set_values(emulated_mtd415t_device):
+    mtd415t, emulated_serial = emulated_mtd415t_device
+
+    mtd415t.temp_setpoint = 20.5
+    mtd415t.p_gain = 1.5
+
+    assert mtd415t.temp_setpoint == 20.5
+    assert mtd415t.p_gain == 1.5
+    assert emulated_serial.settings['T'] == 20500
+
+
+def test_it_saves_settings(emulated_mtd415t_device):
+    mtd415t, emulated_serial = emulated_mtd415t_device
+
+    mtd415t.temp_setpoint = 20.5
+    mtd415t.save()
+
+    assert emulated_serial.saved['T'] == 20500
+
+
+def test_it_answers_unknown_command(emulated_mtd415t_device):
+    mtd415t, emulated_serial = emulated_mtd415t_device
+
+    assert mtd415t.query('X') == b'unknown command\n'
+
+
+def test_it_answers_pipelined_commands_in_order(emulated_mtd415t_device):
+    mtd415t, emulated_serial = emulated_mtd415t_device
+
+    assert mtd415t.transact([b'T20000', b'T?', b'u?']) == \
+        [b'\n', b'20000\n', b'ABC\n']
+
+
+def test_it_approaches_setpoint():
+    emulated_serial = EmulatedSerial(ambient=22.0, time_constant=1e-3)
+    mtd415t = MTD415TDevice('loop://', timeout=0.5)
+    mtd415t._serial = emulated_serial
+
+    mtd415t.temp_setpoint = 20.0
+    start = perf_counter()
+    while perf_counter() - start < 0.02:
+        pass
+
+    assert mtd415t.temp == approx(20.0, abs=1e-3)
+
+
+# .read
+def test_it_returns_nothing_after_timeout():
+    emulated_serial = EmulatedSerial(timeout=0.01)
+
+    assert emulated_serial.read(10) == b''
+
+
+def test_it_delays_responses():
+    emulated_serial = EmulatedSerial(timeout=0.5, response_time=0.02)
+    emulated_serial.write(b'u?\n')
+
+    assert emulated_serial.in_waiting == 0
+
+    start = perf_counter()
+    assert emulated_serial.read(100) == b'EMU0000001\n'
+    assert perf_counter() - start >= 0.015
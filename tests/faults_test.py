@@ -0,0 +1,164 @@
+import sys
+from io import StringIO
+from time import perf_counter
+
+from thorlabs_mtd415t import MTD415TDevice, ResponseTimeoutError
+from thorlabs_mtd415t.emulator import EmulatedSerial
+from thorlabs_mtd415t.faults import (FaultInjectingSerial, main,
+                                     run_scenario)
+from pytest import mark, raises
+from serial import SerialException
+
+
+def faulty_device(reconnect=None, **faults):
+    mtd415t = MTD415TDevice('loop://', timeout=0.1, reconnect=reconnect)
+    mtd415t._serial = FaultInjectingSerial(
+        EmulatedSerial(uid='ABC', timeout=0.1), seed=1, **faults)
+
+    return mtd415t, mtd415t._serial
+
+
+# FaultInjectingSerial
+def test_it_passes_responses_without_faults():
+    mtd415t, faulty_serial = faulty_device()
+
+    assert mtd415t.query('u') == b'ABC\n'
+
+
+def test_it_drops_responses():
+    mtd415t, faulty_serial = faulty_device(drop=1.0)
+
+    with raises(ResponseTimeoutError):
+        mtd415t.query('u')
+
+    assert faulty_serial.counts['drop'] == 1
+
+
+def test_it_injects_unknown_command_bursts():
+    mtd415t, faulty_serial = faulty_device(unknown=1.0, burst=3)
+
+    assert mtd415t.query('u') == b'unknown command\n'
+
+    # the burst continues after the first fault
+    faulty_serial.faults['unknown'] = 0.0
+
+    assert mtd415t.query('u') == b'unknown command\n'
+    assert mtd415t.query('u') == b'unknown command\n'
+    assert mtd415t.query('u') == b'ABC\n'
+
+
+def test_it_splits_responses():
+    mtd415t, faulty_serial = faulty_device(partial=1.0, stall_time=0.02)
+
+    start = perf_counter()
+    assert mtd415t.query('u') == b'ABC\n'
+    assert perf_counter() - start >= 0.015
+
+
+def test_it_stalls_responses():
+    mtd415t, faulty_serial = faulty_device(stall=1.0, stall_time=0.02)
+
+    start = perf_counter()
+    assert mtd415t.query('u') == b'ABC\n'
+    assert perf_counter() - start >= 0.015
+
+
+def test_it_does_not_shift_responses_after_stalled_response():
+    mtd415t, faulty_serial = faulty_device(stall=1.0, stall_time=0.15)
+
+    with raises(ResponseTimeoutError):
+        mtd415t.query('u')
+
+    faulty_serial.faults['stall'] = 0.0
+
+    assert mtd415t.query('m') == b'MTD415T FW0.6.8\n'
+    assert mtd415t.query('u') == b'ABC\n'
+
+
+def test_it_disconnects_until_reopened():
+    mtd415t, faulty_serial = faulty_device(disconnect=1.0)
+
+    with raises(SerialException):
+        mtd415t.query('u')
+
+    faulty_serial.faults['disconnect'] = 0.0
+    with raises(SerialException):
+        mtd415t.query('u')
+
+    faulty_serial.close()
+    faulty_serial.open()
+    assert mtd415t.query('u') == b'ABC\n'
+
+
+def test_it_recovers_from_disconnect_with_reconnect():
+    mtd415t, faulty_serial = faulty_device(reconnect=True)
+    mtd415t.uid
+
+    faulty_serial.faults['disconnect'] = 1.0
+    faulty_serial.write(b'T?\n')
+    faulty_serial.in_waiting
+    faulty_serial.faults['disconnect'] = 0.0
+
+    assert mtd415t.query('u') == b'ABC\n'
+
+
+def test_it_injects_same_faults_for_same_seed():
+    counts = []
+    for _ in range(2):
+        mtd415t, faulty_serial = faulty_device(unknown=0.5)
+        for _ in range(20):
+            mtd415t.query('u')
+        counts.append(faulty_serial.counts['unknown'])
+
+    assert counts[0] == counts[1]
+    assert 0 < counts[0] < 20
+
+
+@mark.skipif(sys.platform == 'win32', reason='requires a pseudo terminal')
+def test_it_injects_faults_into_ports_with_file_descriptor():
+    from support.fake_controller import FakeController
+
+    controller = FakeController({'u?': 'ABC\n'})
+    mtd415t = MTD415TDevice(controller.port, timeout=0.05)
+    mtd415t._serial = FaultInjectingSerial(mtd415t._serial, seed=1,
+                                           partial=1.0, stall_time=0.1)
+
+    try:
+        assert not hasattr(mtd415t._serial, 'fileno')
+        with raises(ResponseTimeoutError):
+            mtd415t.query('u')
+
+        mtd415t._serial.faults['partial'] = 0.0
+        assert mtd415t.query('u') == b'ABC\n'
+    finally:
+        mtd415t.close()
+        controller.close()
+
+
+# .run_scenario
+def test_it_measures_scenario():
+    result = run_scenario('unknown command', {'unknown': 0.1},
+                          operations=20)
+
+    assert result.operations == 20
+    assert result.throughput > 0
+    assert result.p50 <= result.p99 <= result.max
+
+
+def test_it_counts_rejected_sets_as_errors():
+    result = run_scenario('unknown command', {'unknown': 1.0},
+                          operations=10)
+
+    assert result.errors == 10
+
+
+# .main
+def test_it_prints_results_of_all_scenarios():
+    out = StringIO()
+
+    assert main(['--operations', '4', '--timeout', '0.01'], out=out) == 0
+
+    lines = out.getvalue().splitlines()
+    assert lines[0].split()[0] == 'scenario'
+    assert lines[1].split()[0] == 'baseline'
+    assert len(lines) == 9
@@ -0,0 +1,184 @@
+from thorlabs_mtd415t.framing import LineFramer
+from pytest import fixture, skip
+from support import MockSerial
+
+
+@fixture
+def framer_with_mock_serial():
+    mock_serial = MockSerial('loop://', 115200)
+    mock_serial.open()
+
+    return LineFramer(), mock_serial
+
+
+# .readline
+def test_it_reads_line(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.append('1234\n')
+
+    assert framer.readline(mock_serial) == b'1234\n'
+
+
+def test_it_reads_line_in_a_single_chunk(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    reads = []
+    read = mock_serial.read
+    mock_serial.read = lambda size: reads.append(size) or read(size)
+    mock_serial.in_buffer.append('1234\n')
+    framer.readline(mock_serial)
+
+    assert reads == [5]
+
+
+def test_it_keeps_leftover_bytes_for_next_read(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.append('1\n2\n3')
+    framer.readline(mock_serial)
+
+    assert framer.pending == 3
+
+
+def test_it_reads_pipelined_lines(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.append('1\n2\n')
+
+    assert framer.readline(mock_serial) == b'1\n'
+    assert framer.readline(mock_serial) == b'2\n'
+
+
+def test_it_reads_line_split_across_chunks(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.extend(('34\n', '12'))
+    framer.feed(mock_serial.read(2))
+    mock_serial._timeout_pending = False
+
+    assert framer.readline(mock_serial) == b'1234\n'
+
+
+def test_it_returns_partial_line_on_timeout(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.append('12')
+
+    assert framer.readline(mock_serial) == b'12'
+    assert framer.pending == 0
+
+
+def test_it_returns_none_after_deadline(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.append('12')
+
+    assert framer.readline(mock_serial, timeout=0.01) is None
+    assert framer.pending == 2
+
+
+def test_it_restores_read_timeout_of_serial(framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.append('12')
+    framer.readline(mock_serial, timeout=0.01)
+
+    assert mock_serial.timeout is None
+
+
+def test_it_sets_read_timeout_at_most_once():
+    class RecordingSerial(MockSerial):
+        timeouts = []
+
+        @property
+        def timeout(self):
+            return self._read_timeout
+
+        @timeout.setter
+        def timeout(self, value):
+            self.timeouts.append(value)
+            self._read_timeout = value
+
+    mock_serial = RecordingSerial('loop://', 115200)
+    mock_serial.open()
+    mock_serial.timeouts = []
+
+    mock_serial.in_buffer.extend(('34\n', '12'))
+    LineFramer().readline(mock_serial, timeout=0.5)
+
+    assert mock_serial.timeouts == [0.5, None]
+
+
+def test_it_waits_for_file_descriptor_with_select():
+    import os
+    import sys
+
+    if sys.platform == 'win32':
+        skip('requires file descriptors')
+
+    class PipeSerial(object):
+        timeout = None
+
+        def __init__(self, fd):
+            self._fd = fd
+
+        def fileno(self):
+            return self._fd
+
+        @property
+        def in_waiting(self):
+            return 0
+
+        def read(self, size):
+            return os.read(self._fd, size)
+
+    read_fd, write_fd = os.pipe()
+    try:
+        framer, serial = LineFramer(), PipeSerial(read_fd)
+        os.write(write_fd, b'12')
+
+        assert framer.readline(serial, timeout=0.01) is None
+        os.write(write_fd, b'34\n')
+        assert framer.readline(serial, timeout=0.01) == b'1234\n'
+        assert serial.timeout is None
+    finally:
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+# .pop_lines
+def test_it_pops_all_complete_lines():
+    framer = LineFramer()
+    framer.feed(b'1\n2\n3')
+
+    assert framer.pop_lines() == [b'1\n', b'2\n']
+
+
+def test_it_finds_terminator_fed_after_partial_line():
+    framer = LineFramer(terminator=b'\r\n')
+    framer.feed(b'12\r')
+    framer.pop_line()
+    framer.feed(b'\n')
+
+    assert framer.pop_line() == b'12\r\n'
+
+
+# .discard
+def test_it_discards_bytes_until_connection_is_quiet(
+        framer_with_mock_serial):
+    framer, mock_serial = framer_with_mock_serial
+
+    mock_serial.in_buffer.extend(('34\n', '12'))
+
+    assert framer.discard(mock_serial, quiet=0.01) == b'1234\n'
+    assert mock_serial.timeout is None
+
+
+# .clear
+def test_it_clears_buffer():
+    framer = LineFramer()
+    framer.feed(b'1\n2')
+
+    assert framer.clear() == b'1\n2'
+    assert framer.pending == 0
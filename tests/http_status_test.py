@@ -0,0 +1,105 @@
+import json
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+from thorlabs_mtd415t.http_status import SnapshotCache, StatusServer
+from pytest import fixture, raises
+
+
+STATUS_RESPONSES = ('15020\n15000\n120\n350\n16\n', 'ABC\n', 'MTD415T\n')
+
+
+@fixture
+def server(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(STATUS_RESPONSES)
+    server = StatusServer([mtd415t], port=0, refresh_interval=60)
+    server.cache.refresh()
+    server.start()
+
+    yield server, mock_serial
+
+    server.stop()
+
+
+def get(server, path):
+    host, port = server.address
+    return urlopen('http://{}:{}{}'.format(host, port, path)).read()
+
+
+# SnapshotCache
+def test_it_renders_status_as_json(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(STATUS_RESPONSES)
+    cache = SnapshotCache([mtd415t])
+    cache.refresh()
+    device = json.loads(cache.json.decode('utf-8'))['devices'][0]
+
+    assert (device['port'], device['uid'], device['temp'],
+            device['errors']) == ('/dev/ttyUSB0', 'ABC', 15.02, ['no sensor'])
+
+
+def test_it_renders_status_as_metrics(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(STATUS_RESPONSES)
+    cache = SnapshotCache([mtd415t])
+    cache.refresh()
+    lines = cache.metrics.decode('utf-8').splitlines()
+
+    labels = 'port="/dev/ttyUSB0",uid="ABC"'
+    assert 'mtd415t_up{{{}}} 1'.format(labels) in lines
+    assert 'mtd415t_temperature_celsius{{{}}} 15.02'.format(labels) in lines
+    assert 'mtd415t_error{{{},error="no sensor"}} 1'.format(labels) in lines
+
+
+def test_it_keeps_last_status_on_error(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(STATUS_RESPONSES)
+    cache = SnapshotCache([mtd415t])
+    cache.refresh()
+    mtd415t.timeout = 0.001
+    cache.refresh()
+    device = json.loads(cache.json.decode('utf-8'))['devices'][0]
+
+    assert device['temp'] == 15.02
+    assert device['error'] is not None
+    assert 'mtd415t_up{port="/dev/ttyUSB0",uid="ABC"} 0' in \
+        cache.metrics.decode('utf-8').splitlines()
+
+
+# StatusServer
+def test_it_serves_status(server):
+    server, mock_serial = server
+
+    status = json.loads(get(server, '/status').decode('utf-8'))
+
+    assert status['devices'][0]['temp'] == 15.02
+
+
+def test_it_serves_metrics(server):
+    server, mock_serial = server
+
+    assert b'mtd415t_tec_current_amperes' in get(server, '/metrics')
+
+
+def test_it_does_not_query_devices_per_request(server):
+    server, mock_serial = server
+
+    get(server, '/status')
+    writes = len(mock_serial.out_buffer)
+    for _ in range(5):
+        get(server, '/status')
+        get(server, '/metrics')
+
+    assert len(mock_serial.out_buffer) == writes
+
+
+def test_it_returns_not_found_for_unknown_path(server):
+    server, mock_serial = server
+
+    with raises(HTTPError):
+        get(server, '/unknown')
@@ -0,0 +1,208 @@
+import json
+import threading
+from io import StringIO
+from time import time
+
+from thorlabs_mtd415t import MTD415TDevice
+from thorlabs_mtd415t.control import ControlLoop
+from thorlabs_mtd415t.journal import (Journal, configuration, main,
+                                      read_journal)
+from pytest import fixture, mark, raises
+from support import MockSerial
+
+
+@fixture
+def journal_path(tmp_path):
+    return str(tmp_path / 'journal')
+
+
+@fixture
+def journaled_device(journal_path):
+    journal = Journal(journal_path, max_delay=1e-3)
+
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = MockSerial('/dev/ttyUSB0', 115200)
+    journal.attach(mtd415t, uid='ABC')
+
+    yield mtd415t, mtd415t._serial, journal
+
+    journal.close()
+
+
+# .attach
+def test_it_queries_uid_of_attached_device(journal_path):
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = MockSerial('/dev/ttyUSB0', 115200)
+    mtd415t._serial.in_buffer.append('ABC\n')
+
+    with Journal(journal_path) as journal:
+        journal.attach(mtd415t)
+        mtd415t._serial.in_buffer.append('\n')
+        mtd415t.p_gain = 1.5
+
+    assert [entry['uid'] for entry in read_journal(journal_path)] == ['ABC']
+
+
+# .put
+def test_it_journals_set_save_and_clear_errors(journaled_device,
+                                               journal_path):
+    mtd415t, mock_serial, journal = journaled_device
+
+    mock_serial.in_buffer.extend(['\n', '\n', '\n', '\n'])
+    mtd415t.temp_setpoint = 20.5
+    mtd415t.status_delay = 3
+    mtd415t.save()
+    mtd415t.clear_errors()
+    journal.flush()
+
+    entries = list(read_journal(journal_path))
+    assert [(e['kind'], e.get('setting'), e.get('value')) for e in entries] \
+        == [('set', 'temp_setpoint', 20.5), ('set', 'status_delay', 3),
+            ('save', None, None), ('clear_errors', None, None)]
+    assert entries[0]['uid'] == 'ABC'
+    assert entries[0]['port'] == 'loop://'
+
+
+def test_it_does_not_journal_failed_writes(journaled_device, journal_path):
+    mtd415t, mock_serial, journal = journaled_device
+
+    with raises(ValueError):
+        mtd415t.p_gain = 200
+    journal.flush()
+
+    assert list(read_journal(journal_path)) == []
+
+
+def test_it_does_not_journal_rejected_writes(journaled_device,
+                                             journal_path):
+    mtd415t, mock_serial, journal = journaled_device
+
+    mock_serial.in_buffer.append('unknown command\n')
+    mtd415t.p_gain = 1.5
+    journal.flush()
+
+    assert list(read_journal(journal_path)) == []
+    assert mtd415t._written == {}
+
+
+def test_it_journals_setpoint_of_control_loop(journaled_device,
+                                              journal_path):
+    mtd415t, mock_serial, journal = journaled_device
+
+    mock_serial.in_buffer.append('\n15020\n120\n')
+    ControlLoop(mtd415t, lambda readings: 20.5, rate=100).run(iterations=1)
+    journal.flush()
+
+    assert [(e['setting'], e['value']) for e in read_journal(journal_path)] \
+        == [('temp_setpoint', 20.5)]
+
+
+def test_it_group_commits_entries_of_many_threads(journal_path):
+    journal = Journal(journal_path, max_delay=0.05)
+
+    def write(index):
+        for value in range(50):
+            journal.put(index, 'set', 'T', 20000 + value)
+
+    threads = [threading.Thread(target=write, args=(index,))
+               for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    journal.close()
+
+    assert len(list(read_journal(journal_path))) == 200
+    assert journal.commits < 200
+
+
+def test_it_waits_for_commit(journal_path):
+    with Journal(journal_path, wait=True) as journal:
+        journal.put(0, 'set', 'T', 20000)
+
+        assert len(list(read_journal(journal_path))) == 1
+
+
+@mark.parametrize('wait', [False, True])
+def test_it_raises_io_error_after_close(journal_path, wait):
+    journal = Journal(journal_path, wait=wait)
+    journal.close()
+
+    with raises(IOError):
+        journal.put(0, 'set', 'T', 20000)
+
+
+# .__init__
+def test_it_appends_to_existing_journal(journal_path):
+    with Journal(journal_path) as journal:
+        journal.put(0, 'set', 'T', 20000)
+
+    with Journal(journal_path) as journal:
+        journal.put(0, 'set', 'T', 21000)
+
+    assert [e['value'] for e in read_journal(journal_path)] == [20.0, 21.0]
+
+
+def test_it_truncates_incomplete_records(journal_path):
+    with Journal(journal_path) as journal:
+        journal.put(0, 'set', 'T', 20000)
+
+    with open(journal_path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+
+    with Journal(journal_path) as journal:
+        journal.put(0, 'set', 'T', 21000)
+
+    assert [e['value'] for e in read_journal(journal_path)] == [20.0, 21.0]
+
+
+def test_it_raises_value_error_for_other_files(journal_path):
+    with open(journal_path, 'wb') as f:
+        f.write(b'not a journal')
+
+    with raises(ValueError):
+        Journal(journal_path)
+
+
+# .configuration
+def test_it_rebuilds_configuration(journaled_device, journal_path):
+    mtd415t, mock_serial, journal = journaled_device
+
+    mock_serial.in_buffer.extend(['\n', '\n', '\n', '\n'])
+    mtd415t.temp_setpoint = 20
+    mtd415t.save()
+    journal.flush()
+    middle = time()
+
+    mtd415t.temp_setpoint = 25
+    mtd415t.p_gain = 2
+    journal.flush()
+
+    assert configuration(journal_path, 'ABC') == \
+        {'temp_setpoint': 25.0, 'p_gain': 2.0}
+    assert configuration(journal_path, 'loop://', until=middle) == \
+        {'temp_setpoint': 20.0}
+    assert configuration(journal_path, 'ABC', saved=True) == \
+        {'temp_setpoint': 20.0}
+    assert configuration(journal_path, 'XYZ') == {}
+
+
+# .main
+def test_it_prints_configuration(journaled_device, journal_path):
+    mtd415t, mock_serial, journal = journaled_device
+
+    mock_serial.in_buffer.append('\n')
+    mtd415t.temp_setpoint = 20
+    journal.flush()
+
+    out = StringIO()
+    assert main([journal_path, '--device', 'ABC'], out=out) == 0
+    assert json.loads(out.getvalue()) == {'temp_setpoint': 20.0}
+
+    out = StringIO()
+    assert main([journal_path], out=out) == 0
+    assert json.loads(out.getvalue())['kind'] == 'set'
+
+
+def test_it_returns_error_for_missing_journal(journal_path):
+    assert main([journal_path], out=StringIO()) == 1
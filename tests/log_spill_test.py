@@ -0,0 +1,177 @@
+import json
+import os
+from io import StringIO
+
+from thorlabs_mtd415t import MTD415TDevice
+from thorlabs_mtd415t.log_spill import LogSpiller, convert, main, read_spill
+from pytest import fixture, raises
+from support import MockSerial
+
+
+@fixture
+def spilled_device(tmp_path):
+    spiller = LogSpiller(str(tmp_path), flush_interval=0.01)
+
+    mtd415t = MTD415TDevice('loop://', max_log_length=0)
+    mtd415t._serial = MockSerial('/dev/ttyUSB0', 115200)
+    spiller.attach(mtd415t)
+
+    yield mtd415t, mtd415t._serial, spiller
+
+    spiller.close()
+
+
+# .attach
+def test_it_spills_writes_and_reads(spilled_device, tmp_path):
+    mtd415t, mock_serial, spiller = spilled_device
+
+    mock_serial.in_buffer.append('15000\n')
+    mtd415t.temp
+    spiller.flush()
+
+    entries = list(read_spill(str(tmp_path)))
+    assert [(entry['kind'], entry['content']) for entry in entries] == \
+        [('write', b'Te?\n'), ('read', b'15000\n')]
+    assert entries[0]['port'] == '/dev/ttyUSB0'
+
+
+def test_it_spills_with_disabled_in_memory_log(spilled_device, tmp_path):
+    mtd415t, mock_serial, spiller = spilled_device
+
+    mtd415t.write('test')
+    spiller.flush()
+
+    assert mtd415t.log == []
+    assert len(list(read_spill(str(tmp_path)))) == 1
+
+
+def test_it_stamps_entries_with_monotonic_time(spilled_device, tmp_path):
+    mtd415t, mock_serial, spiller = spilled_device
+
+    for _ in range(5):
+        mtd415t.write('test')
+    spiller.close()
+
+    times = [entry['monotonic_ns'] for entry in read_spill(str(tmp_path))]
+    assert times == sorted(times)
+
+
+# .put
+def test_it_does_not_wait_for_writer(tmp_path):
+    spiller = LogSpiller(str(tmp_path), flush_interval=10)
+    spiller.put(0, 'write', b'test\n')
+
+    assert spiller.pending == 1
+    spiller.close()
+    assert spiller.pending == 0
+
+
+def test_it_drops_entries_beyond_max_pending(tmp_path):
+    spiller = LogSpiller(str(tmp_path), flush_interval=10, max_pending=2)
+    for _ in range(5):
+        spiller.put(0, 'write', b'test\n')
+
+    assert spiller.dropped == 3
+    spiller.close()
+
+
+def test_it_raises_writer_errors_from_flush_and_close(tmp_path):
+    spiller = LogSpiller(str(tmp_path))
+    spiller.put(0, 'reconnect', object())
+
+    with raises(TypeError):
+        spiller.flush()
+    with raises(TypeError):
+        spiller.close()
+
+
+# rotation
+def test_it_rotates_files(tmp_path):
+    spiller = LogSpiller(str(tmp_path), max_bytes=200, backup_count=100)
+    for idx in range(20):
+        spiller.put(0, 'write', '{:010d}\n'.format(idx).encode('ascii'))
+    spiller.close()
+
+    assert len(os.listdir(str(tmp_path))) > 1
+
+    contents = [entry['content'] for entry in read_spill(str(tmp_path))]
+    assert contents == ['{:010d}\n'.format(idx).encode('ascii')
+                        for idx in range(20)]
+
+
+def test_it_removes_oldest_files(tmp_path):
+    spiller = LogSpiller(str(tmp_path), max_bytes=100, backup_count=2)
+    for idx in range(20):
+        spiller.put(0, 'write', b'0123456789\n')
+    spiller.close()
+
+    assert len(os.listdir(str(tmp_path))) == 2
+
+
+def test_it_raises_value_error_for_invalid_backup_count(tmp_path):
+    with raises(ValueError):
+        LogSpiller(str(tmp_path), backup_count=0)
+
+
+def test_it_writes_ports_to_every_file(spilled_device, tmp_path):
+    mtd415t, mock_serial, spiller = spilled_device
+    spiller._max_bytes = 100
+
+    for _ in range(10):
+        mtd415t.write('0123456789')
+    spiller.close()
+
+    names = sorted(os.listdir(str(tmp_path)))
+    assert len(names) > 1
+
+    last = list(read_spill(os.path.join(str(tmp_path), names[-1])))
+    assert last[0]['port'] == '/dev/ttyUSB0'
+
+
+def test_it_continues_numbering_of_existing_files(tmp_path):
+    for _ in range(2):
+        spiller = LogSpiller(str(tmp_path))
+        spiller.put(0, 'write', b'test\n')
+        spiller.close()
+
+    assert sorted(os.listdir(str(tmp_path))) == \
+        ['mtd415t.000001.spill', 'mtd415t.000002.spill']
+
+
+# .read_spill
+def test_it_raises_value_error_for_other_files(tmp_path):
+    path = tmp_path / 'other.spill'
+    path.write_bytes(b'something else')
+
+    with raises(ValueError):
+        list(read_spill(str(path)))
+
+
+def test_it_decodes_json_content(tmp_path):
+    spiller = LogSpiller(str(tmp_path))
+    spiller.put(0, 'reconnect', {'reason': 'unplugged', 'duration': 0.1})
+    spiller.close()
+
+    entry, = read_spill(str(tmp_path))
+    assert entry['content'] == {'reason': 'unplugged', 'duration': 0.1}
+
+
+# .convert
+def test_it_converts_to_json_lines(spilled_device, tmp_path):
+    mtd415t, mock_serial, spiller = spilled_device
+
+    mtd415t.write('test')
+    spiller.close()
+
+    out = StringIO()
+    assert convert(str(tmp_path), out) == 1
+
+    entry = json.loads(out.getvalue())
+    assert entry['kind'] == 'write'
+    assert entry['content'] == 'test\n'
+
+
+# .main
+def test_it_reports_error_for_missing_path(tmp_path, capsys):
+    assert main([str(tmp_path / 'missing')], out=StringIO()) == 1
+    assert 'error' in capsys.readouterr().err
@@ -0,0 +1,147 @@
+import random
+import threading
+from time import sleep
+
+from thorlabs_mtd415t.merge import StreamMerger, merge
+from thorlabs_mtd415t.reading import Reading, ReadingArray
+from pytest import raises
+
+
+def reading(timestamp):
+    return Reading('Te', 15000, 15.0, '° C', timestamp)
+
+
+def times(entries):
+    return [item.timestamp for _, item in entries]
+
+
+# .merge
+def test_it_merges_ordered_sources():
+    sources = [[reading(t) for t in (1, 4, 7)],
+               [reading(t) for t in (2, 3, 8, 9)],
+               [],
+               [reading(t) for t in (5,)]]
+
+    merged = list(merge(sources))
+
+    assert times(merged) == [1, 2, 3, 4, 5, 7, 8, 9]
+    assert [index for index, _ in merged] == [0, 1, 1, 0, 3, 0, 1, 1]
+
+
+def test_it_keeps_source_order_for_equal_times():
+    merged = list(merge([[{'time': 1}], [{'time': 1}]]))
+
+    assert [index for index, _ in merged] == [0, 1]
+
+
+def test_it_merges_reading_arrays_and_generators():
+    readings = ReadingArray('Te', '° C')
+    for t in (1, 3):
+        readings.append_raw(15000, t)
+
+    merged = merge([readings, (reading(t) for t in (2, 4))])
+
+    assert times(merged) == [1, 2, 3, 4]
+
+
+def test_it_merges_with_key():
+    merged = merge([[1, 5], [2, 3]], key=lambda item: item)
+
+    assert [item for _, item in merged] == [1, 2, 3, 5]
+
+
+# StreamMerger
+def test_it_releases_items_behind_the_watermark():
+    merger = StreamMerger(2)
+
+    merger.put(0, reading(1))
+    merger.put(0, reading(3))
+    assert merger.get(timeout=0) is None
+
+    merger.put(1, reading(2))
+    assert times([merger.get(timeout=0), merger.get(timeout=0)]) == [1, 2]
+    assert merger.get(timeout=0) is None
+    assert merger.buffered == 1
+
+
+def test_it_releases_all_items_after_close():
+    merger = StreamMerger(2)
+
+    merger.put(0, reading(3))
+    merger.put(1, reading(1))
+    merger.close(0)
+    merger.close(1)
+
+    assert times(merger) == [1, 3]
+    assert merger.done is True
+
+
+def test_it_does_not_wait_for_slow_sources():
+    merger = StreamMerger(2, max_lateness=0.05)
+
+    merger.put(0, reading(1))
+
+    assert merger.get(timeout=0) is None
+    assert times([merger.get(timeout=1)]) == [1]
+
+
+def test_it_drops_late_items():
+    merger = StreamMerger(2, max_lateness=0.01)
+
+    merger.put(0, reading(2))
+    sleep(0.02)
+    merger.get(timeout=0)
+    merger.put(1, reading(1))
+
+    assert merger.late_count == 1
+    assert merger.buffered == 0
+
+
+def test_it_emits_late_items():
+    merger = StreamMerger(2, max_lateness=0.01, late='emit')
+
+    merger.put(0, reading(2))
+    sleep(0.02)
+    merger.get(timeout=0)
+    merger.put(1, reading(1))
+
+    assert times([merger.get(timeout=0)]) == [1]
+
+
+def test_it_bounds_buffered_items():
+    merger = StreamMerger(2, max_buffered=3)
+
+    for t in range(5):
+        merger.put(0, reading(t))
+
+    assert times([merger.get(timeout=0), merger.get(timeout=0)]) == [0, 1]
+    assert merger.buffered == 3
+
+
+def test_it_raises_value_error_for_invalid_late_policy():
+    with raises(ValueError):
+        StreamMerger(1, late='keep')
+
+
+def test_it_merges_concurrent_sources():
+    merger = StreamMerger(4)
+    rand = random.Random(0)
+    series = [sorted(rand.uniform(0, 100) for _ in range(200))
+              for _ in range(4)]
+
+    def produce(index):
+        for t in series[index]:
+            merger.put(index, reading(t))
+        merger.close(index)
+
+    threads = [threading.Thread(target=produce, args=(index,))
+               for index in range(4)]
+    for thread in threads:
+        thread.start()
+
+    merged = times(merger)
+    for thread in threads:
+        thread.join()
+
+    assert merged == sorted(t for ts in series for t in ts)
+    assert merger.late_count == 0
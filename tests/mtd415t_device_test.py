@@ -1,15 +1,27 @@
-from thorlabs_mtd415t import MTD415TDevice
+# -*- coding: utf-8 -*-
+from thorlabs_mtd415t import (ConnectionLostError, MTD415TDevice,
+                              ReconnectPolicy, ResponseTimeoutError)
 from pytest import fixture, raises
+from serial import SerialException
 from support import MockSerial
 import random
 
 
 @fixture
-def mtd415t_device_with_mock_serial():
-    mtd415t = MTD415TDevice('loop://')
+def reconnecting_mtd415t_device():
+    mtd415t = MTD415TDevice('loop://', reconnect=True)
     mtd415t._serial = MockSerial('loop://', 115200)
+    mock_serial = mtd415t._serial
+
+    # identify the device and write the setpoint before the connection loss
+    mock_serial.in_buffer.extend(['\n', 'ABC\n'])
+    mtd415t.uid
+    mtd415t.temp_setpoint = 20
+    del mock_serial.out_buffer[:]
 
-    return mtd415t, mtd415t._serial
+    mock_serial.disconnected = True
+
+    return mtd415t, mock_serial
 
 
 # .__init__
@@ -25,6 +37,12 @@ def test_it_sets_auto_save_on_init():
     assert mtd415t.auto_save is True
 
 
+def test_it_returns_bare_values_by_default():
+    mtd415t = MTD415TDevice('loop://')
+
+    assert mtd415t.return_readings is False
+
+
 # .query
 def test_it_queries_setting_and_returns_result(
         mtd415t_device_with_mock_serial):
@@ -55,6 +73,155 @@ def test_it_retries_query_for_unknown_command(mtd415t_device_with_mock_serial):
     assert result == b'hello world'
 
 
+def test_it_raises_timeout_error_without_response(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    with raises(ResponseTimeoutError):
+        mtd415t.query('test', timeout=0.01)
+
+
+def test_it_uses_device_timeout_by_default(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.timeout = 0.01
+
+    with raises(ResponseTimeoutError):
+        mtd415t.query('test')
+
+
+def test_it_discards_late_response_after_timeout(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    with raises(ResponseTimeoutError):
+        mtd415t.query('A', timeout=0.01)
+
+    mock_serial.in_buffer.append('1234\n')
+    write = mock_serial.write
+    mock_serial.write = lambda value: (write(value),
+                                       mock_serial.in_buffer.append('5\n'))
+
+    assert mtd415t.query('B', timeout=0.01) == b'5\n'
+
+
+def test_it_discards_rest_of_partial_response_after_timeout(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('12')
+    with raises(ResponseTimeoutError):
+        mtd415t.query('A', timeout=0.01)
+
+    write = mock_serial.write
+    mock_serial.write = lambda value: (write(value),
+                                       mock_serial.in_buffer.extend(
+                                           ('5\n', '34\n')))
+
+    assert mtd415t.query('B', timeout=0.01) == b'5\n'
+
+
+# .reconnect
+def test_it_reconnects_and_replays_command_after_connection_loss(
+        reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mock_serial.in_buffer.extend(['21000\n', '20000\n', 'ABC\n'])
+
+    assert mtd415t.temp == 21.0
+    assert mock_serial.out_buffer == [b'u?\n', b'T?\n', b'Te?\n']
+
+
+def test_it_restores_lost_settings_after_reconnect(
+        reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mock_serial.in_buffer.extend(['21000\n', '20000\n', '15000\n', 'ABC\n'])
+    mtd415t.temp
+
+    assert mock_serial.out_buffer == [b'u?\n', b'T?\n', b'T20000\n',
+                                      b'Te?\n']
+
+
+def test_it_retries_to_reopen_port(reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mock_serial.open_failures = 2
+    mock_serial.in_buffer.extend(['21000\n', '20000\n', 'ABC\n'])
+
+    assert mtd415t.temp == 21.0
+    assert mock_serial.open_count == 4
+
+
+def test_it_raises_connection_lost_error_after_deadline(
+        reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mtd415t._reconnect_policy = ReconnectPolicy(deadline=0.02)
+    mock_serial.open_failures = 1000
+
+    with raises(ConnectionLostError):
+        mtd415t.temp
+
+
+def test_it_raises_connection_lost_error_for_different_device(
+        reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mock_serial.in_buffer.append('DEF\n')
+
+    with raises(ConnectionLostError):
+        mtd415t.temp
+
+
+def test_it_fails_command_with_fail_policy(reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mtd415t._reconnect_policy = ReconnectPolicy(queued='fail')
+    mock_serial.in_buffer.extend(['21000\n', '20000\n', 'ABC\n'])
+
+    with raises(ConnectionLostError):
+        mtd415t.temp
+
+    # the connection has been restored nevertheless
+    assert mtd415t.temp == 21.0
+
+
+def test_it_logs_reconnect(reconnecting_mtd415t_device):
+    mtd415t, mock_serial = reconnecting_mtd415t_device
+
+    mock_serial.in_buffer.extend(['21000\n', '20000\n', 'ABC\n'])
+    mtd415t.temp
+
+    entries = [entry for entry in mtd415t.log if entry['kind'] == 'reconnect']
+    assert len(entries) == 1
+    assert 'disconnected' in entries[0]['content']['reason']
+
+
+def test_it_does_not_reconnect_by_default(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.open()
+    mock_serial.disconnected = True
+
+    with raises(SerialException):
+        mtd415t.temp
+
+
+def test_it_increases_reconnect_delays_up_to_maximum():
+    policy = ReconnectPolicy(initial_delay=0.01, max_delay=0.04)
+    delays = policy.delays()
+
+    bounds = (0.01, 0.02, 0.04, 0.04)
+    for bound in bounds:
+        assert bound / 2 <= next(delays) <= bound
+
+
+def test_it_raises_value_error_for_invalid_queued_policy():
+    with raises(ValueError):
+        ReconnectPolicy(queued='invalid')
+
+
 # .close
 def test_it_closes_serial(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
@@ -73,6 +240,15 @@ def test_it_returns_log(mtd415t_device_with_mock_serial):
     assert len(mtd415t.log) == 1
 
 
+def test_it_does_not_log_with_max_log_length_of_zero():
+    mtd415t = MTD415TDevice('loop://', max_log_length=0)
+    mtd415t._serial = MockSerial('loop://', 115200)
+
+    mtd415t.write(b'Test')
+
+    assert mtd415t.log == []
+
+
 # .read
 def test_it_reads_data(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
@@ -91,6 +267,49 @@ def test_it_writes_data(mtd415t_device_with_mock_serial):
     assert mock_serial.out_buffer.pop() == b'test\n'
 
 
+def test_it_reuses_write_buffer(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+    buffer = mtd415t._write_buffer
+
+    mtd415t.write('first')
+    mtd415t.write('second')
+
+    assert mtd415t._write_buffer is buffer
+    assert mock_serial.out_buffer == [b'first\n', b'second\n']
+
+
+# .transact
+def test_it_writes_all_commands_at_once(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(['2\n', '1\n'])
+
+    assert mtd415t.transact([b'Te?', b'A?']) == [b'1\n', b'2\n']
+    assert mock_serial.out_buffer == [b'Te?\nA?\n']
+
+
+# ._query_command
+def test_it_compiles_query_command_once():
+    cmd = MTD415TDevice._query_command('Te')
+
+    assert cmd == b'Te?'
+    assert MTD415TDevice._query_command('Te') is cmd
+
+
+def test_it_compiles_query_command_for_bytes_setting():
+    assert MTD415TDevice._query_command(b'Te') == b'Te?'
+
+
+# ._set_command
+def test_it_formats_set_command():
+    assert MTD415TDevice._set_command('T', 20000) == b'T20000'
+    assert MTD415TDevice._set_command(b'T', -5) == b'T-5'
+
+
+def test_it_truncates_float_values_in_set_command():
+    assert MTD415TDevice._set_command('T', 20000.7) == b'T20000'
+
+
 # .set
 def test_it_sets_setting(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
@@ -203,6 +422,16 @@ def test_it_queries_idn_property(mtd415t_device_with_mock_serial):
     assert mock_serial.out_buffer.pop() == b'm?\n'
 
 
+def test_it_queries_idn_only_once(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('XYZ\n')
+    mtd415t.idn
+    mtd415t.idn
+
+    assert mock_serial.out_buffer == [b'm?\n']
+
+
 # .uid
 def test_it_returns_uid(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
@@ -221,6 +450,25 @@ def test_it_queries_uid_property(mtd415t_device_with_mock_serial):
     assert mock_serial.out_buffer.pop() == b'u?\n'
 
 
+def test_it_queries_uid_only_once(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('ABC\n')
+    mtd415t.uid
+    mtd415t.uid
+
+    assert mock_serial.out_buffer == [b'u?\n']
+
+
+def test_it_does_not_memoize_empty_uid(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(('ABC\n', ''))
+    mtd415t.uid
+
+    assert mtd415t.uid == 'ABC'
+
+
 # .error_flags
 def test_it_returns_error_flags(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
@@ -317,6 +565,88 @@ def test_it_returns__error(mtd415t_device_with_mock_serial):
     assert mtd415t.errors == ('invalid command',)
 
 
+# .status
+def test_it_returns_status(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(('15020\n15000\n120\n350\n1\n', 'ABC\n',
+                                  'MTD415T\n'))
+
+    assert mtd415t.status() == {
+        'idn': 'MTD415T', 'uid': 'ABC', 'temp': 15.02, 'temp_setpoint': 15.0,
+        'tec_current': 0.12, 'tec_voltage': 0.35, 'errors': ('not enabled',)}
+
+
+def test_it_queries_status_in_one_batch(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(('15020\n15000\n120\n350\n1\n', 'ABC\n',
+                                  'MTD415T\n'))
+    mtd415t.status()
+
+    assert mock_serial.out_buffer[-1] == b'Te?\nT?\nA?\nU?\nE?\n'
+
+
+def test_it_retries_failed_status_query(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(('15020\n', 'unknown command\n15000\n120\n'
+                                  '350\n0\n', 'ABC\n', 'MTD415T\n'))
+
+    assert mtd415t.status()['temp'] == 15.02
+
+
+# .read_settings
+def test_it_reads_settings_in_one_batch(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('15020\n10\n1500\n')
+
+    assert mtd415t.read_settings(['temp', 'status_delay', 'p_gain']) == {
+        'temp': 15.02, 'status_delay': 10, 'p_gain': 1.5}
+    assert mock_serial.out_buffer[-1] == b'Te?\nd?\nP?\n'
+
+
+def test_it_reads_all_readable_settings_by_default(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('1\n' * 13)
+
+    assert len(mtd415t.read_settings()) == 13
+    assert mock_serial.out_buffer[-1].startswith(b'L?\nA?\nU?\nTe?\nT?\n')
+
+
+def test_it_retries_failed_settings_read(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(('10\n', '15020\nunknown command\n'))
+
+    assert mtd415t.read_settings(['temp', 'status_delay']) == {
+        'temp': 15.02, 'status_delay': 10}
+    assert mock_serial.out_buffer[-1] == b'd?\n'
+
+
+def test_it_returns_readings_from_read_settings(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+    mtd415t.return_readings = True
+
+    mock_serial.in_buffer.append('15020\n')
+    reading = mtd415t.read_settings(['temp'])['temp']
+
+    assert (reading.raw, reading.value, reading.unit) == (15020, 15.02,
+                                                          '° C')
+
+
+def test_it_raises_value_error_for_unknown_settings_read(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    with raises(ValueError):
+        mtd415t.read_settings(['uid'])
+
+
 # .tec_current_limit
 def test_it_returns_tec_current_limit(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
@@ -399,6 +729,18 @@ def test_it_returns_temperature(mtd415t_device_with_mock_serial):
     assert mtd415t.temp == 5.321
 
 
+def test_it_returns_temperature_reading(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.return_readings = True
+    mock_serial.in_buffer.append('5321')
+    reading = mtd415t.temp
+
+    assert (reading.setting, reading.raw, reading.value, reading.unit) == \
+        ('Te', 5321, 5.321, '° C')
+    assert reading.age >= 0
+
+
 def test_it_queries_temperature_property(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
 
@@ -491,6 +833,15 @@ def test_it_returns_status_delay(mtd415t_device_with_mock_serial):
     assert mtd415t.status_delay == 5321
 
 
+def test_it_returns_status_delay_reading(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.return_readings = True
+    mock_serial.in_buffer.append('5321')
+
+    assert mtd415t.status_delay.value == 5321
+
+
 def test_it_queries_status_delay(mtd415t_device_with_mock_serial):
     mtd415t, mock_serial = mtd415t_device_with_mock_serial
 
@@ -0,0 +1,140 @@
+from thorlabs_mtd415t import MTD415TDevice
+from thorlabs_mtd415t.pacing import AdaptivePacer
+from pytest import approx, fixture, raises
+from support import MockSerial
+from time import perf_counter
+
+
+@fixture
+def paced_mtd415t_device():
+    pacer = AdaptivePacer()
+    mtd415t = MTD415TDevice('loop://', pacer=pacer)
+    mtd415t._serial = MockSerial('loop://', 115200)
+
+    return mtd415t, mtd415t._serial, pacer
+
+
+# .__init__
+def test_it_starts_without_gap():
+    assert AdaptivePacer().gap == 0
+
+
+def test_it_limits_initial_gap_to_maximum():
+    assert AdaptivePacer(initial_gap=1.0, max_gap=0.1).gap == 0.1
+
+
+def test_it_raises_value_error_for_factor_not_larger_than_one():
+    with raises(ValueError):
+        AdaptivePacer(factor=1)
+
+
+# .error
+def test_it_backs_off_to_minimum_after_first_error():
+    pacer = AdaptivePacer(min_backoff=1e-3)
+    pacer.error()
+
+    assert pacer.gap == 1e-3
+
+
+def test_it_increases_gap_multiplicatively():
+    pacer = AdaptivePacer(initial_gap=0.01, factor=2)
+    pacer.error()
+    pacer.error()
+
+    assert pacer.gap == approx(0.04)
+
+
+def test_it_limits_gap_to_maximum():
+    pacer = AdaptivePacer(initial_gap=0.08, max_gap=0.1)
+    pacer.error()
+
+    assert pacer.gap == 0.1
+
+
+# .success
+def test_it_decreases_gap_additively():
+    pacer = AdaptivePacer(initial_gap=0.01, step=1e-3)
+    pacer.success()
+    pacer.success()
+
+    assert pacer.gap == approx(0.008)
+
+
+def test_it_limits_gap_to_minimum():
+    pacer = AdaptivePacer(initial_gap=1e-3, min_gap=5e-4, step=1e-3)
+    pacer.success()
+
+    assert pacer.gap == 5e-4
+
+
+# .record
+def test_it_counts_unknown_command_as_error():
+    pacer = AdaptivePacer()
+    pacer.record(b'15000\n')
+    pacer.record(b'unknown command\n')
+
+    assert pacer.responses == 2
+    assert pacer.errors == 1
+    assert pacer.error_rate == 0.5
+
+
+# .wait
+def test_it_waits_for_gap_between_writes():
+    pacer = AdaptivePacer(initial_gap=0.01)
+
+    start = perf_counter()
+    pacer.wait()
+    pacer.wait()
+    pacer.wait()
+
+    assert perf_counter() - start >= 0.02
+
+
+# .rate
+def test_it_returns_infinite_rate_without_gap():
+    assert AdaptivePacer().rate == float('inf')
+
+
+def test_it_returns_rate_for_gap():
+    assert AdaptivePacer(initial_gap=0.01).rate == approx(100)
+
+
+# paced devices
+def test_it_increases_gap_on_unknown_command(paced_mtd415t_device):
+    mtd415t, mock_serial, pacer = paced_mtd415t_device
+
+    mock_serial.in_buffer.extend(['15000\n', 'unknown command\n'])
+
+    assert mtd415t.temp == 15.0
+    assert pacer.errors == 1
+    assert pacer.gap > 0
+
+
+def test_it_retries_without_fixed_delay(paced_mtd415t_device):
+    mtd415t, mock_serial, pacer = paced_mtd415t_device
+
+    mock_serial.in_buffer.extend(['15000\n', 'unknown command\n'])
+
+    start = perf_counter()
+    mtd415t.temp
+
+    assert perf_counter() - start < 0.05
+
+
+def test_it_writes_batch_at_once_without_gap(paced_mtd415t_device):
+    mtd415t, mock_serial, pacer = paced_mtd415t_device
+
+    mock_serial.in_buffer.extend(['2\n', '1\n'])
+    mtd415t.transact([b'Te?', b'A?'])
+
+    assert mock_serial.out_buffer == [b'Te?\nA?\n']
+
+
+def test_it_writes_batch_commands_separately_with_gap(paced_mtd415t_device):
+    mtd415t, mock_serial, pacer = paced_mtd415t_device
+
+    pacer.error()
+    mock_serial.in_buffer.extend(['2\n', '1\n'])
+    mtd415t.transact([b'Te?', b'A?'])
+
+    assert mock_serial.out_buffer == [b'Te?\n', b'A?\n']
@@ -0,0 +1,129 @@
+from io import StringIO
+from time import sleep
+
+from thorlabs_mtd415t import MTD415TDevice, mtd415t_device, settings
+from pytest import raises
+from support import MockSerial
+
+
+# .profile
+def test_it_records_phases_of_getter(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(['15000\n', '15000\n'])
+    with mtd415t.profile(print_report=False) as profile:
+        mtd415t.temp
+        mtd415t.temp
+
+    phases = profile.phases
+    assert phases['decode/parse'].calls == 2
+    assert phases['query'].calls == 2
+    assert phases['encoding'].calls == 2
+    assert phases['write syscall'].calls == 2
+    assert phases['wait for first byte'].calls == 2
+    assert phases['readline'].calls == 2
+
+
+def test_it_records_validation_and_auto_save(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.auto_save = True
+    mock_serial.in_buffer.extend(['\n', '\n'])
+    with mtd415t.profile(print_report=False) as profile:
+        mtd415t.temp_setpoint = 20
+
+    phases = profile.phases
+    assert phases['validation'].calls == 2
+    assert phases['set'].calls == 1
+    assert phases['auto-save'].calls == 1
+    assert 'save' not in phases
+
+
+def test_it_records_retries(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.extend(['15000\n', 'unknown command\n'])
+    with mtd415t.profile(print_report=False) as profile:
+        mtd415t.temp
+
+    phases = profile.phases
+    assert phases['query'].calls == 1
+    assert phases['retries'].calls == 2  # delay and query
+    assert phases['retries'].total >= 0.1
+
+
+def test_it_excludes_nested_phases_from_self_time(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mock_serial.in_buffer.append('15000\n')
+    with mtd415t.profile(print_report=False) as profile:
+        mtd415t.temp
+
+    phases = profile.phases
+    nested = sum(phases[name].total for name in
+                 ('encoding', 'write', 'readline'))
+    assert phases['query'].self <= phases['query'].total - nested + 1e-9
+
+
+def test_it_restores_device_after_profile(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+    validate = settings.validate_is_float_or_int
+
+    with mtd415t.profile(print_report=False):
+        pass
+
+    assert mtd415t._serial is mock_serial
+    assert 'query' not in mtd415t.__dict__
+    assert settings.validate_is_float_or_int is validate
+    assert mtd415t_device.sleep is sleep
+
+
+def test_it_prints_ranked_report(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+    out = StringIO()
+
+    mock_serial.in_buffer.append('15000\n')
+    with mtd415t.profile(out=out):
+        mtd415t.temp
+
+    lines = out.getvalue().splitlines()
+    assert lines[0].split()[0] == 'phase'
+    assert lines[-1].split()[0] == 'untracked'
+
+    self_times = [float(line.split()[-2]) for line in lines[1:-1]]
+    assert self_times == sorted(self_times, reverse=True)
+
+
+def test_it_raises_runtime_error_for_nested_profiles(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    with mtd415t.profile(print_report=False):
+        with raises(RuntimeError):
+            with mtd415t.profile(print_report=False):
+                pass
+
+
+def test_it_supports_overlapping_profiles_of_devices(
+        mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+    other = MTD415TDevice('loop://')
+    other._serial = MockSerial('/dev/ttyUSB1', 115200)
+    validate = settings.validate_is_float_or_int
+
+    first = mtd415t.profile(print_report=False)
+    second = other.profile(print_report=False)
+    first.__enter__()
+    second.__enter__()
+    first.__exit__(None, None, None)
+
+    other._serial.in_buffer.append('\n')
+    other.temp_setpoint = 20
+    second.__exit__(None, None, None)
+
+    assert second.phases['validation'].calls == 2
+    assert 'validation' not in first.phases
+    assert settings.validate_is_float_or_int is validate
+    assert mtd415t_device.sleep is sleep
@@ -0,0 +1,106 @@
+from thorlabs_mtd415t import MTD415TDevice
+from thorlabs_mtd415t.provisioning import diff, provision, provision_device
+from pytest import raises
+from support import MockSerial
+
+
+def respond(mock_serial, *responses):
+    mock_serial.in_buffer[:0] = reversed(['{}\n'.format(r)
+                                          for r in responses])
+
+
+# .diff
+def test_it_returns_differing_settings(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    respond(mock_serial, 100, 1500)
+
+    assert diff(mtd415t, {'p_gain': 1.5, 'i_gain': 0.2}) == \
+        {'i_gain': (0.1, 0.2)}
+
+
+# .provision_device
+def test_it_writes_differing_settings_only(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    respond(mock_serial, 'ABC', 100, 1500, '', '', 200)
+    provision_device(mtd415t, {'p_gain': 1.5, 'i_gain': 0.2})
+
+    assert mock_serial.out_buffer == [b'u?\n', b'I?\n', b'P?\n', b'I200\n',
+                                      b'M\n', b'I?\n']
+
+
+def test_it_reports_changes(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    respond(mock_serial, 'ABC', 100, 1500, '', '', 200)
+    report = provision_device(mtd415t, {'p_gain': 1.5, 'i_gain': 0.2})
+
+    assert (report.uid, report.changes, report.unchanged, report.saved,
+            report.ok) == ('ABC', {'i_gain': (0.1, 0.2)}, ['p_gain'], True,
+                           True)
+
+
+def test_it_reports_verification_mismatch(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    respond(mock_serial, 'ABC', 100, '', '', 100)
+    report = provision_device(mtd415t, {'i_gain': 0.2})
+
+    assert report.mismatches == {'i_gain': (0.2, 0.1)}
+    assert report.ok is False
+
+
+def test_it_does_not_save_without_changes(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    respond(mock_serial, 'ABC', 1500)
+    report = provision_device(mtd415t, {'p_gain': 1.5})
+
+    assert report.saved is False
+    assert b'M\n' not in mock_serial.out_buffer
+
+
+def test_it_saves_once_with_auto_save(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    mtd415t.auto_save = True
+    respond(mock_serial, 'ABC', 100, 1000, '', '', '', 200, 1500)
+    provision_device(mtd415t, {'p_gain': 1.5, 'i_gain': 0.2})
+
+    assert mock_serial.out_buffer.count(b'M\n') == 1
+    assert mtd415t.auto_save is True
+
+
+def test_it_reports_error(mtd415t_device_with_mock_serial):
+    mtd415t, mock_serial = mtd415t_device_with_mock_serial
+
+    respond(mock_serial, 'ABC', 100)
+    report = provision_device(mtd415t, {'i_gain': 200})
+
+    assert isinstance(report.error, ValueError)
+    assert report.ok is False
+
+
+# .provision
+def test_it_provisions_devices_in_parallel():
+    devices = []
+    for _ in range(3):
+        mtd415t = MTD415TDevice('loop://')
+        mtd415t._serial = MockSerial('loop://', 115200)
+        respond(mtd415t._serial, 'ABC', 100, '', '', 200)
+        devices.append(mtd415t)
+
+    reports = provision(devices, {'i_gain': 0.2})
+
+    assert [report.ok for report in reports] == [True, True, True]
+
+
+def test_it_validates_config_before_provisioning():
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = MockSerial('loop://', 115200)
+
+    with raises(ValueError):
+        provision([mtd415t], {'i_gain': 200, 'temp': 20})
+
+    assert len(mtd415t._serial.out_buffer) == 0
@@ -0,0 +1,153 @@
+import sys
+
+from thorlabs_mtd415t import MTD415TDevice, ResponseTimeoutError
+from pytest import fixture, mark
+
+if sys.platform != 'win32':
+    from thorlabs_mtd415t.reactor import Reactor, parse_response
+    from support.fake_controller import FakeController
+
+pytestmark = mark.skipif(sys.platform == 'win32',
+                         reason='serial ports have no file descriptors')
+
+
+@fixture
+def reactor_with_device():
+    controller = FakeController({'Te?': '21000\n', 'm?': 'MTD415T\n',
+                                 'T21000': '\n'})
+    device = MTD415TDevice(controller.port, timeout=0.2)
+    reactor = Reactor()
+    reactor.register(device)
+
+    yield reactor, device, controller
+
+    device.close()
+    controller.close()
+
+
+def collect(results):
+    return lambda device, setting, value: results.append((setting, value))
+
+
+# .query
+def test_it_dispatches_parsed_response(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    results = []
+    reactor.query(device, 'Te', collect(results))
+    reactor.call_later(0.1, reactor.stop)
+    reactor.run(timeout=1)
+
+    assert results == [('Te', 21000)]
+
+
+def test_it_pipelines_queries(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    results = []
+    for setting in ('Te', 'm', 'Te'):
+        reactor.query(device, setting, collect(results))
+    reactor.call_later(0.1, reactor.stop)
+    reactor.run(timeout=1)
+
+    assert results == [('Te', 21000), ('m', 'MTD415T'), ('Te', 21000)]
+
+
+def test_it_retries_query_for_unknown_command(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    controller.responses['Te?'] = ['unknown command\n', '21000\n']
+    results = []
+    reactor = Reactor(retry_delay=0.01)
+    reactor.register(device)
+    reactor.query(device, 'Te', collect(results))
+    reactor.call_later(0.1, reactor.stop)
+    reactor.run(timeout=1)
+
+    assert results == [('Te', 21000)]
+
+
+def test_it_calls_errback_after_timeout(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    errors = []
+    reactor.query(device, 'X', errback=collect(errors))
+    reactor.run(timeout=0.3)
+
+    assert errors[0][0] == 'X'
+    assert isinstance(errors[0][1], ResponseTimeoutError)
+
+
+def test_it_discards_late_response_after_timeout(reactor_with_device):
+    import os
+
+    reactor, device, controller = reactor_with_device
+
+    results = []
+
+    def timed_out(device, setting, exception):
+        # the response to X arrives after the next command has been queued
+        reactor.query(device, 'Te', collect(results))
+        os.write(controller.master, b'99999\n')
+
+    reactor.query(device, 'X', errback=timed_out)
+    reactor.call_later(0.8, reactor.stop)
+    reactor.run(timeout=1)
+
+    assert results == [('Te', 21000)]
+
+
+# .set
+def test_it_sends_set_command(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    results = []
+    reactor.set(device, 'T', 21000, collect(results))
+    reactor.call_later(0.1, reactor.stop)
+    reactor.run(timeout=1)
+
+    assert controller.received == ['T21000']
+    assert device._written == {'T': 21000}
+
+
+# .call_every
+def test_it_calls_periodic_timer(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    calls = []
+    reactor.call_every(0.02, calls.append, 1)
+    reactor.run(timeout=0.11)
+
+    assert 4 <= len(calls) <= 7
+
+
+def test_it_does_not_call_cancelled_timer(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    calls = []
+    timer = reactor.call_later(0.01, calls.append, 1)
+    timer.cancel()
+    reactor.run(timeout=0.05)
+
+    assert calls == []
+
+
+# .unregister
+def test_it_fails_pending_commands_when_unregistering(reactor_with_device):
+    reactor, device, controller = reactor_with_device
+
+    errors = []
+    reactor.query(device, 'X', errback=collect(errors))
+    reactor.unregister(device)
+
+    assert len(errors) == 1
+    assert reactor.devices == []
+
+
+# parse_response
+def test_it_parses_numeric_response():
+    assert parse_response(b'-1234\n') == -1234
+
+
+def test_it_parses_text_response():
+    assert parse_response(b'unknown command\n') == 'unknown command'
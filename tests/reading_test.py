@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from thorlabs_mtd415t import Reading, ReadingArray
+from time import monotonic
+
+
+# Reading
+def test_it_converts_reading_to_float():
+    reading = Reading('Te', 15020, 15.02, '° C', 0.0)
+
+    assert float(reading) == 15.02
+
+
+def test_it_returns_age_of_reading():
+    reading = Reading('Te', 15020, 15.02, '° C', monotonic() - 1)
+
+    assert 1 <= reading.age < 2
+
+
+def test_it_does_not_allow_additional_attributes():
+    reading = Reading('Te', 15020, 15.02, '° C', 0.0)
+
+    assert not hasattr(reading, '__dict__')
+
+
+# ReadingArray
+def test_it_appends_readings():
+    readings = ReadingArray('Te', '° C')
+    readings.append(Reading('Te', 15020, 15.02, '° C', 1.0))
+    readings.append_raw(15030, 2.0)
+
+    assert list(readings.raw) == [15020, 15030]
+    assert list(readings.timestamps) == [1.0, 2.0]
+
+
+def test_it_returns_scaled_values():
+    readings = ReadingArray('Te', '° C')
+    readings.extend([Reading('Te', 15020, 15.02, '° C', 1.0),
+                     Reading('Te', -500, -0.5, '° C', 2.0)])
+
+    assert list(readings.values) == [15.02, -0.5]
+
+
+def test_it_returns_unscaled_values():
+    readings = ReadingArray('d', 's', scale=None)
+    readings.append_raw(10, 1.0)
+
+    assert list(readings.values) == [10]
+
+
+def test_it_returns_reading_by_index():
+    readings = ReadingArray('Te', '° C')
+    readings.append_raw(15020, 1.0)
+    reading = readings[-1]
+
+    assert (reading.setting, reading.raw, reading.value, reading.unit,
+            reading.timestamp) == ('Te', 15020, 15.02, '° C', 1.0)
+
+
+def test_it_returns_slice_as_reading_array():
+    readings = ReadingArray('Te', '° C')
+    for idx in range(5):
+        readings.append_raw(idx, float(idx))
+
+    assert list(readings[1:3].raw) == [1, 2]
@@ -0,0 +1,175 @@
+import sys
+from time import perf_counter, sleep
+
+from thorlabs_mtd415t import MTD415TDevice, ResponseTimeoutError
+from thorlabs_mtd415t.recording import (READ, WRITE, RecordingSerial,
+                                        ReplayError, ReplaySerial,
+                                        iter_records)
+from pytest import fixture, mark, raises
+from support import MockSerial
+
+
+class SlowSerial(MockSerial):
+    def read(self, size=1):
+        sleep(0.05)
+        return super(SlowSerial, self).read(size)
+
+
+@fixture
+def recording(tmp_path):
+    path = str(tmp_path / 'traffic.rec')
+
+    mtd415t = MTD415TDevice('loop://')
+    mock_serial = MockSerial('loop://', 115200)
+    mock_serial.in_buffer.extend(['1500\n', '15000\n'])
+
+    with RecordingSerial(mock_serial, path) as serial:
+        mtd415t._serial = serial
+        mtd415t.temp
+        mtd415t.tec_current
+
+    return path
+
+
+@fixture
+def slow_recording(tmp_path):
+    path = str(tmp_path / 'slow.rec')
+
+    mtd415t = MTD415TDevice('loop://')
+    slow_serial = SlowSerial('loop://', 115200)
+    slow_serial.in_buffer.append('15000\n')
+
+    with RecordingSerial(slow_serial, path) as serial:
+        mtd415t._serial = serial
+        mtd415t.temp
+
+    return path
+
+
+def replay_device(path, **kwargs):
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = ReplaySerial(path, **kwargs)
+
+    return mtd415t
+
+
+# RecordingSerial
+def test_it_records_writes_and_reads(recording):
+    records = [(kind, data) for kind, _, data in iter_records(recording)]
+
+    assert records == [(WRITE, b'Te?\n'), (READ, b'15000\n'),
+                       (WRITE, b'A?\n'), (READ, b'1500\n')]
+
+
+def test_it_records_increasing_times(recording):
+    times = [time for _, time, _ in iter_records(recording)]
+
+    assert times == sorted(times)
+
+
+def test_it_passes_attributes_through(tmp_path):
+    mock_serial = MockSerial('loop://', 115200)
+
+    with RecordingSerial(mock_serial, str(tmp_path / 'a.rec')) as serial:
+        serial.timeout = 0.5
+
+        assert serial.port == 'loop://'
+
+    assert mock_serial.timeout == 0.5
+
+
+@mark.skipif(sys.platform == 'win32', reason='requires a pseudo terminal')
+def test_it_records_timeouts_of_ports_with_file_descriptor(tmp_path):
+    from support.fake_controller import FakeController
+
+    path = str(tmp_path / 'timeout.rec')
+    controller = FakeController({'Te?': '15000\n'})
+    mtd415t = MTD415TDevice(controller.port, timeout=0.05)
+
+    try:
+        with RecordingSerial(mtd415t._serial, path) as serial:
+            mtd415t._serial = serial
+            with raises(ResponseTimeoutError):
+                mtd415t.query('A')
+            mtd415t.query('Te')
+    finally:
+        mtd415t.close()
+        controller.close()
+
+    records = [(kind, data) for kind, _, data in iter_records(path)]
+    writes = [data for kind, data in records if kind == WRITE]
+    last_write = records.index((WRITE, b'Te?\n'))
+
+    # the number of empty reads depends on timing, replays of the timeout
+    # would not be deterministic
+    assert writes == [b'A?\n', b'Te?\n']
+    assert (READ, b'') in records[:last_write]
+    assert b''.join(data for _, data in records[last_write + 1:]) == \
+        b'15000\n'
+
+
+# iter_records
+def test_it_raises_value_error_for_other_files(tmp_path):
+    path = tmp_path / 'other'
+    path.write_bytes(b'something else')
+
+    with raises(ValueError):
+        list(iter_records(str(path)))
+
+
+# ReplaySerial
+def test_it_replays_responses(recording):
+    mtd415t = replay_device(recording)
+
+    assert mtd415t.temp == 15.0
+    assert mtd415t.tec_current == 1.5
+    assert mtd415t._serial.remaining == 0
+
+
+def test_it_raises_replay_error_for_different_write(recording):
+    mtd415t = replay_device(recording)
+
+    with raises(ReplayError):
+        mtd415t.temp_setpoint
+
+
+def test_it_ignores_different_write_if_not_strict(recording):
+    mtd415t = replay_device(recording, strict=False)
+
+    assert mtd415t.temp_setpoint == 15.0
+
+
+def test_it_raises_replay_error_at_end_of_recording(recording):
+    mtd415t = replay_device(recording)
+    mtd415t.temp
+    mtd415t.tec_current
+
+    with raises(ReplayError):
+        mtd415t.temp
+
+
+def test_it_reproduces_response_delay(slow_recording):
+    mtd415t = replay_device(slow_recording)
+
+    start = perf_counter()
+    mtd415t.temp
+
+    assert perf_counter() - start >= 0.04
+
+
+def test_it_scales_response_delay(slow_recording):
+    mtd415t = replay_device(slow_recording, speed=10)
+
+    start = perf_counter()
+    mtd415t.temp
+
+    assert perf_counter() - start < 0.04
+
+
+def test_it_replays_without_delay(slow_recording):
+    mtd415t = replay_device(slow_recording, speed=None)
+
+    start = perf_counter()
+    mtd415t.temp
+
+    assert perf_counter() - start < 0.02
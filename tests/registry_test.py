@@ -0,0 +1,171 @@
+from threading import Thread
+
+from thorlabs_mtd415t import MTD415TDevice, ResponseTimeoutError
+from thorlabs_mtd415t.registry import ConnectionRegistry
+from pytest import fixture, raises
+
+
+@fixture
+def registry():
+    registry = ConnectionRegistry()
+    yield registry
+    registry.close_all()
+
+
+# .acquire
+def test_it_shares_one_connection_per_url(registry):
+    a = registry.acquire('loop://')
+    b = registry.acquire('loop://')
+
+    assert a is b
+    assert a.refcount == 2
+    assert len(registry) == 1
+
+
+def test_it_opens_separate_connections_for_different_urls(registry):
+    a = registry.acquire('loop://')
+    b = registry.acquire('loop://?logging=debug')
+
+    assert a is not b
+    assert len(registry) == 2
+
+
+# .release
+def test_it_keeps_idle_connections_open(registry):
+    connection = registry.acquire('loop://')
+    registry.release(connection)
+
+    assert connection.serial.is_open
+    assert 'loop://' in registry
+
+
+def test_it_closes_idle_connections_without_keep_idle():
+    registry = ConnectionRegistry(keep_idle=False)
+    connection = registry.acquire('loop://')
+    registry.release(connection)
+
+    assert not connection.serial.is_open
+    assert 'loop://' not in registry
+
+
+def test_it_raises_error_for_connection_without_references(registry):
+    connection = registry.acquire('loop://')
+    registry.release(connection)
+
+    with raises(ValueError):
+        registry.release(connection)
+
+
+# .close_idle
+def test_it_closes_only_idle_connections(registry):
+    used = registry.acquire('loop://')
+    idle = registry.acquire('loop://?logging=debug')
+    registry.release(idle)
+
+    registry.close_idle()
+
+    assert used.serial.is_open
+    assert not idle.serial.is_open
+    assert len(registry) == 1
+
+
+# shared devices
+def test_it_shares_serial_between_devices(registry):
+    a = MTD415TDevice('loop://', shared=True, registry=registry)
+    b = MTD415TDevice('loop://', shared=True, registry=registry)
+
+    assert a._serial is b._serial
+    assert a._lock is b._lock
+
+
+def test_it_exchanges_commands_through_shared_connection(registry):
+    a = MTD415TDevice('loop://', shared=True, registry=registry, timeout=1)
+    b = MTD415TDevice('loop://', shared=True, registry=registry, timeout=1)
+
+    # loop:// echoes commands
+    assert a.query('Te') == b'Te?\n'
+    assert b.query('A') == b'A?\n'
+
+
+def test_it_discards_late_response_for_other_devices(registry):
+    a = MTD415TDevice('loop://', shared=True, registry=registry, timeout=1)
+    b = MTD415TDevice('loop://', shared=True, registry=registry, timeout=1)
+
+    with raises(ResponseTimeoutError):
+        a.read(timeout=0.01)
+
+    # late response to a command of a
+    a._serial.write(b'21000\n')
+
+    assert b.query('A') == b'A?\n'
+
+
+def test_it_serializes_exchanges_of_threads(registry):
+    devices = [MTD415TDevice('loop://', shared=True, registry=registry,
+                             timeout=1) for _ in range(4)]
+    responses = [[] for _ in devices]
+
+    def worker(idx):
+        for _ in range(50):
+            responses[idx].append(devices[idx].query('T{}'.format(idx)))
+
+    threads = [Thread(target=worker, args=(idx,))
+               for idx in range(len(devices))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for idx, values in enumerate(responses):
+        assert values == ['T{}?\n'.format(idx).encode()] * 50
+
+
+def test_it_releases_connection_on_close(registry):
+    device = MTD415TDevice('loop://', shared=True, registry=registry)
+    connection = device._connection
+
+    device.close()
+
+    assert connection.refcount == 0
+    assert not device.is_open
+    assert connection.serial.is_open
+
+
+def test_it_releases_connection_only_once(registry):
+    device = MTD415TDevice('loop://', shared=True, registry=registry)
+    connection = device._connection
+
+    device.close()
+    device.close()
+
+    assert connection.refcount == 0
+
+
+def test_it_reacquires_connection_on_open(registry):
+    device = MTD415TDevice('loop://', shared=True, registry=registry)
+    connection = device._connection
+    device.close()
+
+    device.open()
+
+    assert device._connection is connection
+    assert connection.refcount == 1
+
+
+def test_it_acquires_new_connection_after_close_all(registry):
+    device = MTD415TDevice('loop://', shared=True, registry=registry,
+                           timeout=1)
+    connection = device._connection
+    registry.close_all()
+
+    assert device.query('Te') == b'Te?\n'
+    assert device._connection is not connection
+
+
+def test_it_releases_connection_when_leaving_context(registry):
+    with MTD415TDevice('loop://', shared=True, registry=registry) as device:
+        connection = device._connection
+        assert device.is_open
+        assert connection.refcount == 1
+
+    assert connection.refcount == 0
@@ -0,0 +1,173 @@
+from time import perf_counter
+
+from thorlabs_mtd415t import MTD415TDevice
+from thorlabs_mtd415t.emulator import EmulatedSerial
+from thorlabs_mtd415t.helpers import perf_counter_ns
+from thorlabs_mtd415t.sampling import (DeviceSample, SampleSet,
+                                       SynchronizedSampler)
+from pytest import approx, fixture, raises
+
+
+@fixture
+def devices():
+    devices = []
+    for idx in range(3):
+        device = MTD415TDevice('loop://', timeout=0.5)
+        device._serial = EmulatedSerial(uid='DEV{}'.format(idx),
+                                        response_time=1e-3)
+        device._serial.settings['T'] = 20000 + idx * 1000
+        devices.append(device)
+
+    return devices
+
+
+# .__init__
+def test_it_raises_value_error_for_unknown_reads(devices):
+    with raises(ValueError):
+        SynchronizedSampler(devices, reads=('uid',))
+
+
+# .sample
+def test_it_samples_all_devices(devices):
+    with SynchronizedSampler(devices, reads=('temp_setpoint',)) as sampler:
+        samples = sampler.sample()
+
+    assert [sample.values['temp_setpoint'] for sample in samples] == \
+        [20.0, 21.0, 22.0]
+    assert [sample.error for sample in samples] == [None] * 3
+
+
+def test_it_stamps_requests_and_responses(devices):
+    with SynchronizedSampler(devices, reads=('temp', 'tec_current')) \
+            as sampler:
+        samples = sampler.sample()
+
+    for sample in samples:
+        assert sample.request_ns < sample.response_ns['temp'] <= \
+            sample.response_ns['tec_current']
+
+
+def test_it_sends_bursts_as_one_write(devices):
+    with SynchronizedSampler(devices, reads=('temp', 'tec_current')) \
+            as sampler:
+        sampler.sample()
+
+    writes = [entry for entry in devices[0].log if entry['kind'] == 'write']
+    assert [entry['content'] for entry in writes] == [b'Te?\nA?\n']
+
+
+def test_it_sends_bursts_at_the_same_time(devices):
+    with SynchronizedSampler(devices) as sampler:
+        spreads = [sampler.sample().spread for _ in range(10)]
+
+    # the best of several samples is not disturbed by the scheduler
+    assert min(spreads) < 5e-3
+
+
+def test_it_takes_repeated_samples(devices):
+    with SynchronizedSampler(devices) as sampler:
+        for _ in range(5):
+            assert len(sampler.sample()) == 3
+
+
+def test_it_reports_errors_of_single_devices(devices):
+    devices[1]._serial.response_time = 1.0
+    devices[1].timeout = 0.02
+
+    with SynchronizedSampler(devices, reads=('temp_setpoint',)) as sampler:
+        samples = sampler.sample()
+
+    assert samples[0].values['temp_setpoint'] == 20.0
+    assert samples[1].values['temp_setpoint'] is None
+    assert samples[1].error is not None
+
+
+def test_it_raises_unexpected_errors_of_workers(devices):
+    def write(data):
+        raise ZeroDivisionError()
+
+    devices[1]._serial.write = write
+
+    sampler = SynchronizedSampler(devices)
+    with raises(ZeroDivisionError):
+        sampler.sample()
+    with raises(RuntimeError):
+        sampler.sample()
+
+
+def test_it_raises_runtime_error_after_close(devices):
+    sampler = SynchronizedSampler(devices)
+    sampler.close()
+
+    with raises(RuntimeError):
+        sampler.sample()
+
+
+def test_it_stamps_requests_after_the_pacer_gap(devices):
+    from thorlabs_mtd415t.pacing import AdaptivePacer
+
+    device = devices[0]
+    device._pacer = AdaptivePacer(initial_gap=0.05, min_gap=0.05)
+    device.temp
+
+    serial = device._serial
+    write = serial.write
+    writes = []
+
+    def stamped_write(data):
+        writes.append(perf_counter_ns())
+        return write(data)
+
+    serial.write = stamped_write
+
+    with SynchronizedSampler(devices[:1], reads=('temp',)) as sampler:
+        sample = sampler.sample()[0]
+
+    assert sample.request_ns <= writes[0] < sample.request_ns + 10 ** 7
+
+
+# SampleSet
+def test_it_computes_spreads():
+    samples = SampleSet([
+        DeviceSample(0, {}, 1000, {'temp': 3000}, None),
+        DeviceSample(1, {}, 1500, {'temp': 4500}, None)
+    ])
+
+    assert samples.spread == approx(500e-9)
+    assert samples.midpoint_spread == approx(1000e-9)
+
+
+# .log
+def test_it_stamps_log_entries_with_monotonic_time(devices):
+    devices[0].temp
+    devices[0].temp
+
+    times = [entry['monotonic_ns'] for entry in devices[0].log]
+    assert times == sorted(times)
+    assert len(times) == 4
+
+
+def test_it_applies_one_deadline_to_the_whole_burst(devices):
+    serial = devices[0]._serial
+    serial.response_time = 0.06
+    write = serial.write
+
+    def staggered_write(data):
+        result = write(data)
+
+        # each response arrives 60 ms after the previous one
+        for idx, entry in enumerate(serial._output):
+            entry[0] += idx * 0.06
+
+        return result
+
+    serial.write = staggered_write
+
+    with SynchronizedSampler(devices[:1], reads=(
+            'temp', 'tec_current', 'temp_setpoint'), timeout=0.1) as sampler:
+        start = perf_counter()
+        sample = sampler.sample()[0]
+        elapsed = perf_counter() - start
+
+    assert sample.error is not None
+    assert elapsed < 0.15
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+from thorlabs_mtd415t import MTD415TDevice, settings
+from pytest import raises
+
+
+# .SETTINGS
+def test_it_generates_device_properties():
+    for setting in settings.SETTINGS:
+        prop = getattr(MTD415TDevice, setting.name)
+
+        assert prop.__doc__ == setting.doc
+        assert (prop.fset is not None) == setting.writable
+
+
+# .Setting.to_raw
+def test_it_converts_values_to_raw():
+    assert settings.get('temp_setpoint').to_raw(20.5) == 20500
+    assert settings.get('status_delay').to_raw(10.7) == 10
+
+
+def test_it_raises_value_error_for_invalid_values():
+    setting = settings.get('temp_setpoint')
+
+    with raises(ValueError, match='Temperature setpoint must be >= 5'):
+        setting.to_raw(4)
+
+    with raises(ValueError, match='must be an integer or float'):
+        setting.to_raw('20')
+
+
+def test_it_raises_value_error_for_read_only_settings():
+    with raises(ValueError, match='cannot be written'):
+        settings.get('temp').to_raw(20)
+
+
+# .Setting.from_raw
+def test_it_converts_raw_values():
+    assert settings.get('temp').from_raw(15020) == 15.02
+    assert settings.get('status_delay').from_raw(10) == 10
+
+
+# .Setting.to_raw_many
+def test_it_converts_many_values_to_raw():
+    assert settings.get('p_gain').to_raw_many([0, 1.5, 100]) == \
+        [0, 1500, 100000]
+
+    with raises(ValueError):
+        settings.get('p_gain').to_raw_many([1, 101])
+
+
+# .Setting.from_raw_many
+def test_it_converts_many_raw_values():
+    assert settings.get('temp').from_raw_many([15020, 15000]) == \
+        [15.02, 15.0]
+
+
+# .get
+def test_it_raises_value_error_for_unknown_settings():
+    with raises(ValueError, match='unknown setting'):
+        settings.get('uid')
+
+
+# .readable
+def test_it_lists_readable_settings():
+    assert settings.readable(volatile=True) == ['tec_current', 'tec_voltage',
+                                                'temp']
+    assert 'temp_setpoint' in settings.readable(volatile=False)
+    assert len(settings.readable()) == len(settings.SETTINGS)
+
+
+# .writable
+def test_it_lists_writable_settings():
+    writable = settings.writable()
+
+    assert 'p_gain' in writable
+    assert 'temp' not in writable
+
+
+# .validate_config
+def test_it_validates_config():
+    assert settings.validate_config({'p_gain': 1.5, 'status_delay': 3}) == \
+        {'p_gain': 1500, 'status_delay': 3}
+
+
+def test_it_reports_all_config_errors_at_once():
+    with raises(ValueError) as e:
+        settings.validate_config({'p_gain': 101, 'foo': 1, 'temp': 20})
+
+    message = str(e.value)
+    assert 'P gain must be <= 100' in message
+    assert "unknown setting 'foo'" in message
+    assert 'temp cannot be written' in message
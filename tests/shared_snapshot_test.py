@@ -0,0 +1,129 @@
+import os
+import sys
+import time
+
+from thorlabs_mtd415t import MTD415TDevice
+from pytest import fixture, mark, raises
+from support import MockSerial
+
+if sys.version_info >= (3, 8):
+    from thorlabs_mtd415t.shared_snapshot import SnapshotPublisher, \
+        SnapshotReader
+
+pytestmark = mark.skipif(sys.version_info < (3, 8),
+                         reason='shared memory requires Python >= 3.8')
+
+
+@fixture
+def publisher_and_reader():
+    name = 'mtd415t_test_{}'.format(os.getpid())
+    publisher = SnapshotPublisher(name, 2)
+    reader = SnapshotReader(name)
+
+    yield publisher, reader
+
+    reader.close()
+    publisher.close()
+
+
+# .read
+def test_it_reads_published_snapshot(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    publisher.publish(1, 'ABC', 15.02, 0.12, timestamp=1.0)
+
+    assert tuple(reader.read(1)) == ('ABC', 15.02, 0.12, 1.0)
+
+
+def test_it_reads_latest_snapshot(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    publisher.publish(0, 'ABC', 15.02, 0.12)
+    publisher.publish(0, 'ABC', 15.03, 0.13)
+
+    assert reader.read(0).temp == 15.03
+
+
+def test_it_returns_none_for_empty_slot(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    assert reader.read_all() == [None, None]
+
+
+def test_it_does_not_return_snapshot_while_written(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    publisher.publish(0, 'ABC', 15.02, 0.12)
+    publisher._buf[64] |= 1
+
+    with raises(RuntimeError):
+        reader.read(0)
+
+
+def test_it_finds_slot_by_uid(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    publisher.publish(1, 'DEF', 15.02, 0.12)
+
+    assert reader.find('DEF') == 1
+    assert reader.find('ABC') is None
+
+
+def test_it_returns_number_of_slots(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    assert len(reader) == 2
+
+
+def test_it_raises_index_error_for_invalid_slot(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    with raises(IndexError):
+        publisher.publish(2, 'ABC', 15.02, 0.12)
+
+
+def test_it_keeps_segment_when_reader_processes_exit(publisher_and_reader):
+    import subprocess
+
+    publisher, reader = publisher_and_reader
+    publisher.publish(0, 'ABC', 15.02, 0.12)
+
+    script = ('from thorlabs_mtd415t.shared_snapshot import SnapshotReader\n'
+              'reader = SnapshotReader({!r})\n'
+              'print(reader.read(0).uid)\n'
+              'reader.close()\n').format(publisher._shm.name)
+    root = os.path.join(os.path.dirname(__file__), '..')
+
+    for _ in range(2):
+        output = subprocess.check_output([sys.executable, '-c', script],
+                                         cwd=root, stderr=subprocess.STDOUT)
+        assert output.strip() == b'ABC'
+
+    assert reader.read(0).uid == 'ABC'
+
+
+# .update
+def test_it_publishes_device_values(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = MockSerial('loop://', 115200)
+    mtd415t._serial.in_buffer.extend(('15020\n120\n', 'ABC\n'))
+    publisher.update(0, mtd415t)
+
+    assert reader.read(0)[:3] == ('ABC', 15.02, 0.12)
+    assert mtd415t._serial.out_buffer[-1] == b'Te?\nA?\n'
+
+
+# .start
+def test_it_updates_snapshots_in_background(publisher_and_reader):
+    publisher, reader = publisher_and_reader
+
+    mtd415t = MTD415TDevice('loop://')
+    mtd415t._serial = MockSerial('loop://', 115200)
+    mtd415t._serial.in_buffer.extend(('15020\n120\n', 'ABC\n'))
+    publisher.start([mtd415t], interval=0.01)
+    time.sleep(0.05)
+    publisher.stop()
+
+    assert reader.read(0).temp == 15.02
@@ -0,0 +1,54 @@
+import os
+import pty
+import select
+import threading
+
+
+class FakeController:
+    """Answers commands on the master side of a pseudo terminal"""
+
+    def __init__(self, responses=None):
+        self.master, self.slave = pty.openpty()
+        self.port = os.ttyname(self.slave)
+
+        # response strings (or lists of strings, used in order) by command,
+        # commands without response are never answered
+        self.responses = responses or {}
+        self.received = []
+
+        self._running = True
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        buffer = b''
+        while self._running:
+            ready, _, _ = select.select([self.master], [], [], 0.01)
+            if len(ready) == 0:
+                continue
+
+            try:
+                buffer += os.read(self.master, 1024)
+            except OSError:
+                break
+
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                cmd = line.decode('ascii')
+                self.received.append(cmd)
+
+                response = self.responses.get(cmd)
+                if type(response) == list:
+                    response = response.pop(0) if len(response) > 1 \
+                        else response[0]
+
+                if response is not None:
+                    os.write(self.master, response.encode('ascii'))
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+
+        os.close(self.master)
+        os.close(self.slave)
@@ -1,14 +1,33 @@
+from serial import SerialException
+
+
 class MockSerial:
     def __init__(self, port, baudrate):
         self.port = port
         self.baudrate = baudrate
 
         self.is_open = False
+        self.timeout = None
 
         self.out_buffer = []
         self.in_buffer = []
 
+        self._pending = b''
+        self._timeout_pending = False
+
+        # simulated connection loss: writes fail until the port is reopened,
+        # reopening fails open_failures times
+        self.disconnected = False
+        self.open_failures = 0
+        self.open_count = 0
+
     def open(self):
+        self.open_count += 1
+        if self.open_failures > 0:
+            self.open_failures -= 1
+            raise SerialException('could not open port')
+
+        self.disconnected = False
         self.is_open = True
 
     def close(self):
@@ -18,8 +37,36 @@ class MockSerial:
         if not self.is_open:
             raise RuntimeError('Serial device is closed')
 
-        self.out_buffer.append(value)
+        if self.disconnected:
+            raise SerialException('write failed: device disconnected')
+
+        # data is copied like by a real port, callers may reuse their buffer
+        self.out_buffer.append(bytes(value))
 
     def readline(self):
         value = self.in_buffer.pop()
         return bytes(value.encode('ascii'))
+
+    @property
+    def in_waiting(self):
+        if len(self._pending) == 0 and not self._timeout_pending \
+                and len(self.in_buffer) > 0:
+            return len(self.in_buffer[-1])
+
+        return len(self._pending)
+
+    def read(self, size=1):
+        if len(self._pending) == 0:
+            if self._timeout_pending or len(self.in_buffer) == 0:
+                self._timeout_pending = False
+                return b''
+
+            value = self.in_buffer.pop().encode('ascii')
+
+            # responses without line ending are followed by a read timeout
+            self._pending = value
+            self._timeout_pending = len(value) > 0 and \
+                not value.endswith(b'\n')
+
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
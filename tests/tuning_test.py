@@ -0,0 +1,104 @@
+from io import StringIO
+
+from thorlabs_mtd415t.tuning import (ThermalPlant, grid, main,
+                                     random_candidates, simulate, sweep,
+                                     ziegler_nichols)
+from pytest import raises
+
+
+# .grid
+def test_it_returns_all_combinations():
+    candidates = grid(p_gain=[1, 2], i_gain=[0.1, 0.2, 0.3])
+
+    assert len(candidates) == 6
+    assert candidates[0] == {'i_gain': 0.1, 'p_gain': 1}
+
+
+# .random_candidates
+def test_it_returns_reproducible_random_candidates():
+    candidates = random_candidates(20, seed=1,
+                                   ranges={'p_gain': (0.5, 2.0)})
+
+    assert candidates == random_candidates(20, seed=1,
+                                           ranges={'p_gain': (0.5, 2.0)})
+    assert all(0.5 <= c['p_gain'] <= 2.0 for c in candidates)
+
+
+# .ziegler_nichols
+def test_it_derives_gains_from_critical_values():
+    gains = ziegler_nichols(10, 20)
+
+    assert gains == {'p_gain': 6.0, 'i_gain': 0.6, 'd_gain': 15.0}
+
+
+# .simulate
+def test_it_settles_with_moderate_gains():
+    result = simulate({'p_gain': 2, 'i_gain': 0.1}, duration=120)
+
+    assert result.settling_time is not None
+    assert result.settling_time < 120
+    assert result.peak_current <= 2.0
+
+
+def test_it_reports_overshoot_of_aggressive_gains():
+    moderate = simulate({'p_gain': 2, 'i_gain': 0.1}, duration=120)
+    aggressive = simulate({'p_gain': 20, 'i_gain': 2}, duration=120)
+
+    assert aggressive.overshoot > moderate.overshoot
+    assert aggressive.score > moderate.score
+
+
+def test_it_limits_current():
+    result = simulate({'p_gain': 20, 'tec_current_limit': 0.5},
+                      duration=30)
+
+    assert result.peak_current == 0.5
+
+
+def test_it_uses_plant():
+    slow = simulate({'p_gain': 2, 'i_gain': 0.1}, duration=120,
+                    plant=ThermalPlant(dead_time=5))
+    fast = simulate({'p_gain': 2, 'i_gain': 0.1}, duration=120,
+                    plant=ThermalPlant(dead_time=0))
+
+    assert slow.overshoot > fast.overshoot
+
+
+def test_it_raises_value_error_for_invalid_candidates():
+    with raises(ValueError, match='P gain'):
+        simulate({'p_gain': 200})
+
+
+# .sweep
+def test_it_ranks_candidates_by_score():
+    candidates = grid(p_gain=[0.1, 2, 20], i_gain=[0.1])
+    results = sweep(candidates, processes=1, duration=60)
+
+    assert [result.score for result in results] == \
+        sorted(result.score for result in results)
+    assert results[0].candidate == {'i_gain': 0.1, 'p_gain': 2}
+
+
+def test_it_sweeps_in_process_pool():
+    candidates = grid(p_gain=[0.5, 2], i_gain=[0.1])
+
+    assert sweep(candidates, processes=2, duration=30) == \
+        sweep(candidates, processes=1, duration=30)
+
+
+def test_it_validates_all_candidates_before_sweeping():
+    with raises(ValueError):
+        sweep([{'p_gain': 1}, {'cycling_time': 5}], processes=1)
+
+
+# .main
+def test_it_prints_best_candidates():
+    out = StringIO()
+
+    assert main(['--grid', 'p_gain=1,2', '--grid', 'i_gain=0.1',
+                 '--duration', '30', '--processes', '1', '--top', '1'],
+                out=out) == 0
+
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 2
+    assert 'p_gain=' in lines[1]
@@ -0,0 +1,89 @@
+from pytest import importorskip, raises
+
+np = importorskip('numpy')
+
+from thorlabs_mtd415t import settings, vectorized  # noqa: E402
+
+
+# .parse_responses
+def test_it_parses_responses():
+    raw = vectorized.parse_responses(b'15020\n-31\n12\r\n7')
+
+    assert raw.dtype == np.int32
+    assert raw.tolist() == [15020, -31, 12, 7]
+
+
+def test_it_parses_empty_buffer():
+    assert len(vectorized.parse_responses(b'')) == 0
+
+
+def test_it_replaces_invalid_responses():
+    raw = vectorized.parse_responses(
+        b'15020\nunknown command\n\n2147483648\n-2147483648\n1.5\n7\n',
+        invalid=-1)
+
+    assert raw.tolist() == [15020, -1, -1, -1, -2147483648, -1, 7]
+
+
+def test_it_does_not_split_responses_at_other_whitespace():
+    raw = vectorized.parse_responses(b'12 34\n\n', invalid=-1)
+
+    assert raw.tolist() == [-1, -1]
+
+
+def test_it_raises_value_error_for_invalid_responses():
+    with raises(ValueError, match="b'unknown command' at index 1"):
+        vectorized.parse_responses(b'1\nunknown command\n2\n')
+
+
+def test_it_parses_like_int():
+    values = np.random.RandomState(0).randint(-10**6, 10**6, 1000)
+    buffer = b''.join(b'%d\n' % value for value in values)
+
+    assert vectorized.parse_responses(buffer).tolist() == values.tolist()
+    assert vectorized.parse_responses(buffer + b'x\n', invalid=0)[:-1] \
+        .tolist() == values.tolist()
+
+
+# .from_raw
+def test_it_scales_raw_values():
+    assert vectorized.from_raw([15020, 1], 'temp').tolist() == [15.02, 0.001]
+    assert vectorized.from_raw([3], 'status_delay').dtype == np.int64
+
+
+# .from_raw_columns
+def test_it_scales_columns():
+    values = vectorized.from_raw_columns([[15020, 10], [15000, 11]],
+                                         ['temp', 'status_delay'])
+
+    assert values.tolist() == [[15.02, 10], [15.0, 11]]
+
+
+# .to_raw
+def test_it_quantizes_like_the_setters():
+    setting = settings.get('temp_setpoint')
+    values = np.linspace(5, 45, 10001)
+
+    assert vectorized.to_raw(values, 'temp_setpoint').tolist() == \
+        [setting.to_raw(float(value)) for value in values]
+
+
+def test_it_truncates_integer_settings():
+    assert vectorized.to_raw([1.7, 32768.9], 'status_delay').tolist() == \
+        [1, 32768]
+
+
+def test_it_raises_value_error_for_out_of_range_values():
+    with raises(ValueError, match=r'P gain must be <= 100 A/K \(2 values, '
+                                  r'first at index 1\)'):
+        vectorized.to_raw([1, 200, 300], 'p_gain')
+
+
+def test_it_raises_value_error_for_non_finite_values():
+    with raises(ValueError, match='must be finite'):
+        vectorized.to_raw([1, float('nan')], 'p_gain')
+
+
+def test_it_raises_value_error_for_read_only_settings():
+    with raises(ValueError, match='cannot be written'):
+        vectorized.to_raw([20], 'temp')
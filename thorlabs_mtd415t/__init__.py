@@ -1,5 +1,13 @@
 from .mtd415t_device import MTD415TDevice
+from .reading import Reading, ReadingArray
+from .serial_device import (ConnectionLostError, ReconnectPolicy,
+                            ResponseTimeoutError)
 from .version import __version__
 
-__all__ = ['MTD415TDevice',
+__all__ = ['ConnectionLostError',
+           'MTD415TDevice',
+           'Reading',
+           'ReadingArray',
+           'ReconnectPolicy',
+           'ResponseTimeoutError',
            '__version__']
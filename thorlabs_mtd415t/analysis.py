@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides vectorized analysis of recorded temperature and TEC
+current data to estimate the critical gain and period of a thermal load,
+e. g. after each commissioning step. NumPy is required, see vectorized.
+
+Relay tests: the TEC current switches between two levels whenever the
+temperature crosses the setpoint and the temperature oscillates. The
+oscillation period is estimated with zero crossings and with an FFT, the
+critical gain follows from the describing function of the relay, 4 d / (pi
+a), with the relay amplitude d in A and the oscillation amplitude a in K.
+
+Step tests: the TEC current is stepped once. A first-order model with dead
+time is fitted to the temperature (two-point method) and the critical gain
+and period are computed where its phase reaches -180°.
+
+Example:
+    from thorlabs_mtd415t import analysis
+
+    result = analysis.analyze_relay(times, temp, tec_current, settle=120)
+    result.critical_period # => 41.7
+    result.config() # => {'critical_gain': 2.104, 'critical_period': 41.7}
+
+    temp_controller.critical_gain = result.critical_gain
+    temp_controller.critical_period = result.critical_period
+"""
+
+import math
+from collections import namedtuple
+
+from . import settings
+from .reading import ReadingArray
+from .vectorized import _numpy
+
+# maximum length of the spectrum, longer series are block averaged
+_FFT_LENGTH = 2**18
+
+
+class _CriticalValues(object):
+    # mixin of the analysis results
+
+    def config(self):
+        """
+        Critical gain and period quantized like the setters, ready to write,
+        e. g. with provisioning.provision.
+
+        Returns:
+            dict: critical_gain and critical_period
+
+        Raises:
+            ValueError: If a value is out of the range of the device
+        """
+        config = {'critical_gain': self.critical_gain,
+                  'critical_period': self.critical_period}
+        raw = settings.validate_config(config)
+
+        return dict((name, settings.get(name).from_raw(value))
+                    for name, value in raw.items())
+
+
+class RelayAnalysis(_CriticalValues, namedtuple('RelayAnalysis', (
+        'period_zero_crossing', 'period_fft', 'amplitude', 'relay_amplitude',
+        'critical_gain', 'critical_period'))):
+    """
+    Result of a relay test: oscillation period from zero crossings and FFT
+    in s, oscillation amplitude in K, relay amplitude in A, critical gain in
+    A/K and critical period in s.
+    """
+    __slots__ = ()
+
+
+class StepAnalysis(_CriticalValues, namedtuple('StepAnalysis', (
+        'process_gain', 'time_constant', 'dead_time', 'critical_gain',
+        'critical_period'))):
+    """
+    Result of a step test: process gain in K/A, time constant and dead time
+    in s of the fitted first-order model, critical gain in A/K and critical
+    period in s.
+    """
+    __slots__ = ()
+
+
+def _series(np, values):
+    # float array of values, ReadingArray without creating Reading objects
+    if isinstance(values, ReadingArray):
+        raw = np.frombuffer(values.raw, dtype=np.int64)
+        return raw.astype(np.float64) / (values.scale or 1)
+
+    return np.asarray(values, dtype=np.float64)
+
+
+def _times(np, times):
+    if isinstance(times, ReadingArray):
+        times = times.timestamps
+
+    return np.asarray(times, dtype=np.float64)
+
+
+def _select(np, times, values, settle):
+    if len(times) != len(values):
+        raise ValueError('times and values must have the same length')
+
+    if settle > 0:
+        keep = times >= times[0] + settle
+        times, values = times[keep], values[keep]
+
+    return times, values
+
+
+def _detrend(np, times, values):
+    # removes the mean and a linear drift
+    t = times - times.mean()
+    v = values - values.mean()
+    denominator = np.dot(t, t)
+    slope = np.dot(t, v) / denominator if denominator > 0 else 0.0
+
+    v -= slope * t
+    return v
+
+
+def _rising_crossings(np, times, values, hysteresis=0.1):
+    # interpolated times at which the detrended values rise above the upper
+    # threshold after having been below the lower threshold, the hysteresis
+    # (relative to the half peak to peak value) suppresses noise
+    level = hysteresis * (values.max() - values.min()) / 2
+
+    state = np.zeros(len(values), dtype=np.int8)
+    state[values > level] = 1
+    state[values < -level] = -1
+
+    # carry the last state over samples within the thresholds
+    known = np.flatnonzero(state)
+    if len(known) == 0:
+        return known, times[known]
+    last = np.zeros(len(values), dtype=np.intp)
+    last[known] = known
+    state = state[np.maximum.accumulate(last)]
+
+    idx = np.flatnonzero((state[:-1] == -1) & (state[1:] == 1))
+
+    v0, v1 = values[idx] - level, values[idx + 1] - level
+    t0, t1 = times[idx], times[idx + 1]
+
+    return idx, t0 + (t1 - t0) * (-v0 / (v1 - v0))
+
+
+def _zero_crossing_period(np, crossings):
+    if len(crossings) < 3:
+        return None
+
+    return float(np.median(np.diff(crossings)))
+
+
+def zero_crossing_period(times, values):
+    """
+    Oscillation period from the upward zero crossings of the detrended
+    values, with hysteresis against noise.
+
+    Args:
+        times (array_like): Times in s
+        values (array_like): Values, e. g. temperatures
+
+    Returns:
+        float: Median period in s, None if there are less than two periods
+    """
+    np = _numpy()
+    times, values = _times(np, times), _series(np, values)
+
+    _, crossings = _rising_crossings(np, times, _detrend(np, times, values))
+    return _zero_crossing_period(np, crossings)
+
+
+def _fft_period(np, times, values):
+    # values are detrended
+    if len(times) < 4:
+        return None
+
+    steps = np.diff(times)
+    dt = float(np.median(steps))
+    if dt <= 0:
+        raise ValueError('times must be increasing')
+
+    if np.abs(steps - dt).max() > 0.01 * dt:
+        uniform = np.arange(times[0], times[-1], dt)
+        values = np.interp(uniform, times, values)
+
+    # block averages of long series, the oscillation is much slower than
+    # the sampling
+    factor = len(values) // _FFT_LENGTH + 1
+    if factor > 1:
+        values = values[:len(values) // factor * factor]
+        values = values.reshape(-1, factor).mean(axis=1)
+        dt *= factor
+
+    spectrum = np.abs(np.fft.rfft(values * np.hanning(len(values))))
+    spectrum[0] = 0
+
+    peak = int(np.argmax(spectrum))
+    if peak == 0 or spectrum[peak] == 0:
+        return None
+
+    # parabolic interpolation of the logarithmic peak
+    offset = 0.0
+    if peak < len(spectrum) - 1:
+        left, center, right = np.log(spectrum[peak - 1:peak + 2] + 1e-300)
+        denominator = left - 2 * center + right
+        if denominator != 0:
+            offset = 0.5 * (left - right) / denominator
+
+    return float(len(values) * dt / (peak + offset))
+
+
+def fft_period(times, values):
+    """
+    Oscillation period from the dominant peak of the spectrum. Unevenly
+    sampled values are interpolated to their median sampling interval.
+
+    Args:
+        times (array_like): Times in s
+        values (array_like): Values, e. g. temperatures
+
+    Returns:
+        float: Period in s, None if there is no oscillation
+    """
+    np = _numpy()
+    times, values = _times(np, times), _series(np, values)
+
+    return _fft_period(np, times, _detrend(np, times, values))
+
+
+def _amplitude(np, values, idx):
+    # half of the median peak to peak value per period between upward
+    # crossings of the detrended values
+    if len(idx) < 2:
+        return float(np.percentile(values, 99) -
+                     np.percentile(values, 1)) / 2
+
+    # the last segment is not a full period
+    bounds = idx + 1
+    maxima = np.maximum.reduceat(values, bounds)[:-1]
+    minima = np.minimum.reduceat(values, bounds)[:-1]
+
+    return float(np.median(maxima - minima)) / 2
+
+
+def analyze_relay(times, temp, tec_current=None, relay_amplitude=None,
+                  settle=0.0):
+    """
+    Estimate critical gain and period from a relay test.
+
+    Args:
+        times (array_like): Times in s, e. g. ReadingArray.timestamps
+        temp (array_like): Temperatures in ° C (or ReadingArray)
+        tec_current (array_like, optional): TEC currents in A at the same
+            times (or ReadingArray), used to estimate the relay amplitude
+        relay_amplitude (float, optional): Relay amplitude in A, half of the
+            difference of the two current levels
+        settle (float, optional): Time in s at the beginning which is
+            ignored, e. g. the transient before the oscillation is stable
+
+    Returns:
+        RelayAnalysis: Result
+
+    Raises:
+        ValueError: If there is no oscillation or neither tec_current nor
+            relay_amplitude are given
+    """
+    np = _numpy()
+
+    times, temp = _times(np, times), _series(np, temp)
+    if tec_current is not None:
+        tec_current = _series(np, tec_current)
+        _, tec_current = _select(np, times, tec_current, settle)
+    times, temp = _select(np, times, temp, settle)
+
+    if relay_amplitude is None:
+        if tec_current is None:
+            raise ValueError('tec_current or relay_amplitude required')
+
+        low, high = np.percentile(tec_current, (5, 95))
+        relay_amplitude = float(high - low) / 2
+
+    detrended = _detrend(np, times, temp)
+    idx, crossings = _rising_crossings(np, times, detrended)
+
+    period_zero_crossing = _zero_crossing_period(np, crossings)
+    period_fft = _fft_period(np, times, detrended)
+    amplitude = _amplitude(np, detrended, idx)
+
+    period = period_zero_crossing or period_fft
+    if period is None or amplitude <= 0:
+        raise ValueError('no oscillation found')
+
+    critical_gain = 4 * relay_amplitude / (math.pi * amplitude)
+
+    return RelayAnalysis(period_zero_crossing, period_fft, amplitude,
+                         relay_amplitude, critical_gain, period)
+
+
+def _critical_frequency(time_constant, dead_time):
+    # angular frequency at which the phase of the first-order model with
+    # dead time is -180°, solved by bisection
+    def phase(omega):
+        return omega * dead_time + math.atan(omega * time_constant)
+
+    low, high = 0.0, math.pi / dead_time
+    for _ in range(100):
+        mid = (low + high) / 2
+        if phase(mid) < math.pi:
+            low = mid
+        else:
+            high = mid
+
+    return (low + high) / 2
+
+
+def analyze_step(times, temp, tec_current, settle=0.0):
+    """
+    Estimate critical gain and period from a step of the TEC current.
+
+    Args:
+        times (array_like): Times in s, e. g. ReadingArray.timestamps
+        temp (array_like): Temperatures in ° C (or ReadingArray)
+        tec_current (array_like): TEC currents in A at the same times (or
+            ReadingArray)
+        settle (float, optional): Time in s at the end of the step response
+            which is averaged for the final temperature, 10% of the
+            response by default
+
+    Returns:
+        StepAnalysis: Result
+
+    Raises:
+        ValueError: If there is no step or the response has no dead time
+    """
+    np = _numpy()
+
+    times = _times(np, times)
+    temp, tec_current = _series(np, temp), _series(np, tec_current)
+    if not len(times) == len(temp) == len(tec_current):
+        raise ValueError('times and values must have the same length')
+
+    # the step is the largest change of the current
+    step = int(np.argmax(np.abs(np.diff(tec_current)))) + 1
+    if step < 2 or step >= len(times) - 2:
+        raise ValueError('no step found')
+
+    tail = settle if settle > 0 else 0.1 * (times[-1] - times[step])
+    final = times >= times[-1] - tail
+
+    current_before = tec_current[:step].mean()
+    current_after = tec_current[final].mean()
+    temp_before = temp[:step].mean()
+    temp_after = temp[final].mean()
+
+    delta_current = current_after - current_before
+    delta_temp = temp_after - temp_before
+    if delta_current == 0 or delta_temp == 0:
+        raise ValueError('no step found')
+
+    # times at which 28.3% and 63.2% of the change are reached
+    response = (temp[step:] - temp_before) / delta_temp
+    t = times[step:] - times[step]
+    reached = np.maximum.accumulate(response)
+    t28 = float(np.interp(0.283, reached, t))
+    t63 = float(np.interp(0.632, reached, t))
+
+    time_constant = 1.5 * (t63 - t28)
+    dead_time = t63 - time_constant
+    if time_constant <= 0 or dead_time <= 0:
+        raise ValueError('response has no dead time, the critical gain is '
+                         'unbounded')
+
+    process_gain = float(delta_temp / delta_current)
+    omega = _critical_frequency(time_constant, dead_time)
+    critical_gain = math.sqrt(1 + (omega * time_constant) ** 2) / \
+        abs(process_gain)
+
+    return StepAnalysis(process_gain, time_constant, dead_time,
+                        critical_gain, 2 * math.pi / omega)
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides the mtd415t command line tool.
+
+Example:
+    $ mtd415t status /dev/ttyUSB0
+    $ mtd415t get /dev/ttyUSB0 temp temp_setpoint
+    $ mtd415t set /dev/ttyUSB0 temp_setpoint=15.025 --save
+    $ mtd415t apply-config /dev/ttyUSB0 /dev/ttyUSB1 --config config.json
+    $ mtd415t provision /dev/ttyUSB0 /dev/ttyUSB1 --config config.json
+    $ mtd415t monitor /dev/ttyUSB0 /dev/ttyUSB1 --interval 0.1 --format csv
+
+The monitor command streams samples to stdout in blocks of rows. The binary
+format consists of little-endian records with the port index (uint16), the
+acquisition time in s since the epoch (float64) and the raw integer value of
+each setting (int32, 1e3 x value for all settings but status_delay).
+"""
+
+import argparse
+import sys
+
+STATUS_SETTINGS = ('temp', 'temp_setpoint', 'tec_current', 'tec_voltage')
+MONITOR_SETTINGS = ('temp', 'tec_current')
+
+
+def _open_device(port, timeout):
+    from .mtd415t_device import MTD415TDevice
+
+    return MTD415TDevice(port, timeout=timeout)
+
+
+def _writable_settings():
+    from . import settings
+
+    return sorted(settings.writable())
+
+
+def _monitor_settings(value):
+    from . import settings
+
+    names = tuple(value.split(','))
+    readable = settings.readable()
+    for name in names:
+        if name not in readable:
+            raise argparse.ArgumentTypeError(
+                'invalid setting {!r}, expected one of {}'.format(
+                    name, ', '.join(readable)))
+
+    return names
+
+
+def _parse_value(value):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def _format_value(value):
+    if isinstance(value, tuple):
+        return ', '.join(value) if len(value) > 0 else '-'
+
+    return str(value)
+
+
+def _command_status(args, out):
+    import json
+
+    for port in args.ports:
+        device = _open_device(port, args.timeout)
+        try:
+            status = device.status()
+        finally:
+            device.close()
+
+        if args.json:
+            status['port'] = port
+            status['errors'] = list(status['errors'])
+            out.write(json.dumps(status, sort_keys=True) + '\n')
+            continue
+
+        out.write('{}\n'.format(port))
+        for name in ('idn', 'uid') + STATUS_SETTINGS + ('errors',):
+            out.write('  {}: {}\n'.format(name, _format_value(status[name])))
+
+
+def _command_get(args, out):
+    device = _open_device(args.port, args.timeout)
+    try:
+        values = [getattr(device, name) for name in args.settings]
+    finally:
+        device.close()
+
+    for name, value in zip(args.settings, values):
+        out.write('{}: {}\n'.format(name, _format_value(value)))
+
+
+def _apply(device, settings, save):
+    for name, value in settings:
+        setattr(device, name, value)
+
+    if save and len(settings) > 0:
+        device.save()
+
+
+def _command_set(args, out):
+    settings = []
+    writable = _writable_settings()
+    for assignment in args.assignments:
+        name, sep, value = assignment.partition('=')
+        if sep != '=' or name not in writable:
+            raise ValueError('invalid assignment {!r}, expected one of {} '
+                             'as name=value'.format(assignment,
+                                                    ', '.join(writable)))
+
+        settings.append((name, _parse_value(value)))
+
+    device = _open_device(args.port, args.timeout)
+    try:
+        _apply(device, settings, args.save)
+    finally:
+        device.close()
+
+
+def _load_config(path):
+    import json
+
+    with open(path) as f:
+        config = json.load(f)
+
+    writable = _writable_settings()
+    for name in config:
+        if name not in writable:
+            raise ValueError('unknown setting {!r} in {}'.format(name, path))
+
+    return config
+
+
+def _command_apply_config(args, out):
+    config = _load_config(args.config)
+
+    # apply settings in a fixed order, independent of the file
+    settings = sorted(config.items())
+
+    for port in args.ports:
+        device = _open_device(port, args.timeout)
+        try:
+            _apply(device, settings, not args.no_save)
+        finally:
+            device.close()
+
+        out.write('{}: applied {} settings\n'.format(port, len(settings)))
+
+
+def _command_provision(args, out):
+    import json
+    from .provisioning import provision
+
+    config = _load_config(args.config)
+
+    devices = [_open_device(port, args.timeout) for port in args.ports]
+    try:
+        reports = provision(devices, config, save=not args.no_save,
+                            verify=not args.no_verify)
+    finally:
+        for device in devices:
+            device.close()
+
+    for port, report in zip(args.ports, reports):
+        report.port = port
+
+        if args.json:
+            out.write(json.dumps(report.as_dict(), sort_keys=True) + '\n')
+            continue
+
+        if report.error is not None:
+            state = 'error: {}'.format(report.error)
+        elif len(report.mismatches) > 0:
+            state = 'verification failed'
+        else:
+            state = 'ok'
+
+        out.write('{} ({}): {} changed, {} unchanged, {}\n'.format(
+            port, report.uid, len(report.changes), len(report.unchanged),
+            state))
+        for name, (old, new) in sorted(report.changes.items()):
+            out.write('  {}: {} -> {}\n'.format(name, old, new))
+        for name, (expected, actual) in sorted(report.mismatches.items()):
+            out.write('  {}: expected {}, read {}\n'.format(
+                name, expected, actual))
+
+    if not all(report.ok for report in reports):
+        raise ValueError('provisioning failed for {} of {} devices'.format(
+            sum(1 for report in reports if not report.ok), len(reports)))
+
+
+def _poll(device, index, settings, interval, count, rows, stop, failed):
+    from time import monotonic, sleep
+
+    try:
+        next_time = monotonic()
+        n = 0
+        while not stop.is_set() and (count is None or n < count):
+            try:
+                values = device.read_settings(settings)
+            except (IOError, ValueError):
+                # failed samples are skipped and counted, e. g. timeouts
+                failed[index] += 1
+            else:
+                rows.put(index, [values[name] for name in settings])
+            n += 1
+
+            next_time += interval
+            delay = next_time - monotonic()
+            if delay > 0:
+                sleep(delay)
+            else:
+                # skip missed samples instead of bursting to catch up
+                next_time = monotonic()
+    finally:
+        # the stream of the device ends even if polling fails
+        rows.close(index)
+
+
+class _Writer(object):
+    def __init__(self, out, fmt, ports, settings):
+        from time import monotonic, time
+
+        self._out = out
+        self._ports = ports
+        self._settings = settings
+        self._block = []
+
+        # acquisition times are monotonic, convert them to epoch times
+        self._epoch_offset = time() - monotonic()
+
+        if fmt == 'csv':
+            self._format_row = self._format_csv
+            self._block.append(','.join(('time', 'port') + settings) + '\n')
+        elif fmt == 'jsonl':
+            import json
+
+            self._dumps = json.dumps
+            self._format_row = self._format_jsonl
+        else:
+            import struct
+
+            self._pack = struct.Struct('<Hd' + 'i' * len(settings)).pack
+            self._format_row = self._format_binary
+
+        self._binary = fmt == 'binary'
+
+    def _format_csv(self, index, timestamp, readings):
+        values = ','.join(repr(r.value) for r in readings)
+        return '{:.6f},{},{}\n'.format(timestamp, self._ports[index], values)
+
+    def _format_jsonl(self, index, timestamp, readings):
+        row = {'time': timestamp, 'port': self._ports[index]}
+        for name, reading in zip(self._settings, readings):
+            row[name] = reading.value
+
+        return self._dumps(row) + '\n'
+
+    def _format_binary(self, index, timestamp, readings):
+        return self._pack(index, timestamp, *(r.raw for r in readings))
+
+    def add(self, index, readings):
+        timestamp = readings[0].timestamp + self._epoch_offset
+        self._block.append(self._format_row(index, timestamp, readings))
+
+    def flush(self):
+        if len(self._block) == 0:
+            return
+
+        if self._binary:
+            data = b''.join(self._block)
+        else:
+            data = ''.join(self._block).encode('utf-8')
+
+        del self._block[:]
+
+        self._out.write(data)
+        self._out.flush()
+
+    @property
+    def pending(self):
+        return len(self._block)
+
+
+def _command_monitor(args, out):
+    import threading
+    from time import monotonic
+
+    from .merge import StreamMerger
+
+    settings = args.settings
+    out = getattr(out, 'buffer', out)
+    writer = _Writer(out, args.format, args.ports, settings)
+
+    devices = []
+    for port in args.ports:
+        device = _open_device(port, args.timeout)
+        device.return_readings = True
+        devices.append(device)
+
+    # rows of all devices are written in time order, a device which does
+    # not respond within an interval and the timeout does not hold back the
+    # others
+    rows = StreamMerger(len(devices),
+                        max_lateness=args.interval + args.timeout)
+    stop = threading.Event()
+    failed = [0] * len(devices)
+    threads = [threading.Thread(target=_poll,
+                                args=(device, index, settings, args.interval,
+                                      args.count, rows, stop, failed))
+               for index, device in enumerate(devices)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    last_flush = monotonic()
+    try:
+        while not rows.done:
+            row = rows.get(timeout=args.flush_interval)
+            if row is not None:
+                writer.add(*row)
+
+            now = monotonic()
+            if writer.pending >= args.block_rows or \
+                    now - last_flush >= args.flush_interval:
+                writer.flush()
+                last_flush = now
+    finally:
+        stop.set()
+        writer.flush()
+        for thread in threads:
+            thread.join()
+
+        for device in devices:
+            device.close()
+
+        for port, count in zip(args.ports, failed):
+            if count > 0:
+                sys.stderr.write('mtd415t: warning: {}: {} failed samples '
+                                 'skipped\n'.format(port, count))
+
+
+def _parser():
+    parser = argparse.ArgumentParser(
+        prog='mtd415t',
+        description='Monitor and control Thorlabs MTD415T temperature '
+                    'controllers.')
+    parser.add_argument('--timeout', type=float, default=1.0,
+                        help='response deadline in s (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    status = commands.add_parser('status', help='show device status')
+    status.add_argument('ports', nargs='+', metavar='PORT')
+    status.add_argument('--json', action='store_true',
+                        help='print one JSON object per device')
+    status.set_defaults(func=_command_status)
+
+    get = commands.add_parser('get', help='read settings')
+    get.add_argument('port', metavar='PORT')
+    get.add_argument('settings', nargs='+', metavar='SETTING',
+                     help='property name, e. g. temp')
+    get.set_defaults(func=_command_get)
+
+    set_ = commands.add_parser('set', help='write settings')
+    set_.add_argument('port', metavar='PORT')
+    set_.add_argument('assignments', nargs='+', metavar='SETTING=VALUE',
+                      help='property name and value, e. g. '
+                           'temp_setpoint=15.025')
+    set_.add_argument('--save', action='store_true',
+                      help='save settings to non-volatile memory')
+    set_.set_defaults(func=_command_set)
+
+    apply_config = commands.add_parser(
+        'apply-config', help='write settings from a JSON file')
+    apply_config.add_argument('ports', nargs='+', metavar='PORT')
+    apply_config.add_argument('--config', required=True,
+                              help='JSON object of property names and values')
+    apply_config.add_argument('--no-save', action='store_true',
+                              help='do not save to non-volatile memory')
+    apply_config.set_defaults(func=_command_apply_config)
+
+    provision = commands.add_parser(
+        'provision', help='write differing settings from a JSON file to '
+                          'many devices in parallel and verify them')
+    provision.add_argument('ports', nargs='+', metavar='PORT')
+    provision.add_argument('--config', required=True,
+                           help='JSON object of property names and values')
+    provision.add_argument('--no-save', action='store_true',
+                           help='do not save to non-volatile memory')
+    provision.add_argument('--no-verify', action='store_true',
+                           help='do not read settings back')
+    provision.add_argument('--json', action='store_true',
+                           help='print one JSON report per device')
+    provision.set_defaults(func=_command_provision)
+
+    monitor = commands.add_parser('monitor', help='stream samples to stdout')
+    monitor.add_argument('ports', nargs='+', metavar='PORT')
+    monitor.add_argument('--settings', type=_monitor_settings,
+                         default=','.join(MONITOR_SETTINGS),
+                         help='comma separated property names '
+                              '(default: %(default)s)')
+    monitor.add_argument('--interval', type=float, default=1.0,
+                         help='sampling interval in s (default: %(default)s)')
+    monitor.add_argument('--count', type=int, default=None,
+                         help='number of samples per device (default: '
+                              'unlimited)')
+    monitor.add_argument('--format', choices=('csv', 'jsonl', 'binary'),
+                         default='csv', help='output format (default: '
+                                             '%(default)s)')
+    monitor.add_argument('--block-rows', type=int, default=64,
+                         help='rows written at once (default: %(default)s)')
+    monitor.add_argument('--flush-interval', type=float, default=1.0,
+                         help='maximum time in s before buffered rows are '
+                              'written (default: %(default)s)')
+    monitor.set_defaults(func=_command_monitor)
+
+    return parser
+
+
+def main(argv=None, out=None):
+    """
+    Run the command line tool.
+
+    Args:
+        argv (list, optional): Arguments, sys.argv[1:] by default
+        out (file, optional): Output stream, sys.stdout by default
+
+    Returns:
+        int: Exit status
+    """
+    args = _parser().parse_args(argv)
+    out = sys.stdout if out is None else out
+
+    try:
+        args.func(args, out)
+    except (AttributeError, ValueError, IOError) as e:
+        sys.stderr.write('mtd415t: error: {}\n'.format(e))
+        return 1
+    except KeyboardInterrupt:
+        return 130
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
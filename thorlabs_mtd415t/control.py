@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides the ControlLoop class which runs an external (outer)
+control loop at a fixed rate, e. g. to drive the temperature setpoint of a
+temperature controller from an external sensor.
+
+In every iteration, the setpoint write and all reads are sent as a single
+pipelined batch. Settings are never saved to non-volatile memory from within
+the loop, independent of auto_save. Deadline misses, loop jitter and
+end-to-end latency are recorded.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.control import ControlLoop
+
+    temp_controller = MTD415TDevice('/dev/ttyUSB0', timeout=0.05)
+
+    def update(readings):
+        return 20.0 + 0.1 * (external_sensor() - 20.0)
+
+    loop = ControlLoop(temp_controller, update, rate=20)
+    loop.run(duration=60)
+    loop.stats.deadline_misses # => 0
+    loop.stats.jitter.percentile(99) # => 0.00021
+"""
+
+from bisect import bisect_right
+from time import perf_counter, sleep
+
+from . import settings
+from .helpers import validate_is_in_range
+
+_SETPOINT = settings.get('temp_setpoint')
+
+# histogram bin edges in s, logarithmically spaced from 10 us to 1 s
+DEFAULT_BINS = tuple(m * 10 ** e for e in range(-5, 0) for m in (1, 2, 5)) \
+    + (1.0,)
+
+
+class Histogram(object):
+    """
+    Histogram of durations with fixed bin edges.
+
+    Args:
+        edges (tuple, optional): Upper bin edges in s, logarithmically spaced
+            from 10 us to 1 s by default. Larger values are counted in an
+            overflow bin.
+    """
+
+    def __init__(self, edges=DEFAULT_BINS):
+        self.edges = tuple(edges)
+        self.counts = [0] * (len(self.edges) + 1)
+
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """
+        Count a value.
+
+        Args:
+            value (float): Duration in s
+        """
+        self.counts[bisect_right(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self):
+        """Mean value in s (float)"""
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def percentile(self, q):
+        """
+        Estimate a percentile from the histogram.
+
+        Args:
+            q (float): Percentile, >= 0 and <= 100
+
+        Returns:
+            float: Upper edge of the bin containing the percentile (maximum
+                value for the overflow bin)
+        """
+        if self.count == 0:
+            return 0.0
+
+        threshold = q / 100.0 * self.count
+        cumulative = 0
+        for idx, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold and count > 0:
+                return self.edges[idx] if idx < len(self.edges) else self.max
+
+        return self.max
+
+
+class LoopStats(object):
+    """
+    Statistics of a control loop.
+
+    Attributes:
+        iterations (int): Number of iterations
+        deadline_misses (int): Iterations not finished within their period
+        skipped (int): Iterations skipped to catch up after deadline misses
+        errors (int): Failed writes or reads
+        jitter (Histogram): Delay of iteration starts from their schedule
+        latency (Histogram): Time from iteration start (before the callback)
+            until all responses have been received
+    """
+
+    def __init__(self, bins=DEFAULT_BINS):
+        self.iterations = 0
+        self.deadline_misses = 0
+        self.skipped = 0
+        self.errors = 0
+        self.jitter = Histogram(bins)
+        self.latency = Histogram(bins)
+
+
+class ControlLoop(object):
+    """
+    Fixed-rate control loop around a temperature controller.
+
+    The callback is called in every iteration with the values read in the
+    previous iteration (dict of property name and float, values of failed
+    reads are None, empty in the first iteration) and returns the new
+    temperature setpoint in ° C or None to keep the current setpoint.
+
+    Args:
+        device (MTD415TDevice): Temperature controller
+        callback (callable): Called with the latest readings
+        rate (float): Loop rate in Hz
+        reads (tuple, optional): Property names read in every iteration,
+            ('temp', 'tec_current') by default
+        spin (float, optional): Time in s before each iteration that is busy
+            waited instead of slept to reduce jitter, 0.5 ms by default
+    """
+
+    def __init__(self, device, callback, rate, reads=('temp', 'tec_current'),
+                 spin=5e-4):
+        readable = settings.readable()
+        for name in reads:
+            if name not in readable:
+                raise ValueError('{} cannot be read in the loop, use one of '
+                                 '{}'.format(name, ', '.join(readable)))
+
+        self._device = device
+        self._callback = callback
+        self._period = 1.0 / rate
+        self._reads = tuple(reads)
+        self._spin = spin
+
+        self._settings = [settings.get(name) for name in self._reads]
+        self._read_cmds = [setting.query_command
+                           for setting in self._settings]
+
+        self._running = False
+        self.readings = {}
+        self.stats = LoopStats()
+
+    def _iteration(self):
+        setpoint = self._callback(self.readings)
+
+        cmds = list(self._read_cmds)
+        if setpoint is not None:
+            validate_is_in_range(setpoint, _SETPOINT.value_range[0],
+                                 _SETPOINT.value_range[1], _SETPOINT.label,
+                                 _SETPOINT.range_unit)
+            raw = _SETPOINT.quantize(setpoint)
+            cmds.insert(0, self._device._set_command(_SETPOINT.command, raw))
+
+        try:
+            responses = self._device.transact(cmds)
+        except IOError:
+            self.stats.errors += 1
+            self.readings = dict((name, None) for name in self._reads)
+            return
+
+        if setpoint is not None:
+            if self._device._acknowledged(responses[0]):
+                self._device._record_set(_SETPOINT.command, raw)
+            else:
+                self.stats.errors += 1
+
+            responses = responses[1:]
+
+        readings = {}
+        for setting, response in zip(self._settings, responses):
+            name = setting.name
+            try:
+                readings[name] = setting.from_raw(int(response))
+            except ValueError:
+                # e. g. 'unknown command', the loop does not wait to retry
+                self.stats.errors += 1
+                readings[name] = None
+
+        self.readings = readings
+
+    def run(self, duration=None, iterations=None):
+        """
+        Run the loop until stop is called.
+
+        Args:
+            duration (float, optional): Maximum run time in s
+            iterations (int, optional): Maximum number of iterations
+        """
+        stats = self.stats
+        period = self._period
+        spin = self._spin
+
+        start = perf_counter()
+        end = None if duration is None else start + duration
+        scheduled = start
+        n = 0
+
+        self._running = True
+        try:
+            while self._running and (iterations is None or n < iterations):
+                if end is not None and scheduled >= end:
+                    break
+
+                delay = scheduled - perf_counter() - spin
+                if delay > 0:
+                    sleep(delay)
+
+                now = perf_counter()
+                while now < scheduled:
+                    now = perf_counter()
+
+                stats.jitter.add(now - scheduled)
+                self._iteration()
+                finished = perf_counter()
+
+                stats.latency.add(finished - now)
+                stats.iterations += 1
+                n += 1
+
+                scheduled += period
+                if finished > scheduled:
+                    stats.deadline_misses += 1
+
+                    # skip iterations which can no longer start on time
+                    missed = int((finished - scheduled) / period) + 1
+                    stats.skipped += missed
+                    scheduled += missed * period
+        finally:
+            self._running = False
+
+    def stop(self):
+        """Stop the loop after the current iteration"""
+        self._running = False
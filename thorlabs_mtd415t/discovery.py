@@ -0,0 +1,192 @@
+"""
+This module provides functions to discover MTD415T temperature controllers
+connected to the serial ports of a computer.
+
+Candidate ports are probed concurrently with short timeouts. Identities are
+optionally cached on disk, keyed by port and USB serial number, so that a warm
+restart only needs to enumerate the ports.
+
+Example:
+    from thorlabs_mtd415t.discovery import discover
+
+    ports = discover(cache_path='~/.cache/mtd415t.json')
+    ports # => {'ABC123': '/dev/ttyUSB0', 'DEF456': '/dev/ttyUSB1'}
+"""
+
+import json
+import os
+
+from .mtd415t_device import MTD415TDevice
+
+
+def candidate_ports():
+    """
+    Lists serial ports which may be connected to a temperature controller.
+
+    Returns:
+        list: Tuples of port name and USB serial number (None if unknown)
+    """
+    from serial.tools.list_ports import comports
+
+    return [(info.device, info.serial_number) for info in comports()]
+
+
+def probe(port, timeout=0.5):
+    """
+    Queries product name and unique identifier of the device on a port.
+
+    Args:
+        port (string): Serial port, e. g. '/dev/ttyUSB0'
+        timeout (float, optional): Read timeout in s, 0.5 by default
+
+    Returns:
+        tuple: Product name and unique identifier (strings), None if there is
+            no responding temperature controller on the port
+    """
+    from serial import SerialException
+
+    try:
+        device = MTD415TDevice(port, timeout=timeout)
+    except (SerialException, OSError, ValueError):
+        return None
+
+    try:
+        idn, uid = device.idn, device.uid
+    except (SerialException, OSError, ValueError):
+        return None
+    finally:
+        device.close()
+
+    # other devices (or loopback adapters echoing the query) are ignored
+    if not idn.startswith('MTD415') or device._uid is None:
+        return None
+
+    return idn, uid
+
+
+class IdentityCache(object):
+    """
+    Cache for device identities stored as JSON file on disk.
+
+    Args:
+        path (string): Path of the cache file
+    """
+
+    def __init__(self, path):
+        self._path = os.path.expanduser(path)
+        self._entries = {}
+
+        try:
+            with open(self._path) as f:
+                self._entries = json.load(f)
+        except (IOError, OSError, ValueError):
+            # missing or corrupt cache files are treated as empty
+            self._entries = {}
+
+    @staticmethod
+    def _key(port, serial_number):
+        return '{}|{}'.format(port, serial_number or '')
+
+    def get(self, port, serial_number):
+        """
+        Look up cached identity.
+
+        Args:
+            port (string): Serial port
+            serial_number (string): USB serial number of the port
+
+        Returns:
+            tuple: Product name and unique identifier, None if not cached
+        """
+        # without a serial number, the device behind the port is unknown
+        if serial_number is None:
+            return None
+
+        entry = self._entries.get(self._key(port, serial_number))
+        if entry is None:
+            return None
+
+        return entry['idn'], entry['uid']
+
+    def set(self, port, serial_number, idn, uid):
+        """
+        Store identity.
+
+        Args:
+            port (string): Serial port
+            serial_number (string): USB serial number of the port
+            idn (string): Product name and version number
+            uid (string): Unique device identifier
+        """
+        self._entries[self._key(port, serial_number)] = {'idn': idn,
+                                                         'uid': uid}
+
+    def save(self):
+        """Write cache to disk"""
+        directory = os.path.dirname(self._path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        # write to a temporary file first to never leave a truncated cache
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self._entries, f, indent=2, sort_keys=True)
+
+        os.replace(tmp_path, self._path)
+
+
+def discover(ports=None, timeout=0.5, cache_path=None, max_workers=None):
+    """
+    Discovers temperature controllers by probing ports concurrently.
+
+    Args:
+        ports (list, optional): Serial ports to probe, all ports reported by
+            the operating system by default
+        timeout (float, optional): Read timeout per query in s, 0.5 by
+            default
+        cache_path (string, optional): Path of the identity cache, no cache
+            is used by default
+        max_workers (int, optional): Maximum number of concurrent probes, one
+            per port by default
+
+    Returns:
+        dict: Serial ports by unique device identifier
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    serial_numbers = dict(candidate_ports())
+    if ports is None:
+        ports = sorted(serial_numbers.keys())
+
+    cache = IdentityCache(cache_path) if cache_path is not None else None
+
+    result = {}
+    missing = []
+    for port in ports:
+        identity = None
+        if cache is not None:
+            identity = cache.get(port, serial_numbers.get(port))
+
+        if identity is None:
+            missing.append(port)
+        else:
+            result[identity[1]] = port
+
+    if len(missing) > 0:
+        workers = max_workers or len(missing)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            identities = list(executor.map(lambda p: probe(p, timeout),
+                                           missing))
+
+        for port, identity in zip(missing, identities):
+            if identity is None:
+                continue
+
+            result[identity[1]] = port
+            if cache is not None:
+                cache.set(port, serial_numbers.get(port), *identity)
+
+        if cache is not None:
+            cache.save()
+
+    return result
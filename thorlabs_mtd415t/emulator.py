@@ -0,0 +1,208 @@
+"""
+This module provides the EmulatedSerial class, an in-process stand-in for the
+serial connection to a temperature controller. It answers the command set
+used by MTD415TDevice, e. g. for tests, benchmarks and fault injection
+without hardware.
+
+The temperature relaxes exponentially towards the setpoint, the TEC current
+is proportional to the deviation and limited by the current limit. Set
+commands, save and clear errors are acknowledged with an empty line, invalid
+commands are answered with 'unknown command'.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.emulator import EmulatedSerial
+
+    temp_controller = MTD415TDevice('loop://')
+    temp_controller._serial = EmulatedSerial(response_time=1e-3)
+    temp_controller.temp_setpoint = 20.0
+    temp_controller.temp # => 21.98
+"""
+
+import math
+import threading
+from collections import deque
+from time import monotonic
+
+# default values of the settings which can be set, in device units
+DEFAULT_SETTINGS = {
+    'L': 2000,
+    'T': 25000,
+    'W': 100,
+    'd': 10,
+    'G': 1000,
+    'O': 10000,
+    'C': 10,
+    'P': 1000,
+    'I': 100,
+    'D': 0
+}
+
+
+class EmulatedSerial(object):
+    """
+    Emulated serial connection to a temperature controller.
+
+    Args:
+        port (string, optional): Port name, 'emulator://' by default
+        baudrate (int, optional): Ignored, 115200 by default
+        timeout (float, optional): Read timeout in s, None blocks
+        uid (string, optional): Unique device identifier
+        idn (string, optional): Product name and version number
+        response_time (float, optional): Delay of each response in s, 0 by
+            default
+        ambient (float, optional): Initial temperature in ° C, 22 by default
+        time_constant (float, optional): Time constant of the temperature in
+            s, 10 by default
+    """
+
+    def __init__(self, port='emulator://', baudrate=115200, timeout=None,
+                 uid='EMU0000001', idn='MTD415T FW0.6.8', response_time=0.0,
+                 ambient=22.0, time_constant=10.0):
+        self.port = port
+        self.baudrate = baudrate
+        self.timeout = timeout
+        self.is_open = True
+
+        self.uid = uid
+        self.idn = idn
+        self.response_time = response_time
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.saved = dict(DEFAULT_SETTINGS)
+        self.error_register = 0
+
+        self._temp = ambient
+        self._time = monotonic()
+        self._time_constant = time_constant
+
+        self._input = bytearray()
+        self._output = deque()
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def _update_temp(self):
+        now = monotonic()
+        setpoint = self.settings['T'] / 1e3
+        decay = math.exp(-(now - self._time) / self._time_constant)
+
+        self._temp = setpoint + (self._temp - setpoint) * decay
+        self._time = now
+
+    def _respond(self, line):
+        settings = self.settings
+
+        if line == 'm?':
+            return self.idn
+        if line == 'u?':
+            return self.uid
+        if line in ('M', 'c'):
+            if line == 'M':
+                self.saved = dict(settings)
+            else:
+                self.error_register = 0
+            return ''
+
+        self._update_temp()
+        deviation = settings['T'] / 1e3 - self._temp
+        limit = settings['L']
+        current = int(max(-limit, min(limit, 1e3 * deviation)))
+
+        values = {
+            'Te': int(round(self._temp * 1e3)),
+            'A': current,
+            'U': 2 * current,
+            'E': self.error_register
+        }
+        values.update(settings)
+
+        if line.endswith('?') and line[:-1] in values:
+            return str(values[line[:-1]])
+
+        name = line.rstrip('-0123456789')
+        value = line[len(name):]
+        if name in settings and value not in ('', '-'):
+            self._update_temp()
+            settings[name] = int(value)
+            return ''
+
+        return 'unknown command'
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('port is closed')
+
+        with self._lock:
+            self._input += data
+            due = monotonic() + self.response_time
+
+            while True:
+                end = self._input.find(b'\n')
+                if end < 0:
+                    break
+
+                line = bytes(self._input[:end]).decode('ascii').strip()
+                del self._input[:end + 1]
+
+                response = self._respond(line) + '\n'
+                self._output.append([due, response.encode('ascii')])
+
+            self._ready.notify_all()
+
+        return len(data)
+
+    def _due(self):
+        # number of bytes which may be read now
+        now = monotonic()
+        return sum(len(data) for due, data in self._output if due <= now)
+
+    def read(self, size=1):
+        if not self.is_open:
+            raise IOError('port is closed')
+
+        deadline = None if self.timeout is None \
+            else monotonic() + self.timeout
+
+        with self._lock:
+            while True:
+                if len(self._output) > 0 and \
+                        self._output[0][0] <= monotonic():
+                    break
+
+                if deadline is not None and monotonic() >= deadline:
+                    return b''
+
+                # wait for the next response or until it is due
+                wait = None
+                if len(self._output) > 0:
+                    wait = self._output[0][0] - monotonic()
+                if deadline is not None:
+                    remaining = deadline - monotonic()
+                    wait = remaining if wait is None else min(wait,
+                                                              remaining)
+
+                if wait is None or wait > 0:
+                    self._ready.wait(wait)
+
+            result = bytearray()
+            now = monotonic()
+            while len(self._output) > 0 and len(result) < size and \
+                    self._output[0][0] <= now:
+                entry = self._output[0]
+                chunk = entry[1][:size - len(result)]
+                result += chunk
+                entry[1] = entry[1][len(chunk):]
+                if len(entry[1]) == 0:
+                    self._output.popleft()
+
+            return bytes(result)
+
+    @property
+    def in_waiting(self):
+        with self._lock:
+            return self._due()
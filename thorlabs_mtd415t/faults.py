@@ -0,0 +1,339 @@
+"""
+This module provides the FaultInjectingSerial class, a wrapper for the serial
+connection of a device which injects faults into the responses, and a suite
+of scenarios measuring latency and throughput of MTD415TDevice.query and set
+under different fault mixes.
+
+Faults are drawn per response line from a seeded random generator, runs with
+the same seed are reproducible:
+
+    drop: the response is lost
+    unknown: the response is replaced by 'unknown command', followed by
+        burst - 1 further 'unknown command' responses
+    partial: the response is split, the remainder arrives after stall_time
+    stall: the response arrives after stall_time
+    disconnect: the connection is lost, writes and reads raise
+        SerialException until the port is reopened
+
+Example:
+    from thorlabs_mtd415t.faults import run_scenarios
+
+    for result in run_scenarios(operations=1000):
+        print(result)
+
+    # or from the command line
+    # python -m thorlabs_mtd415t.faults --operations 1000
+"""
+
+import random
+from collections import deque, namedtuple
+from time import monotonic, perf_counter, sleep
+
+from .control import Histogram
+
+# fault probabilities per response of the scenario suite
+SCENARIOS = (
+    ('baseline', {}),
+    ('drop', {'drop': 0.01}),
+    ('unknown command', {'unknown': 0.02}),
+    ('unknown command burst', {'unknown': 0.01, 'burst': 3}),
+    ('partial line', {'partial': 0.05}),
+    ('stall', {'stall': 0.02}),
+    ('disconnect', {'disconnect': 0.002}),
+    ('mixed', {'drop': 0.005, 'unknown': 0.01, 'burst': 2, 'partial': 0.01,
+               'stall': 0.01, 'disconnect': 0.001})
+)
+
+ScenarioResult = namedtuple('ScenarioResult', (
+    'name', 'operations', 'errors', 'duration', 'throughput', 'p50', 'p99',
+    'max'))
+ScenarioResult.__doc__ = """Result of a scenario, throughput in operations per
+s, latencies in s"""
+
+
+class FaultInjectingSerial(object):
+    """
+    Serial connection wrapper injecting faults into responses. Other
+    attributes are passed through to the wrapped connection, which needs to
+    support in_waiting.
+
+    Args:
+        serial: Serial connection, e. g. EmulatedSerial instance
+        seed (int, optional): Seed of the random generator
+        drop (float, optional): Probability of a lost response
+        unknown (float, optional): Probability of an 'unknown command' burst
+        burst (int, optional): Length of 'unknown command' bursts, 1 by
+            default
+        partial (float, optional): Probability of a split response
+        stall (float, optional): Probability of a delayed response
+        stall_time (float, optional): Delay of stalled responses and
+            remainders of split responses in s, 50 ms by default
+        disconnect (float, optional): Probability of a connection loss
+    """
+
+    def __init__(self, serial, seed=None, drop=0.0, unknown=0.0, burst=1,
+                 partial=0.0, stall=0.0, stall_time=0.05, disconnect=0.0):
+        object.__setattr__(self, '_serial', serial)
+        object.__setattr__(self, '_state', {
+            'random': random.Random(seed),
+            'incoming': bytearray(),
+            'outgoing': deque(),
+            'unknown_left': 0,
+            'disconnected': False
+        })
+        object.__setattr__(self, 'faults', {
+            'drop': drop, 'unknown': unknown, 'burst': burst,
+            'partial': partial, 'stall': stall, 'stall_time': stall_time,
+            'disconnect': disconnect
+        })
+        object.__setattr__(self, 'counts', dict(
+            (name, 0) for name in ('drop', 'unknown', 'partial', 'stall',
+                                   'disconnect')))
+
+    def _check_connection(self):
+        if self._state['disconnected']:
+            from serial import SerialException
+
+            raise SerialException('injected fault: device disconnected')
+
+    def _inject(self, line):
+        # returns (delay, data) tuples for a complete response line
+        state = self._state
+        faults = self.faults
+        rand = state['random'].random
+
+        if state['unknown_left'] > 0:
+            state['unknown_left'] -= 1
+            return [(0, b'unknown command\n')]
+
+        if rand() < faults['disconnect']:
+            self.counts['disconnect'] += 1
+            state['disconnected'] = True
+            return []
+
+        if rand() < faults['drop']:
+            self.counts['drop'] += 1
+            return []
+
+        if rand() < faults['unknown']:
+            self.counts['unknown'] += 1
+            state['unknown_left'] = faults['burst'] - 1
+            return [(0, b'unknown command\n')]
+
+        if rand() < faults['partial'] and len(line) > 1:
+            self.counts['partial'] += 1
+            split = len(line) // 2
+            return [(0, line[:split]), (faults['stall_time'], line[split:])]
+
+        if rand() < faults['stall']:
+            self.counts['stall'] += 1
+            return [(faults['stall_time'], line)]
+
+        return [(0, line)]
+
+    def _pull(self):
+        # moves all available responses of the wrapped connection to the
+        # outgoing queue, applying the faults line by line
+        serial = self._serial
+        state = self._state
+        incoming = state['incoming']
+
+        waiting = serial.in_waiting
+        while waiting > 0:
+            incoming += serial.read(waiting)
+            waiting = serial.in_waiting
+
+        now = monotonic()
+        due = now
+        for entry in state['outgoing']:
+            due = max(due, entry[0])
+
+        while True:
+            end = incoming.find(b'\n')
+            if end < 0:
+                break
+
+            line = bytes(incoming[:end + 1])
+            del incoming[:end + 1]
+
+            for delay, data in self._inject(line):
+                # responses stay in order, a stall delays all later ones
+                due = max(due, now + delay)
+                state['outgoing'].append([due, data])
+
+    def _available(self):
+        now = monotonic()
+        return sum(len(data) for due, data in self._state['outgoing']
+                   if due <= now)
+
+    def write(self, data):
+        self._check_connection()
+        return self._serial.write(data)
+
+    def read(self, size=1):
+        self._check_connection()
+
+        timeout = self._serial.timeout
+        deadline = None if timeout is None else monotonic() + timeout
+        outgoing = self._state['outgoing']
+
+        while True:
+            self._pull()
+            self._check_connection()
+
+            if len(outgoing) > 0 and outgoing[0][0] <= monotonic():
+                break
+
+            if deadline is not None and monotonic() >= deadline:
+                return b''
+
+            sleep(2e-4)
+
+        result = bytearray()
+        now = monotonic()
+        while len(outgoing) > 0 and len(result) < size and \
+                outgoing[0][0] <= now:
+            entry = outgoing[0]
+            chunk = entry[1][:size - len(result)]
+            result += chunk
+            entry[1] = entry[1][len(chunk):]
+            if len(entry[1]) == 0:
+                outgoing.popleft()
+
+        return bytes(result)
+
+    @property
+    def in_waiting(self):
+        self._check_connection()
+        self._pull()
+        return self._available()
+
+    def open(self):
+        self._serial.open()
+
+        # reopening after a connection loss drops everything in flight
+        self._state['disconnected'] = False
+        self._state['outgoing'].clear()
+        del self._state['incoming'][:]
+
+    def close(self):
+        self._serial.close()
+
+    def __getattr__(self, name):
+        # the file descriptor would let the line framer wait on the port
+        # directly, bypassing the injected faults
+        if name == 'fileno':
+            raise AttributeError(name)
+
+        return getattr(self._serial, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._serial, name, value)
+
+
+def run_scenario(name, faults, operations=500, seed=0, timeout=0.05,
+                 response_time=2e-4):
+    """
+    Run alternating temperature queries (with retry) and setpoint writes
+    against an emulated controller with injected faults. Failed operations,
+    including writes which are not acknowledged, are counted and do not stop
+    the scenario. Connection losses are
+    recovered by the default reconnect policy.
+
+    Args:
+        name (string): Scenario name
+        faults (dict): Arguments for FaultInjectingSerial
+        operations (int, optional): Number of operations, 500 by default
+        seed (int, optional): Seed of the random generator, 0 by default
+        timeout (float, optional): Device timeout in s, 50 ms by default
+        response_time (float, optional): Response time of the emulated
+            controller in s, 0.2 ms by default
+
+    Returns:
+        ScenarioResult: Latency and throughput
+    """
+    from .emulator import EmulatedSerial
+    from .mtd415t_device import MTD415TDevice
+
+    device = MTD415TDevice('loop://', timeout=timeout, reconnect=True,
+                           max_log_length=0)
+    device._serial = FaultInjectingSerial(
+        EmulatedSerial(response_time=response_time), seed=seed, **faults)
+
+    latency = Histogram()
+    errors = 0
+
+    start = perf_counter()
+    for idx in range(operations):
+        begin = perf_counter()
+        try:
+            if idx % 2 == 0:
+                int(device.query('Te', retry=True))
+            else:
+                value = 20000 + idx % 1000
+                device._written.pop('T', None)
+                device.set('T', value)
+
+                # set does not raise for rejected writes, only acknowledged
+                # ones are recorded
+                if device._written.get('T') != value:
+                    raise ValueError('set not acknowledged')
+        except (ValueError, IOError):
+            errors += 1
+
+        latency.add(perf_counter() - begin)
+    duration = perf_counter() - start
+
+    # percentiles are upper bin edges, they cannot exceed the maximum
+    return ScenarioResult(name, operations, errors, duration,
+                          operations / duration,
+                          min(latency.percentile(50), latency.max),
+                          min(latency.percentile(99), latency.max),
+                          latency.max)
+
+
+def run_scenarios(scenarios=SCENARIOS, **kwargs):
+    """
+    Run a suite of scenarios.
+
+    Args:
+        scenarios (tuple, optional): Scenario names and faults, SCENARIOS by
+            default
+        **kwargs: Arguments for run_scenario
+
+    Returns:
+        list: Results (ScenarioResult)
+    """
+    return [run_scenario(name, faults, **kwargs)
+            for name, faults in scenarios]
+
+
+def main(argv=None, out=None):
+    import argparse
+    import sys
+
+    out = out or sys.stdout
+
+    parser = argparse.ArgumentParser(
+        prog='python -m thorlabs_mtd415t.faults',
+        description='Measure latency and throughput under injected faults.')
+    parser.add_argument('--operations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    out.write('{:<24} {:>7} {:>10} {:>9} {:>9} {:>9}\n'.format(
+        'scenario', 'errors', 'ops/s', 'p50 ms', 'p99 ms', 'max ms'))
+    for result in run_scenarios(operations=args.operations, seed=args.seed,
+                                timeout=args.timeout):
+        out.write('{:<24} {:>7} {:>10.1f} {:>9.3f} {:>9.3f} {:>9.3f}\n'.format(
+            result.name, result.errors, result.throughput, result.p50 * 1e3,
+            result.p99 * 1e3, result.max * 1e3))
+
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
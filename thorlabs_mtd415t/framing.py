@@ -0,0 +1,246 @@
+"""
+This module provides the LineFramer class which splits the byte stream of a
+serial connection into terminated lines.
+
+Instead of reading one byte at a time (as pyserial's readline does), all bytes
+available are read in large chunks into a reusable buffer. Complete lines are
+split off, leftover bytes are kept for subsequent (pipelined) reads.
+
+Example:
+    from serial import serial_for_url
+    from framing import LineFramer
+
+    serial = serial_for_url('/dev/ttyUSB0', baudrate=115200)
+    framer = LineFramer()
+    framer.readline(serial) # => b'15020\\n'
+"""
+
+from contextlib import contextmanager
+from select import select
+from time import monotonic
+
+
+def _fileno(serial):
+    # file descriptor of the port, None if it cannot be waited for
+    fileno = getattr(serial, 'fileno', None)
+    if fileno is None:
+        return None
+
+    try:
+        return fileno()
+    except (IOError, OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _read_timeout(serial, timeout):
+    # yields the file descriptor of ports (POSIX) which are waited for with
+    # select, reconfiguring them is a system call. The read timeout of other
+    # ports is lowered at most once and restored afterwards.
+    fd = _fileno(serial)
+    original = serial.timeout
+    if fd is None and (original is None or original > timeout):
+        serial.timeout = timeout
+
+    try:
+        yield fd
+    finally:
+        if serial.timeout != original:
+            serial.timeout = original
+
+
+class LineFramer(object):
+    """
+    Buffered line framing for serial connections.
+
+    Args:
+        terminator (bytes, optional): Line terminator, b'\\n' by default
+        chunk_size (int, optional): Maximum number of bytes read at once,
+            4096 by default
+    """
+
+    def __init__(self, terminator=b'\n', chunk_size=4096):
+        self._buffer = bytearray()
+        self._terminator = terminator
+        self._chunk_size = chunk_size
+
+        # position up to which the buffer is known to contain no terminator
+        self._scanned = 0
+
+        # drop the next line, its beginning has already been discarded
+        self._skip_line = False
+
+    def feed(self, data):
+        """
+        Append received data to the buffer.
+
+        Args:
+            data (bytes): Received data
+        """
+        self._buffer += data
+
+    def pop_line(self):
+        """
+        Remove the next complete line from the buffer.
+
+        Returns:
+            bytes: Line including terminator, None if there is no complete line
+        """
+        buffer = self._buffer
+        idx = buffer.find(self._terminator, self._scanned)
+
+        if idx < 0:
+            self._scanned = max(0, len(buffer) - len(self._terminator) + 1)
+            return None
+
+        end = idx + len(self._terminator)
+        line = bytes(buffer[:end])
+        del buffer[:end]
+        self._scanned = 0
+
+        if self._skip_line:
+            self._skip_line = False
+            return self.pop_line()
+
+        return line
+
+    def pop_lines(self):
+        """
+        Remove all complete lines from the buffer.
+
+        Returns:
+            list: Lines including terminators
+        """
+        lines = []
+        line = self.pop_line()
+        while line is not None:
+            lines.append(line)
+            line = self.pop_line()
+
+        return lines
+
+    def fill(self, serial):
+        """
+        Read all bytes currently available (at least one) into the buffer.
+
+        Args:
+            serial: Serial connection, e. g. serial.Serial instance
+
+        Returns:
+            int: Number of bytes read, 0 if the read timed out
+        """
+        size = min(max(1, serial.in_waiting), self._chunk_size)
+        chunk = serial.read(size)
+        self._buffer += chunk
+
+        return len(chunk)
+
+    def readline(self, serial, timeout=None):
+        """
+        Read the next line from a serial connection.
+
+        Without timeout, the partial line read so far is returned if the read
+        of the serial connection times out (like pyserial's readline). With
+        timeout, partial lines are kept in the buffer and the read timeout of
+        the serial connection is left unchanged.
+
+        Args:
+            serial: Serial connection, e. g. serial.Serial instance
+            timeout (float, optional): Deadline for the complete line in s
+
+        Returns:
+            bytes: Line including terminator, None if the deadline has passed
+        """
+        line = self.pop_line()
+        if line is not None:
+            return line
+
+        if timeout is None:
+            while line is None:
+                if self.fill(serial) == 0:
+                    return self.clear()
+
+                line = self.pop_line()
+
+            return line
+
+        deadline = monotonic() + timeout
+
+        with _read_timeout(serial, timeout) as fd:
+            while True:
+                if fd is not None:
+                    remaining = deadline - monotonic()
+                    if remaining <= 0 or \
+                            len(select([fd], [], [], remaining)[0]) == 0:
+                        return None
+
+                if self.fill(serial) > 0:
+                    line = self.pop_line()
+                    if line is not None:
+                        return line
+
+                if monotonic() >= deadline:
+                    return None
+
+    def discard(self, serial=None, quiet=0):
+        """
+        Remove all buffered bytes and, if a serial connection is given, all
+        bytes already received by it. If the removed bytes end with a partial
+        line, the remainder of that line is dropped once it arrives.
+
+        Args:
+            serial (optional): Serial connection, e. g. serial.Serial instance
+            quiet (float, optional): Also remove bytes arriving later until
+                the connection has been quiet for this time in s, e. g. late
+                responses after a timeout
+
+        Returns:
+            bytes: Removed bytes
+        """
+        if serial is not None:
+            while serial.in_waiting > 0:
+                self.fill(serial)
+
+            if quiet > 0:
+                self._drain(serial, quiet)
+
+        data = self.clear()
+        if len(data) > 0 and not data.endswith(self._terminator):
+            self._skip_line = True
+
+        return data
+
+    def _drain(self, serial, quiet):
+        last = monotonic()
+
+        with _read_timeout(serial, quiet) as fd:
+            while True:
+                remaining = last + quiet - monotonic()
+                if remaining <= 0:
+                    return
+
+                if fd is not None and \
+                        len(select([fd], [], [], remaining)[0]) == 0:
+                    return
+
+                if self.fill(serial) > 0:
+                    last = monotonic()
+
+    def clear(self):
+        """
+        Remove all buffered bytes.
+
+        Returns:
+            bytes: Removed bytes
+        """
+        data = bytes(self._buffer)
+        del self._buffer[:]
+        self._scanned = 0
+        self._skip_line = False
+
+        return data
+
+    @property
+    def pending(self):
+        """Number of buffered bytes (int)"""
+        return len(self._buffer)
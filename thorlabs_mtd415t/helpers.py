@@ -6,6 +6,20 @@ Nelson Darkwah Oppong, December 2017
 n@darkwahoppong.com
 """
 
+try:
+    from time import perf_counter_ns, time_ns
+except ImportError:
+    # Python < 3.7
+    from time import perf_counter, time
+
+    def perf_counter_ns():
+        """Value of perf_counter in ns (int)"""
+        return int(perf_counter() * 1e9)
+
+    def time_ns():
+        """Value of time in ns (int)"""
+        return int(time() * 1e9)
+
 
 def validate_is_float_or_int(value, name):
     """
@@ -0,0 +1,266 @@
+"""
+This module provides a small embeddable HTTP server which exposes the status
+of temperature controllers as JSON and as Prometheus metrics.
+
+Responses are served from a snapshot which is refreshed in a background
+thread at a fixed rate. The serial traffic therefore does not depend on the
+number of clients or requests. Only the standard library is used.
+
+Endpoints:
+    /status: JSON object with the status of all devices
+    /metrics: Prometheus text exposition format
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.http_status import StatusServer
+
+    devices = [MTD415TDevice(port, timeout=0.5) for port in ports]
+    server = StatusServer(devices, port=8415, refresh_interval=2.0)
+    server.start()
+    ...
+    server.stop()
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from time import monotonic, time
+
+# metric name, help text and status key of numeric values
+_METRICS = (
+    ('mtd415t_temperature_celsius', 'Current temperature in degree C.',
+     'temp'),
+    ('mtd415t_temperature_setpoint_celsius',
+     'Temperature setpoint in degree C.', 'temp_setpoint'),
+    ('mtd415t_tec_current_amperes', 'TEC current in A.', 'tec_current'),
+    ('mtd415t_tec_voltage_volts', 'TEC voltage in V.', 'tec_voltage')
+)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+class SnapshotCache(object):
+    """
+    Status of many devices, refreshed in a background thread. The JSON and
+    metrics representations are rendered once per refresh.
+
+    Args:
+        devices (list): Temperature controllers (MTD415TDevice)
+        refresh_interval (float, optional): Refresh interval in s, 1 by
+            default
+    """
+
+    def __init__(self, devices, refresh_interval=1.0):
+        self._devices = list(devices)
+        self._refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._entries = [{'port': self._port(device), 'status': None,
+                          'error': None, 'time': None}
+                         for device in self._devices]
+        self._json = b''
+        self._metrics = b''
+        self._render()
+
+        self._thread = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _port(device):
+        return getattr(device._serial, 'port', None)
+
+    def refresh(self):
+        """Query the status of all devices and render the representations"""
+        for idx, device in enumerate(self._devices):
+            entry = dict(self._entries[idx])
+            try:
+                entry['status'] = device.status()
+                entry['error'] = None
+                entry['time'] = time()
+            except (ValueError, IOError) as e:
+                # keep the last known status, it is marked as stale
+                entry['error'] = str(e)
+
+            self._entries[idx] = entry
+
+        self._render()
+
+    def _render(self):
+        devices = []
+        metrics = {'up': [], 'time': []}
+
+        for entry in self._entries:
+            status = entry['status'] or {}
+            labels = 'port="{}",uid="{}"'.format(
+                _escape(entry['port']), _escape(status.get('uid', '')))
+
+            device = {'port': entry['port'], 'time': entry['time'],
+                      'error': entry['error']}
+            if entry['status'] is not None:
+                device.update(status)
+                device['errors'] = list(status['errors'])
+            devices.append(device)
+
+            up = 1 if entry['status'] is not None and entry['error'] is None \
+                else 0
+            metrics['up'].append('mtd415t_up{{{}}} {}'.format(labels, up))
+            if entry['time'] is not None:
+                metrics['time'].append(
+                    'mtd415t_last_update_timestamp_seconds{{{}}} {!r}'.format(
+                        labels, entry['time']))
+
+            for name, _, key in _METRICS:
+                if key in status:
+                    metrics.setdefault(name, []).append(
+                        '{}{{{}}} {!r}'.format(name, labels, status[key]))
+
+            for error in status.get('errors', ()):
+                metrics.setdefault('error', []).append(
+                    'mtd415t_error{{{},error="{}"}} 1'.format(
+                        labels, _escape(error)))
+
+        lines = [
+            '# HELP mtd415t_up Whether the last status query succeeded.',
+            '# TYPE mtd415t_up gauge'
+        ] + metrics['up'] + [
+            '# HELP mtd415t_last_update_timestamp_seconds Time of the last '
+            'successful status query.',
+            '# TYPE mtd415t_last_update_timestamp_seconds gauge'
+        ] + metrics['time']
+
+        for name, help_text, _ in _METRICS:
+            lines.extend(['# HELP {} {}'.format(name, help_text),
+                          '# TYPE {} gauge'.format(name)])
+            lines.extend(metrics.get(name, ()))
+
+        lines.extend(['# HELP mtd415t_error Active errors of the device.',
+                      '# TYPE mtd415t_error gauge'])
+        lines.extend(metrics.get('error', ()))
+
+        json_body = json.dumps({'time': time(), 'devices': devices},
+                               sort_keys=True).encode('utf-8')
+        metrics_body = ('\n'.join(lines) + '\n').encode('utf-8')
+
+        with self._lock:
+            self._json = json_body
+            self._metrics = metrics_body
+
+    def start(self):
+        """Refresh periodically in a background thread"""
+        if self._thread is not None:
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = monotonic()
+            self.refresh()
+            self._stop.wait(max(0, self._refresh_interval -
+                                (monotonic() - start)))
+
+    def stop(self):
+        """Stop the background thread"""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    @property
+    def json(self):
+        """Status of all devices as JSON (bytes)"""
+        with self._lock:
+            return self._json
+
+    @property
+    def metrics(self):
+        """Status of all devices as Prometheus metrics (bytes)"""
+        with self._lock:
+            return self._metrics
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        cache = self.server.cache
+        path = self.path.split('?', 1)[0]
+
+        if path == '/status':
+            self._respond(cache.json, 'application/json')
+        elif path == '/metrics':
+            self._respond(cache.metrics, 'text/plain; version=0.0.4')
+        else:
+            self._respond(b'not found\n', 'text/plain', 404)
+
+    def _respond(self, body, content_type, code=200):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # do not write a line to stderr for every request
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StatusServer(object):
+    """
+    HTTP server for the status of temperature controllers.
+
+    Args:
+        devices (list): Temperature controllers (MTD415TDevice)
+        host (string, optional): Listening address, '127.0.0.1' by default
+        port (int, optional): Listening port, 8415 by default, 0 picks a free
+            port
+        refresh_interval (float, optional): Refresh interval of the status
+            in s, 1 by default
+    """
+
+    def __init__(self, devices, host='127.0.0.1', port=8415,
+                 refresh_interval=1.0):
+        self.cache = SnapshotCache(devices, refresh_interval)
+
+        self._server = _Server((host, port), _Handler)
+        self._server.cache = self.cache
+        self._thread = None
+
+    @property
+    def address(self):
+        """Listening address and port (tuple)"""
+        return self._server.server_address
+
+    def start(self):
+        """Start refreshing and serving in background threads"""
+        self.cache.start()
+
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def serve_forever(self):
+        """Start refreshing and serve requests in the calling thread"""
+        self.cache.start()
+        self._server.serve_forever()
+
+    def stop(self):
+        """Stop serving and refreshing"""
+        self._server.shutdown()
+        self._server.server_close()
+        self.cache.stop()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
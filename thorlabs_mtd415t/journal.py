@@ -0,0 +1,429 @@
+"""
+This module provides the Journal class, a durable append-only audit trail of
+the configuration changes of devices (set, save and clear errors), and tools
+to rebuild the configuration of a device as of any time.
+
+Entries of all attached devices and threads are handed over to a background
+thread which writes them in group commits: all entries pending within
+max_delay are written and synced to disk with a single fsync. Commands do not
+wait for the disk unless wait is enabled, entries are durable at most
+max_delay (plus the time of the fsync) after the command.
+
+File format: an 8 byte magic and a version, followed by records. Each record
+has a CRC32, the device number, the kind, the wall clock time in ns and the
+payload. Devices are described by a 'device' record with port and uid when
+they are attached. A record which was not completely written (e. g. power
+loss during a commit) ends the journal and is truncated when the journal is
+opened again.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.journal import Journal, configuration
+
+    with Journal('/var/lib/mtd415t/journal') as journal:
+        temp_controller = MTD415TDevice('/dev/ttyUSB0')
+        journal.attach(temp_controller)
+        temp_controller.temp_setpoint = 20.0
+
+    configuration('/var/lib/mtd415t/journal', 'M00412345', until=time())
+    # => {'temp_setpoint': 20.0}
+
+    # python -m thorlabs_mtd415t.journal /var/lib/mtd415t/journal \\
+    #     --device M00412345 --until 2024-05-01T12:00:00
+"""
+
+import json
+import os
+import struct
+import threading
+import zlib
+from . import settings
+from .helpers import time_ns
+
+_MAGIC = b'MTD415TJ'
+_VERSION = 1
+_HEADER = struct.Struct('<8sH')
+
+# CRC32 of the rest of the record, device number, kind, wall clock time in
+# ns, payload length
+_RECORD = struct.Struct('<IHBqH')
+_VALUE = struct.Struct('<i')
+
+KINDS = ('device', 'set', 'save', 'clear_errors')
+_KIND_CODES = dict((kind, code) for code, kind in enumerate(KINDS))
+
+_BY_COMMAND = dict((setting.command, setting)
+                   for setting in settings.SETTINGS)
+
+
+def _pack(index, kind, wall_ns, payload):
+    body = _RECORD.pack(0, index, _KIND_CODES[kind], wall_ns,
+                        len(payload))[4:] + payload
+    return struct.pack('<I', zlib.crc32(body)) + body
+
+
+def _records(f):
+    # yields (end offset, index, kind, wall clock time in ns, payload) of
+    # the valid records
+    offset = f.tell()
+
+    while True:
+        header = f.read(_RECORD.size)
+        if len(header) < _RECORD.size:
+            return
+
+        crc, index, code, wall_ns, length = _RECORD.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or \
+                zlib.crc32(header[4:] + payload) != crc or \
+                code >= len(KINDS):
+            return
+
+        offset += _RECORD.size + length
+        yield offset, index, KINDS[code], wall_ns, payload
+
+
+def _check_header(f, path):
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != _MAGIC:
+        raise ValueError('{} is not a journal'.format(path))
+
+
+class Journal(object):
+    """
+    Append-only journal of configuration changes with group commits.
+
+    Args:
+        path (string): Journal file, created if needed, entries are appended
+        max_delay (float, optional): Time in s entries are collected for a
+            group commit, 10 ms by default
+        max_batch (int, optional): Number of entries which are committed
+            without waiting for max_delay, 1000 by default
+        wait (boolean, optional): Commands wait until their entry is durable,
+            False by default
+    """
+
+    def __init__(self, path, max_delay=0.01, max_batch=1000, wait=False):
+        self._path = path
+        self._max_delay = max_delay
+        self._max_batch = max_batch
+        self._wait = wait
+
+        self._file = self._open(path)
+        self._devices = 0
+
+        self._pending = []
+        self._sequence = 0
+        self._committed = 0
+        self._error = None
+        self._stopping = False
+        self._cond = threading.Condition()
+
+        self.commits = 0
+
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @staticmethod
+    def _open(path):
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            f = open(path, 'wb')
+            f.write(_HEADER.pack(_MAGIC, _VERSION))
+            f.flush()
+            os.fsync(f.fileno())
+            return f
+
+        # drop a record which was not completely written
+        with open(path, 'rb') as f:
+            _check_header(f, path)
+            end = _HEADER.size
+            for end, _, _, _, _ in _records(f):
+                pass
+
+        f = open(path, 'r+b')
+        f.truncate(end)
+        f.seek(end)
+        return f
+
+    def attach(self, device, uid=None):
+        """
+        Journal the configuration changes of a device.
+
+        Args:
+            device (MTD415TDevice): Device
+            uid (string, optional): Unique device identifier, queried from
+                the device by default
+        """
+        if uid is None:
+            uid = device.uid
+
+        with self._cond:
+            index = self._devices
+            self._devices += 1
+
+        self.put(index, 'device', {'port': getattr(device, '_port', None),
+                                   'uid': uid})
+
+        device._journal = self
+        device._journal_index = index
+
+    def put(self, index, kind, setting=None, value=None):
+        """
+        Hand over an entry. Called by the devices.
+
+        Args:
+            index (int): Device number
+            kind (string): Entry kind, see KINDS
+            setting (string, optional): Setting name (command) of 'set'
+                entries, or the device description of 'device' entries
+            value (int, optional): Raw value of 'set' entries
+
+        Raises:
+            IOError: If a commit failed or the journal has been closed, the
+                journal does not accept entries afterwards
+        """
+        if kind == 'device':
+            payload = json.dumps(setting).encode('utf-8')
+        elif kind == 'set':
+            if type(setting) == bytes:
+                setting = setting.decode('ascii')
+            payload = _VALUE.pack(int(value)) + setting.encode('ascii')
+        else:
+            payload = b''
+
+        record = _pack(index, kind, time_ns(), payload)
+
+        with self._cond:
+            if self._error is not None:
+                raise IOError('journal commit failed: {}'.format(
+                    self._error))
+
+            # the background thread would never commit the entry
+            if self._stopping:
+                raise IOError('journal has been closed')
+
+            self._sequence += 1
+            sequence = self._sequence
+            self._pending.append(record)
+
+            if len(self._pending) == 1 or \
+                    len(self._pending) >= self._max_batch:
+                self._cond.notify_all()
+
+            if self._wait:
+                self._wait_for(sequence)
+
+    def _wait_for(self, sequence):
+        # called with the condition held
+        while self._committed < sequence and self._error is None:
+            self._cond.wait()
+
+        if self._error is not None:
+            raise IOError('journal commit failed: {}'.format(self._error))
+
+    def _run(self):
+        cond = self._cond
+
+        while True:
+            with cond:
+                while len(self._pending) == 0 and not self._stopping:
+                    cond.wait()
+
+                if len(self._pending) == 0:
+                    return
+
+                # collect further entries for the group commit
+                if len(self._pending) < self._max_batch and \
+                        not self._stopping:
+                    cond.wait(self._max_delay)
+
+                batch, self._pending = self._pending, []
+                sequence = self._sequence
+
+            try:
+                self._file.write(b''.join(batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except (IOError, OSError) as e:
+                with cond:
+                    self._error = e
+                    cond.notify_all()
+                return
+
+            with cond:
+                self._committed = sequence
+                self.commits += 1
+                cond.notify_all()
+
+    def flush(self):
+        """
+        Wait until all entries handed over so far are durable.
+
+        Raises:
+            IOError: If a commit failed
+        """
+        with self._cond:
+            self._wait_for(self._sequence)
+
+    def close(self):
+        """Commit all handed over entries and stop the background thread"""
+        if self._thread is None:
+            return
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+        self._thread.join()
+        self._thread = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_journal(path):
+    """
+    Read the entries of a journal, oldest first.
+
+    Args:
+        path (string): Journal file
+
+    Yields:
+        dict: Entry with 'time' (s), 'port', 'uid', 'kind' and for 'set'
+            entries 'setting' (property name or command) and 'value'
+
+    Raises:
+        ValueError: If the file is not a journal
+    """
+    devices = {}
+
+    with open(path, 'rb') as f:
+        _check_header(f, path)
+
+        for _, index, kind, wall_ns, payload in _records(f):
+            if kind == 'device':
+                devices[index] = json.loads(payload.decode('utf-8'))
+                continue
+
+            device = devices.get(index, {})
+            entry = {
+                'time': wall_ns / 1e9,
+                'port': device.get('port'),
+                'uid': device.get('uid'),
+                'kind': kind
+            }
+
+            if kind == 'set':
+                raw = _VALUE.unpack(payload[:_VALUE.size])[0]
+                command = payload[_VALUE.size:].decode('ascii')
+                setting = _BY_COMMAND.get(command)
+
+                if setting is None:
+                    entry['setting'], entry['value'] = command, raw
+                else:
+                    entry['setting'] = setting.name
+                    entry['value'] = setting.from_raw(raw)
+
+            yield entry
+
+
+def configuration(path, device, until=None, saved=False):
+    """
+    Rebuild the configuration of a device from a journal.
+
+    Args:
+        path (string): Journal file
+        device (string): Unique device identifier or port
+        until (float, optional): Time (epoch seconds) of the configuration,
+            the end of the journal by default
+        saved (boolean, optional): Return the configuration saved to
+            non-volatile memory instead of the active one
+
+    Returns:
+        dict: Values by property name of the settings written through the
+            journal
+    """
+    active = {}
+    stored = {}
+
+    for entry in read_journal(path):
+        if until is not None and entry['time'] > until:
+            break
+
+        if device not in (entry['uid'], entry['port']):
+            continue
+
+        if entry['kind'] == 'set':
+            active[entry['setting']] = entry['value']
+        elif entry['kind'] == 'save':
+            stored = dict(active)
+
+    return stored if saved else active
+
+
+def _parse_time(value):
+    try:
+        return float(value)
+    except ValueError:
+        from datetime import datetime
+
+        if hasattr(datetime, 'fromisoformat'):
+            return datetime.fromisoformat(value).timestamp()
+
+        # Python < 3.7
+        for fmt in ('%Y-%m-%dT%H:%M:%S.%f', '%Y-%m-%dT%H:%M:%S',
+                    '%Y-%m-%d %H:%M:%S', '%Y-%m-%d'):
+            try:
+                return datetime.strptime(value, fmt).timestamp()
+            except ValueError:
+                pass
+
+        raise ValueError('invalid time {!r}'.format(value))
+
+
+def main(argv=None, out=None):
+    import argparse
+    import sys
+
+    out = out or sys.stdout
+
+    parser = argparse.ArgumentParser(
+        prog='python -m thorlabs_mtd415t.journal',
+        description='Show a configuration journal or rebuild the '
+                    'configuration of a device.')
+    parser.add_argument('path', help='journal file')
+    parser.add_argument('--device', help='uid or port, print the '
+                        'configuration of the device')
+    parser.add_argument('--until', help='time of the configuration, epoch '
+                        'seconds or ISO 8601 (default: end of the journal)')
+    parser.add_argument('--saved', action='store_true',
+                        help='configuration saved to non-volatile memory')
+    args = parser.parse_args(argv)
+
+    try:
+        until = None if args.until is None else _parse_time(args.until)
+
+        if args.device is None:
+            for entry in read_journal(args.path):
+                if until is not None and entry['time'] > until:
+                    break
+                out.write(json.dumps(entry, sort_keys=True) + '\n')
+        else:
+            config = configuration(args.path, args.device, until, args.saved)
+            out.write(json.dumps(config, sort_keys=True, indent=2) + '\n')
+    except (IOError, ValueError) as e:
+        sys.stderr.write('journal: error: {}\n'.format(e))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
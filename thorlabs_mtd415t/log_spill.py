@@ -0,0 +1,375 @@
+"""
+This module provides the LogSpiller class which writes the complete I/O log
+of devices to size-rotated binary files in a background thread, together
+with a reader and a converter to JSON lines.
+
+Log entries are handed over through a deque (append and popleft are atomic)
+without locks, the command path never waits for disk I/O. If the writer
+cannot keep up, entries beyond max_pending are dropped and counted.
+
+File format: an 8 byte magic and a version, followed by records. Each
+record has the device number, the kind, the wall clock time and the
+perf_counter time in ns and the content. The port of each device is written
+as a 'device' record at the beginning of every file, so that each file can
+be read on its own.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.log_spill import LogSpiller, read_spill
+
+    with LogSpiller('/var/log/mtd415t', max_bytes=16 * 2**20) as spiller:
+        temp_controller = MTD415TDevice('/dev/ttyUSB0')
+        spiller.attach(temp_controller)
+        ...
+
+    for entry in read_spill('/var/log/mtd415t'):
+        entry['kind'], entry['content'] # => 'write', b'Te?\\n'
+
+    # python -m thorlabs_mtd415t.log_spill /var/log/mtd415t > log.jsonl
+"""
+
+import json
+import os
+import struct
+import threading
+from collections import deque
+
+from .helpers import perf_counter_ns, time_ns
+
+_MAGIC = b'MTD415TL'
+_VERSION = 1
+_HEADER = struct.Struct('<8sH')
+
+# device number, kind, wall clock time in ns, perf_counter time in ns,
+# content length
+_RECORD = struct.Struct('<HBqqI')
+
+KINDS = ('device', 'write', 'read', 'discard', 'reconnect')
+_KIND_CODES = dict((kind, code) for code, kind in enumerate(KINDS))
+
+# kinds with bytes content, others are stored as JSON
+_BINARY_KINDS = ('write', 'read', 'discard')
+
+_SUFFIX = '.spill'
+
+
+def _spill_files(directory, prefix):
+    files = []
+    for name in os.listdir(directory):
+        if not name.startswith(prefix + '.') or not name.endswith(_SUFFIX):
+            continue
+
+        number = name[len(prefix) + 1:-len(_SUFFIX)]
+        if number.isdigit():
+            files.append((int(number), os.path.join(directory, name)))
+
+    return [path for _, path in sorted(files)]
+
+
+class LogSpiller(object):
+    """
+    Background writer of device logs to rotating binary files.
+
+    Args:
+        directory (string): Directory of the files, created if needed
+        prefix (string, optional): File name prefix, 'mtd415t' by default
+        max_bytes (int, optional): Size after which a new file is started,
+            16 MiB by default
+        backup_count (int, optional): Number of files kept including the
+            current one (>= 1), the oldest are removed, 10 by default
+        flush_interval (float, optional): Interval in s at which handed over
+            entries are written, 0.1 by default
+        max_pending (int, optional): Maximum number of entries waiting to be
+            written, 100000 by default
+    """
+
+    def __init__(self, directory, prefix='mtd415t', max_bytes=16 * 2**20,
+                 backup_count=10, flush_interval=0.1, max_pending=100000):
+        if backup_count < 1:
+            raise ValueError('backup_count must be at least 1')
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        self._directory = directory
+        self._prefix = prefix
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+
+        self._pending = deque()
+        self._ports = []
+        self.dropped = 0
+
+        existing = _spill_files(directory, prefix)
+        self._number = int(os.path.basename(existing[-1])[
+            len(prefix) + 1:-len(_SUFFIX)]) if len(existing) > 0 else 0
+        self._file = None
+        self._size = 0
+
+        self._stopping = False
+        self._error = None
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def attach(self, device):
+        """
+        Spill the log of a device. Entries are spilled independent of the
+        maximum log length of the device.
+
+        Args:
+            device (SerialDevice): Device
+        """
+        index = len(self._ports)
+        self._ports.append(getattr(device._serial, 'port', None))
+        self.put(index, 'device', self._ports[index])
+
+        device._spill = self
+        device._spill_index = index
+
+    def put(self, index, kind, content):
+        """
+        Hand over a log entry, never blocks. Called by the devices.
+
+        Args:
+            index (int): Device number
+            kind (string): Entry kind, see KINDS
+            content: Entry content, bytes or JSON serializable
+        """
+        if len(self._pending) >= self._max_pending:
+            self.dropped += 1
+            return
+
+        self._pending.append((index, kind, time_ns(), perf_counter_ns(),
+                              content))
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._wake.wait(self._flush_interval)
+                self._wake.clear()
+                self._drain()
+
+            self._drain()
+        except Exception as e:
+            # raised by flush and close, later entries are not written
+            self._error = e
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+
+        self._number += 1
+        path = os.path.join(self._directory, '{}.{:06d}{}'.format(
+            self._prefix, self._number, _SUFFIX))
+        self._file = open(path, 'wb')
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+        self._size = _HEADER.size
+
+        for path in _spill_files(self._directory, self._prefix)[
+                :-self._backup_count]:
+            os.remove(path)
+
+        # every file starts with the ports of all devices
+        now, counter = time_ns(), perf_counter_ns()
+        for index, port in enumerate(self._ports):
+            self._write_record(index, 'device', now, counter, port)
+
+    def _write_record(self, index, kind, wall_ns, counter_ns, content):
+        if kind in _BINARY_KINDS:
+            data = bytes(content)
+        else:
+            data = json.dumps(content).encode('utf-8')
+
+        record = _RECORD.pack(index, _KIND_CODES.get(kind, 255), wall_ns,
+                              counter_ns, len(data)) + data
+        self._file.write(record)
+        self._size += len(record)
+
+    def _drain(self):
+        pending = self._pending
+
+        while len(pending) > 0:
+            item = pending.popleft()
+
+            if isinstance(item, threading.Event):
+                # flush marker
+                if self._file is not None:
+                    self._file.flush()
+                item.set()
+                continue
+
+            if self._file is None:
+                self._open_next()
+
+            self._write_record(*item)
+
+            if self._size >= self._max_bytes:
+                self._open_next()
+
+        if self._file is not None:
+            self._file.flush()
+
+    def flush(self):
+        """
+        Write all entries handed over so far, blocks until written.
+
+        Raises:
+            Exception: Error of the background thread, e. g. IOError
+        """
+        done = threading.Event()
+        self._pending.append(done)
+        self._wake.set()
+
+        # a failed background thread never sets the marker
+        thread = self._thread
+        while not done.wait(0.1):
+            if thread is None or not thread.is_alive():
+                break
+
+        self._raise_error()
+
+    def close(self):
+        """
+        Write all handed over entries and stop the background thread.
+
+        Raises:
+            Exception: Error of the background thread, e. g. IOError
+        """
+        if self._thread is None:
+            return
+
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def pending(self):
+        """Number of entries waiting to be written (int)"""
+        return len(self._pending)
+
+
+def read_spill(path, prefix='mtd415t'):
+    """
+    Read the entries of a spill file or of all spill files in a directory,
+    oldest first.
+
+    Args:
+        path (string): File or directory
+        prefix (string, optional): File name prefix in a directory,
+            'mtd415t' by default
+
+    Yields:
+        dict: Entry with 'port', 'kind', 'time' (s), 'monotonic_ns' and
+            'content'
+    """
+    paths = _spill_files(path, prefix) if os.path.isdir(path) else [path]
+
+    for file_path in paths:
+        ports = {}
+
+        with open(file_path, 'rb') as f:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size or \
+                    _HEADER.unpack(header)[0] != _MAGIC:
+                raise ValueError('{} is not a spill file'.format(file_path))
+
+            while True:
+                record = f.read(_RECORD.size)
+                if len(record) < _RECORD.size:
+                    break
+
+                index, code, wall_ns, counter_ns, length = \
+                    _RECORD.unpack(record)
+                data = f.read(length)
+                if len(data) < length:
+                    # the writer was interrupted
+                    break
+
+                kind = KINDS[code] if code < len(KINDS) else 'unknown'
+                content = data if kind in _BINARY_KINDS \
+                    else json.loads(data.decode('utf-8'))
+
+                if kind == 'device':
+                    ports[index] = content
+                    continue
+
+                yield {
+                    'port': ports.get(index),
+                    'kind': kind,
+                    'time': wall_ns / 1e9,
+                    'monotonic_ns': counter_ns,
+                    'content': content
+                }
+
+
+def convert(path, out, prefix='mtd415t'):
+    """
+    Convert spill files to JSON lines, bytes content is written as string
+    with escaped non-printable characters.
+
+    Args:
+        path (string): File or directory
+        out (file): Text stream
+        prefix (string, optional): File name prefix in a directory,
+            'mtd415t' by default
+
+    Returns:
+        int: Number of converted entries
+    """
+    count = 0
+    for entry in read_spill(path, prefix):
+        if type(entry['content']) == bytes:
+            entry['content'] = entry['content'].decode('ascii',
+                                                       'backslashreplace')
+
+        out.write(json.dumps(entry, sort_keys=True) + '\n')
+        count += 1
+
+    return count
+
+
+def main(argv=None, out=None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(
+        prog='python -m thorlabs_mtd415t.log_spill',
+        description='Convert spilled device logs to JSON lines.')
+    parser.add_argument('path', help='spill file or directory')
+    parser.add_argument('--prefix', default='mtd415t')
+    args = parser.parse_args(argv)
+
+    try:
+        convert(args.path, out or sys.stdout, args.prefix)
+    except (IOError, ValueError) as e:
+        sys.stderr.write('log_spill: error: {}\n'.format(e))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
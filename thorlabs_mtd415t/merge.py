@@ -0,0 +1,246 @@
+"""
+This module provides the time-ordered merge of telemetry from many devices
+into a single stream, e. g. for fleet-level writers.
+
+merge combines finished, time-ordered iterables (e. g. ReadingArrays or
+spilled logs) with a heap, holding one item per source. StreamMerger combines
+live sources, e. g. polling threads: items are buffered in a heap and
+released once the watermark, the oldest latest timestamp of all active
+sources, has passed them. Sources without items for longer than max_lateness
+are considered slow and do not hold back the others, their items are late if
+they arrive behind the released stream. Memory is bounded by max_buffered.
+
+Example:
+    from thorlabs_mtd415t.merge import StreamMerger, merge
+
+    for index, reading in merge([temps_a, temps_b]):
+        write(index, reading)
+
+    merger = StreamMerger(len(devices), max_lateness=2.0)
+    # polling threads call merger.put(index, reading), merger.close(index)
+    for index, reading in merger:
+        write(index, reading)
+"""
+
+import heapq
+import itertools
+import threading
+from collections import deque
+from time import monotonic
+
+
+def _timestamp(item):
+    # Reading objects and lists of readings, dicts of logs and spills
+    if isinstance(item, dict):
+        return item['time']
+    if isinstance(item, (list, tuple)):
+        item = item[0]
+
+    return item.timestamp
+
+
+def merge(sources, key=None):
+    """
+    Merge time-ordered iterables into one time-ordered stream. Items with the
+    same time keep the order of the sources.
+
+    Args:
+        sources (list): Iterables, each ordered by time
+        key (callable, optional): Time of an item, the timestamp of readings
+            (or of the first reading of lists) and 'time' of dicts by default
+
+    Yields:
+        tuple: Source index and item
+    """
+    key = key or _timestamp
+
+    heap = []
+    for index, source in enumerate(sources):
+        iterator = iter(source)
+        for item in iterator:
+            heap.append((key(item), index, item, iterator))
+            break
+    heapq.heapify(heap)
+
+    while len(heap) > 0:
+        _, index, item, iterator = heap[0]
+        yield index, item
+
+        for item in iterator:
+            heapq.heapreplace(heap, (key(item), index, item, iterator))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+class StreamMerger(object):
+    """
+    Time-ordered merge of live sources with watermarks. put and close may be
+    called from any thread, items are consumed with get or by iterating.
+
+    Args:
+        sources (int): Number of sources, indices start at 0
+        key (callable, optional): Time of an item, see merge
+        max_lateness (float, optional): Time in s without items after which a
+            source is slow and no longer holds back the stream, 1 by default
+        max_buffered (int, optional): Maximum number of buffered items, the
+            oldest are released early if exceeded, 10000 by default
+        late (string, optional): 'drop' (default) or 'emit' items which
+            arrive behind the released stream
+
+    Attributes:
+        late_count (int): Number of late items
+    """
+
+    def __init__(self, sources, key=None, max_lateness=1.0,
+                 max_buffered=10000, late='drop'):
+        if late not in ('drop', 'emit'):
+            raise ValueError("late must be 'drop' or 'emit'")
+
+        self._key = key or _timestamp
+        self._max_lateness = max_lateness
+        self._max_buffered = max_buffered
+        self._late = late
+
+        self._heap = []
+        self._counter = itertools.count()
+        self._ready = deque()
+
+        now = monotonic()
+        self._high = [None] * sources
+        self._last_put = [now] * sources
+        self._open = set(range(sources))
+        self._released = None
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+        self.late_count = 0
+
+    def put(self, index, item):
+        """
+        Add an item of a source.
+
+        Args:
+            index (int): Source index
+            item: Item, e. g. a Reading or a list of readings
+        """
+        timestamp = self._key(item)
+
+        with self._lock:
+            self._last_put[index] = monotonic()
+
+            if self._released is not None and timestamp < self._released:
+                self.late_count += 1
+                if self._late == 'emit':
+                    self._ready.append((index, item))
+                    self._changed.notify_all()
+                return
+
+            if self._high[index] is None or timestamp > self._high[index]:
+                self._high[index] = timestamp
+
+            heapq.heappush(self._heap, (timestamp, next(self._counter),
+                                        index, item))
+            self._changed.notify_all()
+
+    def close(self, index):
+        """
+        Mark a source as finished.
+
+        Args:
+            index (int): Source index
+        """
+        with self._lock:
+            self._open.discard(index)
+            self._changed.notify_all()
+
+    def _watermark(self, now):
+        # oldest latest time of the open sources which are not slow, None
+        # if an open source without items still holds back the stream
+        watermark = float('inf')
+        for index in self._open:
+            if now - self._last_put[index] > self._max_lateness:
+                continue
+
+            high = self._high[index]
+            if high is None:
+                return None
+
+            watermark = min(watermark, high)
+
+        return watermark
+
+    def _release(self, now):
+        heap = self._heap
+        watermark = self._watermark(now)
+
+        while len(heap) > 0 and (
+                len(heap) > self._max_buffered or
+                (watermark is not None and heap[0][0] <= watermark)):
+            timestamp, _, index, item = heapq.heappop(heap)
+            self._released = timestamp
+            self._ready.append((index, item))
+
+    def _next_deadline(self, now):
+        # time at which the next open source becomes slow
+        deadlines = [self._last_put[index] + self._max_lateness
+                     for index in self._open]
+        deadlines = [t for t in deadlines if t > now]
+        return min(deadlines) if len(deadlines) > 0 else None
+
+    def get(self, timeout=None):
+        """
+        Wait for the next item of the time-ordered stream.
+
+        Args:
+            timeout (float, optional): Maximum time to wait in s, blocks by
+                default
+
+        Returns:
+            tuple: Source index and item, None if the timeout elapsed or all
+                sources are closed and all items have been consumed
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+
+        with self._lock:
+            while True:
+                now = monotonic()
+                if len(self._ready) == 0:
+                    self._release(now)
+
+                if len(self._ready) > 0:
+                    return self._ready.popleft()
+
+                if len(self._open) == 0 and len(self._heap) == 0:
+                    return None
+
+                if deadline is not None and now >= deadline:
+                    return None
+
+                # wait for put or close, or until a source becomes slow
+                wake = [t for t in (deadline, self._next_deadline(now))
+                        if t is not None]
+                self._changed.wait(min(wake) - now if len(wake) > 0
+                                   else None)
+
+    def __iter__(self):
+        while True:
+            entry = self.get()
+            if entry is None:
+                return
+
+            yield entry
+
+    @property
+    def done(self):
+        """All sources are closed and all items have been consumed
+        (boolean)"""
+        with self._lock:
+            return len(self._open) == 0 and len(self._heap) == 0 and \
+                len(self._ready) == 0
+
+    @property
+    def buffered(self):
+        """Number of items waiting for the watermark (int)"""
+        return len(self._heap)
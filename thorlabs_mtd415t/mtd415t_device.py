@@ -19,10 +19,11 @@ Nelson Darkwah Oppong, December 2017
 n@darkwahoppong.com
 """
 
-from time import sleep
+from time import monotonic, sleep
 
-from .helpers import validate_is_float_or_int, validate_is_in_range
-from .serial_device import SerialDevice
+from . import settings
+from .reading import Reading
+from .serial_device import ConnectionLostError, SerialDevice
 
 
 class MTD415TDevice(SerialDevice):
@@ -35,6 +36,20 @@ class MTD415TDevice(SerialDevice):
         port (string): Serial port, e. g. '/dev/ttyUSB0'
         auto_save (boolean, optional): Enable or disable automatic write to
             non-volatile memory after any change
+        timeout (float, optional): Default deadline for responses in s,
+            reads block until a response arrives by default
+        shared (boolean, optional): Use the connection to the port shared by
+            all device objects of the process (see registry module), False
+            by default
+        reconnect (ReconnectPolicy or boolean, optional): Reconnect
+            automatically after the connection has been lost, e. g. due to a
+            USB reset. The device is identified by its uid and settings
+            written before the connection loss are restored if they differ.
+            True uses the default policy, disabled by default.
+        pacer (AdaptivePacer, optional): Learn and keep the minimum gap
+            between commands instead of retrying after a fixed delay
+        return_readings (boolean, optional): Return Reading objects with raw
+            value, unit and timestamp instead of bare values from getters
     """
 
     # error bits, see MTD415T datasheet, p. 18
@@ -50,11 +65,29 @@ class MTD415TDevice(SerialDevice):
         14: 'invalid command'
     }
 
-    def __init__(self, port, auto_save=False, *args, **kwargs):
+    # precompiled query commands and set command prefixes by setting name
+    _QUERY_COMMANDS = {}
+    _SET_PREFIXES = {}
+
+    def __init__(self, port, auto_save=False, return_readings=False, *args,
+                 **kwargs):
         self._auto_save = auto_save
+        self._return_readings = return_readings
+
+        # product name and unique identifier never change, only query them once
+        self._idn = None
+        self._uid = None
+
+        # values written since the device object was created, by setting
+        self._written = {}
+
+        # audit trail of configuration changes, see journal
+        self._journal = None
+        self._journal_index = None
+
         super(MTD415TDevice, self).__init__(port, baudrate=115200, **kwargs)
 
-    def query(self, setting, retry=False):
+    def query(self, setting, retry=False, timeout=None):
         """
         Retrieve setting
 
@@ -62,23 +95,55 @@ class MTD415TDevice(SerialDevice):
             setting (string): Setting name, generally a single character
             retry (boolean, optional): Retry failed query after 100ms,
                                        False by default
+            timeout (float, optional): Deadline for the response in s, the
+                                       device timeout by default
 
         Returns:
             string: The setting value
-        """
 
-        if type(setting) == str:
-            setting = setting.encode('ascii')
+        Raises:
+            ResponseTimeoutError: If there is no response before the deadline
+        """
 
-        cmd = setting + b'?'
-        result = super(MTD415TDevice, self).query(cmd)
+        cmd = self._query_command(setting)
+        result = super(MTD415TDevice, self).query(cmd, timeout=timeout)
 
         if retry is True and result == b'unknown command\n':
-            sleep(0.1)  # wait 100ms before retrying the same command
-            return self.query(setting, retry=False)
+            # wait 100ms before retrying the same command, the pacer has
+            # already increased the gap before the next write otherwise
+            if self._pacer is None:
+                sleep(0.1)
+
+            return self.query(setting, retry=False, timeout=timeout)
         else:
             return result
 
+    @classmethod
+    def _query_command(cls, setting):
+        # commands are compiled once per setting name (string or bytes)
+        try:
+            return cls._QUERY_COMMANDS[setting]
+        except KeyError:
+            cmd = cls._prefix(setting) + b'?'
+            cls._QUERY_COMMANDS[setting] = cmd
+            return cmd
+
+    @classmethod
+    def _set_command(cls, setting, value):
+        try:
+            prefix = cls._SET_PREFIXES[setting]
+        except KeyError:
+            prefix = cls._SET_PREFIXES[setting] = cls._prefix(setting)
+
+        return prefix + b'%d' % int(value)
+
+    @staticmethod
+    def _prefix(setting):
+        if type(setting) == str:
+            setting = setting.encode('ascii')
+
+        return bytes(setting)
+
     def write(self, data, *args, **kwargs):
         """
         Writes data
@@ -91,243 +156,301 @@ class MTD415TDevice(SerialDevice):
 
         return super(MTD415TDevice, self).write(data, *args, **kwargs)
 
-    def set(self, setting, value):
+    def set(self, setting, value, timeout=None):
         """
         Set a setting to the given integer value
 
         Args:
             setting (string): Setting name, generally single character
             value (int): Set value
+            timeout (float, optional): Deadline for the response in s, the
+                                       device timeout by default
+
+        Raises:
+            ResponseTimeoutError: If there is no response before the deadline
         """
-        value = int(value)
-        cmd = '{}{:d}'.format(setting, value).encode('ascii')
-        self.write(cmd)
+        self._call(self._set, setting, value, timeout)
 
-        # ensure returned data is removed from the buffer
-        self.read()
+    def _set(self, setting, value, timeout):
+        response = self._query(self._set_command(setting, value), timeout)
+        if self._acknowledged(response):
+            self._record_set(setting, value)
 
         if self._auto_save:
-            self.save()
-
-    def save(self):
-        """Save settings to non-volatile memory"""
-        self.write('M')
+            self.save(timeout=timeout)
 
-        # ensure returned data is removed from the buffer
-        self.read()
+    @staticmethod
+    def _acknowledged(response):
+        # set commands are acknowledged with an empty line, rejected ones
+        # are answered with e. g. 'unknown command'
+        return response in (b'\n', b'\r\n')
 
-    def clear_errors(self):
-        """Clears error flags"""
-        self.write('c')
+    def _record_set(self, setting, value):
+        # written values are restored after a reconnect and journaled, also
+        # for writes of the control loop and the reactor
+        if type(setting) == bytes:
+            setting = setting.decode('ascii')
+        self._written[setting] = int(value)
 
-        # ensure returned data is removed from the buffer
-        self.read()
+        if self._journal is not None:
+            self._journal.put(self._journal_index, 'set', setting, value)
 
-    @property
-    def auto_save(self):
-        """Auto save (boolean)"""
-        return self._auto_save
+    def save(self, timeout=None):
+        """
+        Save settings to non-volatile memory
 
-    @auto_save.setter
-    def auto_save(self, value):
-        self._auto_save = (True if value is True else False)
+        Args:
+            timeout (float, optional): Deadline for the response in s, the
+                                       device timeout by default
+        """
+        # the response is discarded
+        self._call(self._query, b'M', timeout)
 
-    @property
-    def idn(self):
-        """Product name and version number (string)"""
-        return self.query('m', True).decode('ascii').strip()
+        if self._journal is not None:
+            self._journal.put(self._journal_index, 'save')
 
-    @property
-    def uid(self):
-        """Unique device identifier (string)"""
-        return self.query('u', True).decode('ascii').strip()
+    def clear_errors(self, timeout=None):
+        """
+        Clears error flags
 
-    @property
-    def error_flags(self):
-        """Error flags from the error register of the device (tuple, LSB
-        first)"""
-        err = int(self.query('E', True).decode('ascii'))
-        return tuple(c == '1' for c in reversed('{:016b}'.format(err)))
+        Args:
+            timeout (float, optional): Deadline for the response in s, the
+                                       device timeout by default
+        """
+        # the response is discarded
+        self._call(self._query, b'c', timeout)
 
-    @property
-    def errors(self):
-        """Errors from the error register of the device (tuple)"""
-        flags = self.error_flags
-        errors = []
-        for idx, err in self._ERRORS.items():
-            if flags[idx] is False:
-                continue
+        if self._journal is not None:
+            self._journal.put(self._journal_index, 'clear_errors')
 
-            errors.append(err)
+    def status(self, timeout=None):
+        """
+        Read identity, temperatures, TEC current and voltage and errors. The
+        values are queried in a single pipelined batch.
 
-        return tuple(errors)
+        Args:
+            timeout (float, optional): Deadline for all responses in s, the
+                                       device timeout by default
 
-    @property
-    def tec_current_limit(self):
-        """TEC current limit in A (float, >= 0.200 and <= 2.000)"""
-        value = self.query('L', True)
-        return float(value) / 1e3
+        Returns:
+            dict: Values by property name ('idn', 'uid', 'temp',
+                'temp_setpoint', 'tec_current', 'tec_voltage', 'errors')
+        """
+        idn, uid = self.idn, self.uid
+
+        settings = ('Te', 'T', 'A', 'U', 'E')
+        responses = self.transact([self._query_command(setting)
+                                   for setting in settings], timeout=timeout)
+
+        values = []
+        for setting, response in zip(settings, responses):
+            # retry individually, e. g. for 'unknown command'
+            try:
+                values.append(int(response))
+            except ValueError:
+                values.append(int(self.query(setting, True, timeout)))
+
+        temp, temp_setpoint, tec_current, tec_voltage, err = values
+
+        return {
+            'idn': idn,
+            'uid': uid,
+            'temp': temp / 1e3,
+            'temp_setpoint': temp_setpoint / 1e3,
+            'tec_current': tec_current / 1e3,
+            'tec_voltage': tec_voltage / 1e3,
+            'errors': self._errors(self._error_flags(err))
+        }
+
+    def read_settings(self, names=None, timeout=None):
+        """
+        Read several settings in a single pipelined batch.
 
-    @tec_current_limit.setter
-    def tec_current_limit(self, value):
-        validate_is_float_or_int(value, 'TEC current limit')
+        Args:
+            names (list, optional): Property names, all readable settings
+                of the settings registry by default
+            timeout (float, optional): Deadline for all responses in s, the
+                                       device timeout by default
 
-        validate_is_in_range(value, 0.2, 2, 'TEC current limit', ' A')
-        value = round(value*1e3)
+        Returns:
+            dict: Values by property name (Reading objects if
+                return_readings is enabled)
 
-        self.set('L', value)
+        Raises:
+            ValueError: If a setting is unknown
+        """
+        if names is None:
+            names = settings.readable()
+        entries = [settings.get(name) for name in names]
 
-    @property
-    def tec_current(self):
-        """TEC current in A (float)"""
-        value = self.query('A', True)
-        return float(value) / 1e3
+        responses = self.transact([setting.query_command
+                                   for setting in entries], timeout=timeout)
+        now = monotonic()
 
-    @property
-    def tec_voltage(self):
-        """TEC voltage in V (float)"""
-        value = self.query('U')
-        return float(value) / 1e3
+        values = {}
+        for setting, response in zip(entries, responses):
+            # retry individually, e. g. for 'unknown command'
+            try:
+                raw = int(response)
+            except ValueError:
+                raw = int(self.query(setting.command, True, timeout))
 
-    @property
-    def temp(self):
-        """Current temperature in ° C (float)"""
-        value = self.query('Te', True)
-        return float(value) / 1e3
+            value = setting.from_raw(raw)
+            if self._return_readings:
+                value = Reading(setting.command, raw, value, setting.unit, now)
 
-    @property
-    def temp_setpoint(self):
-        """Temperature setpoint in ° C (float, >= 5.000 and <= 45.000)"""
-        value = self.query('T', True)
-        return float(value) / 1e3
+            values[setting.name] = value
 
-    @temp_setpoint.setter
-    def temp_setpoint(self, value):
-        validate_is_float_or_int(value, 'Temperature setpoint')
+        return values
 
-        validate_is_in_range(value, 5, 45, 'Temperature setpoint', '° C')
-        value = round(value*1e3)
+    def profile(self, out=None, print_report=True):
+        """
+        Break down the time of the calls within a with block into phases
+        (validation, encoding, write syscall, wait for first byte, readline,
+        decode/parse, retries, auto-save, ...), see profiling module.
 
-        self.set('T', value)
+        Args:
+            out (file, optional): Stream for the report, sys.stdout by
+                default
+            print_report (boolean, optional): Print a report ranked by self
+                time when the block is left, True by default
 
-    @property
-    def status_temp_window(self):
-        """Temperature window for the status pin in K (float, >= 1e-3 and <=
-        32.768)"""
-        value = self.query('W', True)
-        return float(value) / 1e3
+        Returns:
+            Profile: Context manager with the recorded phases
+        """
+        from .profiling import Profile
 
-    @status_temp_window.setter
-    def status_temp_window(self, value):
-        validate_is_float_or_int(value, 'Status temperature window')
+        return Profile(self, out=out, print_report=print_report)
 
-        validate_is_in_range(value, 1e-3, 32.768,
-                             'Status temperature window', '° C')
-        value = round(value*1e3)
+    def _restore_session(self, timeout):
+        deadline = monotonic() + timeout
 
-        self.set('W', value)
+        # make sure the same controller is connected again
+        uid = self._query(self._query_command('u'), timeout)
+        uid = uid.decode('ascii').strip()
+        if self._uid is not None and uid != self._uid:
+            raise ConnectionLostError(
+                'Device {} is connected to {} instead of {}'.format(
+                    uid, self._port, self._uid))
 
-    @property
-    def status_delay(self):
-        """Delay for changing the status pin in s (int, >=1 and <= 32768)"""
-        value = self.query(b'd', True)
-        return int(value)
+        if len(self._written) == 0:
+            return
 
-    @status_delay.setter
-    def status_delay(self, value):
-        validate_is_float_or_int(value, 'Status delay')
+        # only rewrite values which differ, e. g. volatile settings after a
+        # power cycle
+        written = sorted(self._written.items())
+        responses = self._transact(
+            [self._query_command(setting) for setting, _ in written],
+            max(0, deadline - monotonic()))
 
-        value = int(value)
-        validate_is_in_range(value, 1, 32768, 'Status delay', ' s')
+        cmds = []
+        for (setting, value), response in zip(written, responses):
+            try:
+                if int(response) == value:
+                    continue
+            except ValueError:
+                pass
 
-        self.set('d', value)
+            cmds.append(self._set_command(setting, value))
 
-    @property
-    def critical_gain(self):
-        """Critical gain in A/K (float, >=10e-3 and <= 100)"""
-        value = self.query('G', True)
-        return float(value) / 1e3
+        if len(cmds) > 0:
+            self._transact(cmds, max(0, deadline - monotonic()))
 
-    @critical_gain.setter
-    def critical_gain(self, value):
-        validate_is_float_or_int(value, 'Critical gain')
+    def _query_identity(self, setting, attr):
+        value = getattr(self, attr)
 
-        validate_is_in_range(value, 10e-3, 100, 'Critical gain', ' A/K')
-        value = round(value*1e3)
+        if value is None:
+            value = self.query(setting, True).decode('ascii').strip()
 
-        self.set('G', value)
+            # do not memoize empty or failed responses
+            if value != '' and value != 'unknown command':
+                setattr(self, attr, value)
 
-    @property
-    def critical_period(self):
-        """Critical period in s (float, >=100e-3 and <= 100.000)"""
-        value = self.query('O', True)
-        return float(value) / 1e3
+        return value
 
-    @critical_period.setter
-    def critical_period(self, value):
-        validate_is_float_or_int(value, 'Critical period')
+    def _read_value(self, setting, unit, scale=1e3, retry=True):
+        raw = int(self.query(setting, retry))
+        value = raw if scale is None else raw / scale
 
-        validate_is_in_range(value, 100e-3, 100e3, 'Critical period', ' s')
-        value = round(value*1e3)
+        if self._return_readings:
+            return Reading(setting, raw, value, unit, monotonic())
 
-        self.set('O', value)
+        return value
 
     @property
-    def cycling_time(self):
-        """Cycling time in s (float, >= 1e-3 and <= 1.000)"""
-        value = self.query('C', True)
-        return float(value) / 1e3
+    def auto_save(self):
+        """Auto save (boolean)"""
+        return self._auto_save
 
-    @cycling_time.setter
-    def cycling_time(self, value):
-        validate_is_float_or_int(value, 'Cycling time')
+    @auto_save.setter
+    def auto_save(self, value):
+        self._auto_save = (True if value is True else False)
 
-        validate_is_in_range(value, 1e-3, 1, 'Cycling time', ' s')
-        value = round(value*1e3)
+    @property
+    def return_readings(self):
+        """Return Reading objects instead of bare values from getters
+        (boolean)"""
+        return self._return_readings
 
-        self.set('C', value)
+    @return_readings.setter
+    def return_readings(self, value):
+        self._return_readings = (True if value is True else False)
 
     @property
-    def p_gain(self):
-        """Proportional gain in A/K (float, >=0 and <= 100.000)"""
-        value = self.query('P', True)
-        return float(value) / 1e3
+    def idn(self):
+        """Product name and version number (string)"""
+        return self._query_identity('m', '_idn')
 
-    @p_gain.setter
-    def p_gain(self, value):
-        validate_is_float_or_int(value, 'P gain')
+    @property
+    def uid(self):
+        """Unique device identifier (string)"""
+        return self._query_identity('u', '_uid')
 
-        validate_is_in_range(value, 0, 100, 'P gain', ' A/K')
-        value = round(value*1e3)
+    @property
+    def error_flags(self):
+        """Error flags from the error register of the device (tuple, LSB
+        first)"""
+        err = int(self.query('E', True).decode('ascii'))
+        return self._error_flags(err)
 
-        self.set('P', value)
+    @staticmethod
+    def _error_flags(err):
+        return tuple(c == '1' for c in reversed('{:016b}'.format(err)))
 
     @property
-    def i_gain(self,):
-        """Integrator gain in A/(K x s) (float, >=0 and <= 100.000)"""
-        value = self.query('I', True)
-        return float(value) / 1e3
+    def errors(self):
+        """Errors from the error register of the device (tuple)"""
+        return self._errors(self.error_flags)
+
+    @classmethod
+    def _errors(cls, flags):
+        errors = []
+        for idx, err in cls._ERRORS.items():
+            if flags[idx] is False:
+                continue
+
+            errors.append(err)
 
-    @i_gain.setter
-    def i_gain(self, value):
-        validate_is_float_or_int(value, 'I gain')
+        return tuple(errors)
 
-        validate_is_in_range(value, 0, 100, 'I gain', ' A/(K x s)')
-        value = round(value*1e3)
 
-        self.set('I', value)
+def _setting_property(setting):
+    # getter and setter of a setting from the registry
+    def getter(self):
+        return self._read_value(setting.command, setting.unit, setting.scale,
+                                setting.retry)
 
-    @property
-    def d_gain(self):
-        """Differential gain in (A x s)/K (float, >=0 and <= 100.000)"""
-        value = self.query('D', True)
-        return float(value) / 1e3
+    def setter(self, value):
+        self.set(setting.command, setting.to_raw(value))
+
+    getter.__name__ = setting.name
+    if not setting.writable:
+        return property(getter, doc=setting.doc)
 
-    @d_gain.setter
-    def d_gain(self, value):
-        validate_is_float_or_int(value, 'D gain')
+    setter.__name__ = setting.name
+    return property(getter, setter, doc=setting.doc)
 
-        validate_is_in_range(value, 0, 100, 'D gain', ' (A x s)/K')
-        value = round(value*1e3)
 
-        self.set('D', value)
+for _setting in settings.SETTINGS:
+    setattr(MTD415TDevice, _setting.name, _setting_property(_setting))
+del _setting
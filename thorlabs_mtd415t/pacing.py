@@ -0,0 +1,123 @@
+"""
+This module provides the AdaptivePacer class which learns the minimum gap
+between commands a temperature controller can handle.
+
+The controller answers 'unknown command' if commands arrive too fast. The
+pacer adapts the gap between commands with additive decrease and
+multiplicative increase (AIMD): every successful response shortens the gap
+by a small step, every 'unknown command' response multiplies it. Writes are
+delayed until the gap since the previous write has passed, pipelined batches
+are split into individually paced writes while the gap is non-zero.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.pacing import AdaptivePacer
+
+    pacer = AdaptivePacer()
+    temp_controller = MTD415TDevice('/dev/ttyUSB0', pacer=pacer)
+    ...
+    pacer.gap # => 0.0012
+    pacer.error_rate # => 0.004
+"""
+
+import threading
+from time import perf_counter, sleep
+
+
+class AdaptivePacer(object):
+    """
+    AIMD pacing of the commands sent to a device.
+
+    Args:
+        initial_gap (float, optional): Gap between commands in s at the
+            start, 0 by default
+        min_gap (float, optional): Minimum gap in s, 0 by default
+        max_gap (float, optional): Maximum gap in s, 0.1 by default (the
+            fixed retry delay without pacer)
+        step (float, optional): Decrease of the gap per successful response
+            in s, 50 us by default
+        factor (float, optional): Increase factor of the gap per error,
+            2 by default
+        min_backoff (float, optional): Gap in s after the first error if the
+            gap was smaller, 1 ms by default
+    """
+
+    def __init__(self, initial_gap=0.0, min_gap=0.0, max_gap=0.1, step=5e-5,
+                 factor=2.0, min_backoff=1e-3):
+        if factor <= 1:
+            raise ValueError('factor must be larger than 1')
+
+        self._gap = min(max(initial_gap, min_gap), max_gap)
+        self._min_gap = min_gap
+        self._max_gap = max_gap
+        self._step = step
+        self._factor = factor
+        self._min_backoff = min_backoff
+
+        self._lock = threading.Lock()
+        self._last_write = None
+
+        self.responses = 0
+        self.errors = 0
+
+    def wait(self):
+        """
+        Block until the gap since the previous write has passed. Called
+        before every write.
+        """
+        with self._lock:
+            now = perf_counter()
+            if self._last_write is not None:
+                ready = self._last_write + self._gap
+                if ready > now:
+                    sleep(ready - now)
+
+                    # sleep may return early, busy wait for the remainder
+                    now = perf_counter()
+                    while now < ready:
+                        now = perf_counter()
+
+            self._last_write = now
+
+    def success(self):
+        """Record a successful response, decreases the gap additively"""
+        with self._lock:
+            self.responses += 1
+            self._gap = max(self._min_gap, self._gap - self._step)
+
+    def error(self):
+        """Record an 'unknown command' response, increases the gap
+        multiplicatively"""
+        with self._lock:
+            self.responses += 1
+            self.errors += 1
+            self._gap = min(self._max_gap,
+                            max(self._gap * self._factor, self._min_backoff,
+                                self._min_gap))
+
+    def record(self, response):
+        """
+        Record a response of the device.
+
+        Args:
+            response (bytes): Response line
+        """
+        if response == b'unknown command\n':
+            self.error()
+        else:
+            self.success()
+
+    @property
+    def gap(self):
+        """Current gap between commands in s (float)"""
+        return self._gap
+
+    @property
+    def rate(self):
+        """Current maximum command rate in Hz (float, inf without gap)"""
+        return 1.0 / self._gap if self._gap > 0 else float('inf')
+
+    @property
+    def error_rate(self):
+        """Fraction of 'unknown command' responses (float)"""
+        return self.errors / self.responses if self.responses > 0 else 0.0
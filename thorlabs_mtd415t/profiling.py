@@ -0,0 +1,299 @@
+"""
+This module provides the Profile class which breaks down the time spent in
+the calls of a device into phases, e. g. to decide whether the overhead per
+value comes from Python or from the serial connection.
+
+While profiling, the methods of the device, its serial connection and the
+validation helpers are wrapped with timers. Each phase records the number of
+calls, the total (inclusive) time and the self time without nested phases.
+Only calls from the thread which entered the profile are recorded. Profiles
+of different devices may be nested or overlap, the module level helpers are
+wrapped while at least one profile is active.
+
+Phases:
+    validation: validate_is_float_or_int and validate_is_in_range
+    encoding: building query and set commands
+    write: logging, pacing and encoding of written data
+    write syscall: serial write
+    wait for first byte: serial reads after a write until data arrives
+    read syscall: further serial reads
+    readline: line framing and logging of responses
+    decode/parse: conversion of responses to values
+    query, set, transact: remaining overhead of the commands
+    retries: queries repeated after 'unknown command' (including the delay)
+    auto-save: saving after a set with auto_save enabled
+    save: explicit saves
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+
+    temp_controller = MTD415TDevice('/dev/ttyUSB0')
+
+    with temp_controller.profile():
+        for _ in range(100):
+            temp_controller.temp
+
+    # phase                  calls   total ms    self ms  self %
+    # wait for first byte      100    412.380    412.380    91.2
+    # ...
+"""
+
+import importlib
+import sys
+import threading
+from collections import namedtuple
+from time import perf_counter
+
+PhaseStats = namedtuple('PhaseStats', ('calls', 'total', 'self'))
+PhaseStats.__doc__ = """Statistics of a phase, times in s"""
+
+# instance methods of the device and their phase
+_METHODS = (
+    ('query', 'query'),
+    ('set', 'set'),
+    ('save', 'save'),
+    ('transact', 'transact'),
+    ('write', 'write'),
+    ('read', 'readline'),
+    ('_read_value', 'decode/parse'),
+    ('_query_command', 'encoding'),
+    ('_set_command', 'encoding')
+)
+
+# module level functions of the package modules and their phase
+_FUNCTIONS = (
+    ('settings', 'validate_is_float_or_int', 'validation'),
+    ('settings', 'validate_is_in_range', 'validation'),
+    ('mtd415t_device', 'sleep', 'retries')
+)
+
+
+# profiles which have been entered, the module level functions are wrapped
+# while there is at least one
+_profiles = []
+_originals = {}
+_lock = threading.Lock()
+
+
+def _module(name):
+    return importlib.import_module('.' + name, __package__)
+
+
+def _current_profile():
+    # innermost profile of the calling thread, preferably one within a call
+    # of its device
+    active = [profile for profile in _profiles if profile._active()]
+    for profile in reversed(active):
+        if len(profile._stack) > 0:
+            return profile
+
+    return active[-1] if len(active) > 0 else None
+
+
+def _dispatch(func, name):
+    def wrapper(*args, **kwargs):
+        profile = _current_profile()
+        if profile is None:
+            return func(*args, **kwargs)
+
+        return profile._call(func, name, args, kwargs)
+
+    return wrapper
+
+
+def _add_profile(profile):
+    with _lock:
+        if len(_profiles) == 0:
+            for module, attr, name in _FUNCTIONS:
+                func = getattr(_module(module), attr)
+                _originals[(module, attr)] = func
+                setattr(_module(module), attr, _dispatch(func, name))
+
+        _profiles.append(profile)
+
+
+def _remove_profile(profile):
+    with _lock:
+        _profiles.remove(profile)
+
+        if len(_profiles) == 0:
+            for module, attr, _ in _FUNCTIONS:
+                setattr(_module(module), attr, _originals.pop((module, attr)))
+
+
+class _ProfiledSerial(object):
+    # times writes and reads of a serial connection
+
+    def __init__(self, serial, profile):
+        object.__setattr__(self, '_serial', serial)
+        object.__setattr__(self, '_profile', profile)
+        object.__setattr__(self, '_awaiting', False)
+
+    def write(self, data):
+        object.__setattr__(self, '_awaiting', True)
+        with self._profile.phase('write syscall'):
+            return self._serial.write(data)
+
+    def read(self, size=1):
+        name = 'wait for first byte' if self._awaiting else 'read syscall'
+        with self._profile.phase(name):
+            data = self._serial.read(size)
+
+        if len(data) > 0:
+            object.__setattr__(self, '_awaiting', False)
+
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._serial, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._serial, name, value)
+
+
+class _Phase(object):
+    def __init__(self, profile, name):
+        self._profile = profile
+        self._name = name
+
+    def __enter__(self):
+        self._active = self._profile._active()
+        if self._active:
+            self._profile._stack.append([self._name, perf_counter(), 0.0])
+
+    def __exit__(self, *args):
+        if self._active:
+            self._profile._pop()
+
+
+class Profile(object):
+    """
+    Profile of the calls of a device, use MTD415TDevice.profile to create
+    one.
+
+    Args:
+        device (MTD415TDevice): Temperature controller
+        out (file, optional): Stream for the report, sys.stdout by default
+        print_report (boolean, optional): Print the report when the profile
+            is left, True by default
+    """
+
+    def __init__(self, device, out=None, print_report=True):
+        self._device = device
+        self._out = out
+        self._print_report = print_report
+
+        self._stats = {}
+        self._stack = []
+        self._thread = None
+        self._start = None
+        self.wall = 0.0
+
+    def _active(self):
+        return threading.current_thread() is self._thread
+
+    def phase(self, name):
+        """
+        Context manager recording a phase.
+
+        Args:
+            name (string): Phase name
+        """
+        return _Phase(self, name)
+
+    def _pop(self):
+        name, start, children = self._stack.pop()
+        elapsed = perf_counter() - start
+
+        calls, total, self_time = self._stats.get(name, (0, 0.0, 0.0))
+        self._stats[name] = PhaseStats(calls + 1, total + elapsed,
+                                       self_time + elapsed - children)
+
+        if len(self._stack) > 0:
+            self._stack[-1][2] += elapsed
+
+    def _call(self, func, name, args, kwargs):
+        phase = name
+        names = [frame[0] for frame in self._stack]
+        if name == 'query' and ('query' in names or 'retries' in names):
+            # queries within queries are retries
+            phase = 'retries'
+        elif name == 'save' and 'set' in names:
+            phase = 'auto-save'
+
+        with self.phase(phase):
+            return func(*args, **kwargs)
+
+    def _wrap(self, func, name):
+        profile = self
+
+        def wrapper(*args, **kwargs):
+            if not profile._active():
+                return func(*args, **kwargs)
+
+            return profile._call(func, name, args, kwargs)
+
+        return wrapper
+
+    def __enter__(self):
+        device = self._device
+        if isinstance(device._serial, _ProfiledSerial):
+            raise RuntimeError('device is already being profiled')
+
+        self._thread = threading.current_thread()
+
+        for attr, name in _METHODS:
+            setattr(device, attr, self._wrap(getattr(device, attr), name))
+
+        _add_profile(self)
+
+        device._serial = _ProfiledSerial(device._serial, self)
+
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.wall += perf_counter() - self._start
+
+        device = self._device
+        device._serial = device._serial._serial
+
+        _remove_profile(self)
+
+        for attr, _ in _METHODS:
+            device.__dict__.pop(attr, None)
+
+        self._thread = None
+
+        if self._print_report:
+            (self._out or sys.stdout).write(self.report())
+
+    @property
+    def phases(self):
+        """Statistics by phase name (dict of PhaseStats)"""
+        return dict(self._stats)
+
+    def report(self):
+        """
+        Render the phases ranked by self time.
+
+        Returns:
+            string: Report
+        """
+        ranked = sorted(self._stats.items(), key=lambda item: item[1].self,
+                        reverse=True)
+        tracked = sum(stats.self for stats in self._stats.values())
+
+        rows = [(name, stats.calls, stats.total, stats.self)
+                for name, stats in ranked]
+        rows.append(('untracked', '', '', max(0.0, self.wall - tracked)))
+
+        lines = ['{:<20} {:>7} {:>10} {:>10} {:>7}'.format(
+            'phase', 'calls', 'total ms', 'self ms', 'self %')]
+        for name, calls, total, self_time in rows:
+            share = 100 * self_time / self.wall if self.wall > 0 else 0.0
+            lines.append('{:<20} {:>7} {:>10} {:>10.3f} {:>7.1f}'.format(
+                name, calls, '' if total == '' else '{:.3f}'.format(
+                    total * 1e3), self_time * 1e3, share))
+
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,189 @@
+"""
+This module provides functions to push the same configuration to many
+temperature controllers at once.
+
+All devices are provisioned in parallel. For each device, the current
+configuration is read and only settings which differ from the desired values
+are written. Settings are saved once per device and read back for
+verification.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.provisioning import provision
+
+    devices = [MTD415TDevice(port) for port in ports]
+    reports = provision(devices, {'p_gain': 1.5, 'i_gain': 0.1})
+    reports[0].changes # => {'p_gain': (1.0, 1.5)}
+    all(report.ok for report in reports) # => True
+"""
+
+from . import settings
+
+
+def _quantize(name, value):
+    # same conversion as the setters, values are compared as sent to the
+    # device
+    return settings.get(name).quantize(value)
+
+
+def _read(device, name):
+    value = getattr(device, name)
+
+    # devices may return Reading objects instead of bare values
+    return getattr(value, 'value', value)
+
+
+class DeviceReport(object):
+    """
+    Result of provisioning a single device.
+
+    Attributes:
+        port (string): Serial port of the device
+        uid (string): Unique device identifier, None if unknown
+        changes (dict): Previous and desired value by changed setting
+        unchanged (list): Settings which already had the desired value
+        mismatches (dict): Desired and actual value by setting which did not
+            have the desired value after writing
+        saved (boolean): Whether settings were saved to non-volatile memory
+        error (Exception): Error which aborted provisioning, None otherwise
+    """
+
+    def __init__(self, port):
+        self.port = port
+        self.uid = None
+        self.changes = {}
+        self.unchanged = []
+        self.mismatches = {}
+        self.saved = False
+        self.error = None
+
+    @property
+    def ok(self):
+        """Provisioning succeeded and was verified (boolean)"""
+        return self.error is None and len(self.mismatches) == 0
+
+    def as_dict(self):
+        """
+        Convert report to plain data types, e. g. for JSON serialization.
+
+        Returns:
+            dict: Report
+        """
+        return {
+            'port': self.port,
+            'uid': self.uid,
+            'changes': dict((name, list(values))
+                            for name, values in self.changes.items()),
+            'unchanged': list(self.unchanged),
+            'mismatches': dict((name, list(values))
+                               for name, values in self.mismatches.items()),
+            'saved': self.saved,
+            'error': None if self.error is None else str(self.error),
+            'ok': self.ok
+        }
+
+    def __repr__(self):
+        return '<DeviceReport {} changed={} ok={}>'.format(
+            self.port, sorted(self.changes), self.ok)
+
+
+def diff(device, config):
+    """
+    Compare the configuration of a device with the desired configuration.
+
+    Args:
+        device (MTD415TDevice): Temperature controller
+        config (dict): Desired values by property name, e. g. 'p_gain'
+
+    Returns:
+        dict: Current and desired value by setting which differs
+    """
+    changes = {}
+    for name in sorted(config):
+        current = _read(device, name)
+        if _quantize(name, current) != _quantize(name, config[name]):
+            changes[name] = (current, config[name])
+
+    return changes
+
+
+def provision_device(device, config, save=True, verify=True):
+    """
+    Write differing settings to a single device.
+
+    Args:
+        device (MTD415TDevice): Temperature controller
+        config (dict): Desired values by property name, e. g. 'p_gain'
+        save (boolean, optional): Save changed settings to non-volatile
+            memory, True by default
+        verify (boolean, optional): Read changed settings back, True by
+            default
+
+    Returns:
+        DeviceReport: Report
+    """
+    report = DeviceReport(getattr(device._serial, 'port', None))
+
+    # settings are saved once at the end instead of after every write
+    auto_save = device.auto_save
+    device.auto_save = False
+
+    try:
+        report.uid = device.uid
+        report.changes = diff(device, config)
+        report.unchanged = [name for name in sorted(config)
+                            if name not in report.changes]
+
+        for name in sorted(report.changes):
+            setattr(device, name, config[name])
+
+        if save and len(report.changes) > 0:
+            device.save()
+            report.saved = True
+
+        if verify:
+            for name in sorted(report.changes):
+                actual = _read(device, name)
+                if _quantize(name, actual) != _quantize(name, config[name]):
+                    report.mismatches[name] = (config[name], actual)
+    except (ValueError, IOError) as e:
+        report.error = e
+    finally:
+        device.auto_save = auto_save
+
+    return report
+
+
+def provision(devices, config, save=True, verify=True, max_workers=None):
+    """
+    Write differing settings to many devices in parallel.
+
+    Args:
+        devices (list): Temperature controllers (MTD415TDevice)
+        config (dict): Desired values by property name, e. g. 'p_gain'
+        save (boolean, optional): Save changed settings to non-volatile
+            memory, True by default
+        verify (boolean, optional): Read changed settings back, True by
+            default
+        max_workers (int, optional): Maximum number of devices provisioned
+            concurrently, all devices by default
+
+    Returns:
+        list: Reports (DeviceReport) in the order of the devices
+
+    Raises:
+        ValueError: If the configuration is invalid, before any device is
+            contacted
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    settings.validate_config(config)
+
+    devices = list(devices)
+    if len(devices) == 0:
+        return []
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(devices)) as ex:
+        return list(ex.map(
+            lambda device: provision_device(device, config, save, verify),
+            devices))
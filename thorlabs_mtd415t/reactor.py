@@ -0,0 +1,481 @@
+"""
+This module provides the Reactor class which drives many temperature
+controllers from a single thread.
+
+The file descriptors of all registered devices are watched with a selector.
+Commands are written without blocking and pipelined, responses are parsed and
+dispatched to callbacks as they arrive. Timers allow periodic polling. This
+only works on POSIX systems where serial ports have file descriptors.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.reactor import Reactor
+
+    reactor = Reactor()
+    devices = [MTD415TDevice(port, timeout=0.5) for port in ports]
+    for device in devices:
+        reactor.register(device)
+
+    def on_temp(device, setting, value):
+        print(device.uid, value / 1e3)
+
+    def poll():
+        for device in devices:
+            reactor.query(device, 'Te', on_temp)
+
+    reactor.call_every(1.0, poll)
+    reactor.run()
+"""
+
+import heapq
+import itertools
+import os
+import selectors
+from collections import deque
+from time import monotonic
+
+from .serial_device import ResponseTimeoutError
+
+
+def parse_response(line):
+    """
+    Parse a response line.
+
+    Args:
+        line (bytes): Response including line ending
+
+    Returns:
+        int or string: Integer value for numeric responses, string otherwise
+    """
+    line = line.rstrip(b'\r\n')
+
+    try:
+        return int(line)
+    except ValueError:
+        return line.decode('ascii', 'replace')
+
+
+class Timer(object):
+    """
+    Scheduled callback, see Reactor.call_later and Reactor.call_every.
+    """
+
+    def __init__(self, when, interval, callback, args):
+        self.when = when
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """Cancel the callback"""
+        self.cancelled = True
+
+
+class _Command(object):
+    def __init__(self, setting, data, callback, errback, retry):
+        self.setting = setting
+        self.data = data
+        self.callback = callback
+        self.errback = errback
+        self.retry = retry
+        self.deadline = None
+
+
+class _Channel(object):
+    def __init__(self, device, fd, timeout):
+        self.device = device
+        self.fd = fd
+        self.timeout = timeout
+
+        self.queued = deque()
+        self.in_flight = deque()
+        self.out = bytearray()
+
+        self.events = selectors.EVENT_READ
+
+        # time until which the device has to be quiet before commands are
+        # sent again after a timeout, None if in sync
+        self.resync = None
+
+
+class Reactor(object):
+    """
+    Single-threaded event loop for many temperature controllers.
+
+    Callbacks are called as callback(device, setting, value) with the parsed
+    response, errbacks as errback(device, setting, exception). After a
+    timeout, further commands of the device are held back and its input is
+    discarded until it has been quiet for the timeout. All methods must be
+    called from the thread running the reactor.
+
+    Args:
+        max_in_flight (int, optional): Maximum number of commands per device
+            sent before their response has arrived, 4 by default
+        retry_delay (float, optional): Delay in s before a command answered
+            with 'unknown command' is sent again, 0.1 by default
+        chunk_size (int, optional): Maximum number of bytes read at once,
+            4096 by default
+    """
+
+    def __init__(self, max_in_flight=4, retry_delay=0.1, chunk_size=4096):
+        self._selector = selectors.DefaultSelector()
+        self._channels = {}
+
+        self._timers = []
+        self._timer_ids = itertools.count()
+
+        self._max_in_flight = max_in_flight
+        self._retry_delay = retry_delay
+        self._chunk_size = chunk_size
+
+        self._running = False
+
+    def register(self, device, timeout=None):
+        """
+        Add a device to the reactor.
+
+        Args:
+            device (MTD415TDevice): Temperature controller
+            timeout (float, optional): Deadline for responses in s, the device
+                timeout by default
+        """
+        if not device.is_open:
+            device.open()
+
+        if timeout is None:
+            timeout = device.timeout
+
+        channel = _Channel(device, device._serial.fileno(), timeout)
+
+        # bytes received before do not belong to any command of the reactor
+        device._framer.discard(device._serial)
+
+        self._selector.register(channel.fd, channel.events, channel)
+        self._channels[device] = channel
+
+    def unregister(self, device):
+        """
+        Remove a device from the reactor. Pending commands fail.
+
+        Args:
+            device (MTD415TDevice): Temperature controller
+        """
+        channel = self._channels.pop(device)
+        self._selector.unregister(channel.fd)
+
+        self._fail(channel, IOError('Device has been unregistered'))
+
+    def query(self, device, setting, callback=None, errback=None,
+              retry=True):
+        """
+        Queue a query.
+
+        Args:
+            device (MTD415TDevice): Registered temperature controller
+            setting (string): Setting name, generally a single character
+            callback (callable, optional): Called with the response
+            errback (callable, optional): Called if the query fails
+            retry (boolean, optional): Retry once for 'unknown command'
+                                       responses, True by default
+        """
+        data = device._query_command(setting) + b'\n'
+        self._submit(device, _Command(setting, data, callback, errback,
+                                      retry))
+
+    def set(self, device, setting, value, callback=None, errback=None):
+        """
+        Queue a set command. Settings are not saved automatically.
+        Acknowledged writes are recorded by the device like with
+        MTD415TDevice.set, e. g. in its journal.
+
+        Args:
+            device (MTD415TDevice): Registered temperature controller
+            setting (string): Setting name, generally a single character
+            value (int): Set value
+            callback (callable, optional): Called with the response
+            errback (callable, optional): Called if the command fails
+        """
+        def acknowledged(device, setting, response):
+            # acknowledgements are empty lines
+            if response == '':
+                device._record_set(setting, value)
+
+            if callback is not None:
+                callback(device, setting, response)
+
+        data = device._set_command(setting, value) + b'\n'
+        self._submit(device, _Command(setting, data, acknowledged, errback,
+                                      False))
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedule a callback.
+
+        Args:
+            delay (float): Delay in s
+            callback (callable): Called with args
+
+        Returns:
+            Timer: Handle to cancel the callback
+        """
+        return self._schedule(monotonic() + delay, None, callback, args)
+
+    def call_every(self, interval, callback, *args):
+        """
+        Schedule a periodic callback at a fixed rate. Missed calls are skipped.
+
+        Args:
+            interval (float): Interval in s
+            callback (callable): Called with args
+
+        Returns:
+            Timer: Handle to cancel the callback
+        """
+        return self._schedule(monotonic(), interval, callback, args)
+
+    def run(self, timeout=None):
+        """
+        Run the event loop until stop is called.
+
+        Args:
+            timeout (float, optional): Maximum run time in s
+        """
+        end = None if timeout is None else monotonic() + timeout
+
+        self._running = True
+        try:
+            while self._running:
+                now = monotonic()
+                if end is not None and now >= end:
+                    break
+
+                wakeup = self._next_wakeup()
+                if end is not None and (wakeup is None or wakeup > end):
+                    wakeup = end
+
+                self.run_once(None if wakeup is None else
+                              max(0, wakeup - now))
+        finally:
+            self._running = False
+
+    def run_once(self, timeout=0):
+        """
+        Process ready file descriptors, due timers and expired deadlines once.
+
+        Args:
+            timeout (float, optional): Maximum time to wait for events in s,
+                0 by default, None waits indefinitely
+        """
+        for key, mask in self._selector.select(timeout):
+            channel = key.data
+            if mask & selectors.EVENT_WRITE:
+                self._write(channel)
+
+            if mask & selectors.EVENT_READ \
+                    and self._channels.get(channel.device) is channel:
+                self._read(channel)
+
+        now = monotonic()
+        self._run_timers(now)
+        self._expire(now)
+
+    def stop(self):
+        """Stop the event loop after the current iteration"""
+        self._running = False
+
+    @property
+    def devices(self):
+        """Registered devices (list)"""
+        return list(self._channels.keys())
+
+    def _schedule(self, when, interval, callback, args):
+        timer = Timer(when, interval, callback, args)
+        heapq.heappush(self._timers, (when, next(self._timer_ids), timer))
+
+        return timer
+
+    def _run_timers(self, now):
+        timers = self._timers
+        while len(timers) > 0 and timers[0][0] <= now:
+            _, _, timer = heapq.heappop(timers)
+            if timer.cancelled:
+                continue
+
+            timer.callback(*timer.args)
+
+            if timer.interval is not None and not timer.cancelled:
+                while timer.when <= now:
+                    timer.when += timer.interval
+
+                heapq.heappush(timers, (timer.when, next(self._timer_ids),
+                                        timer))
+
+    def _next_wakeup(self):
+        wakeup = self._timers[0][0] if len(self._timers) > 0 else None
+
+        for channel in self._channels.values():
+            if channel.resync is not None and \
+                    (wakeup is None or channel.resync < wakeup):
+                wakeup = channel.resync
+
+            if len(channel.in_flight) == 0:
+                continue
+
+            deadline = channel.in_flight[0].deadline
+            if deadline is not None and (wakeup is None or deadline < wakeup):
+                wakeup = deadline
+
+        return wakeup
+
+    def _expire(self, now):
+        for channel in list(self._channels.values()):
+            if channel.resync is not None and channel.resync <= now:
+                self._discard_stale_input(channel)
+                self._flush(channel)
+                continue
+
+            if len(channel.in_flight) == 0:
+                continue
+
+            deadline = channel.in_flight[0].deadline
+            if deadline is None or deadline > now:
+                continue
+
+            # responses of the remaining commands can no longer be assigned,
+            # late responses are discarded until the device has been quiet
+            # for the timeout
+            in_flight = list(channel.in_flight)
+            channel.in_flight.clear()
+            channel.resync = now + channel.timeout
+
+            for cmd in in_flight:
+                self._errback(channel, cmd, ResponseTimeoutError(
+                    'No response within {}s'.format(channel.timeout)))
+
+            self._flush(channel)
+
+    def _submit(self, device, cmd):
+        channel = self._channels[device]
+        channel.queued.append(cmd)
+        self._flush(channel)
+
+    def _flush(self, channel):
+        device = channel.device
+        while channel.resync is None and len(channel.queued) > 0 \
+                and len(channel.in_flight) < self._max_in_flight:
+            cmd = channel.queued.popleft()
+            if channel.timeout is not None:
+                cmd.deadline = monotonic() + channel.timeout
+
+            channel.in_flight.append(cmd)
+            channel.out += cmd.data
+            device._logger('write', cmd.data)
+
+        if len(channel.out) > 0:
+            self._write(channel)
+
+    def _write(self, channel):
+        try:
+            written = os.write(channel.fd, channel.out)
+        except (BlockingIOError, InterruptedError):
+            written = 0
+        except OSError as e:
+            self._disconnect(channel, e)
+            return
+
+        del channel.out[:written]
+
+        events = selectors.EVENT_READ
+        if len(channel.out) > 0:
+            events |= selectors.EVENT_WRITE
+
+        if events != channel.events:
+            channel.events = events
+            self._selector.modify(channel.fd, events, channel)
+
+    def _read(self, channel):
+        try:
+            data = os.read(channel.fd, self._chunk_size)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            self._disconnect(channel, e)
+            return
+
+        if len(data) == 0:
+            self._disconnect(channel, IOError('Device has been disconnected'))
+            return
+
+        device = channel.device
+        if channel.resync is not None:
+            device._logger('discard', data)
+            channel.resync = monotonic() + channel.timeout
+            return
+
+        framer = device._framer
+        framer.feed(data)
+
+        for line in framer.pop_lines():
+            if len(channel.in_flight) == 0:
+                device._logger('discard', line)
+                continue
+
+            device._logger('read', line)
+            cmd = channel.in_flight.popleft()
+
+            if cmd.retry and line == b'unknown command\n':
+                cmd.retry = False
+                self.call_later(self._retry_delay, self._retry, channel, cmd)
+                continue
+
+            if cmd.callback is not None:
+                cmd.callback(device, cmd.setting, parse_response(line))
+
+        self._flush(channel)
+
+    def _retry(self, channel, cmd):
+        if self._channels.get(channel.device) is not channel:
+            return
+
+        channel.queued.appendleft(cmd)
+        self._flush(channel)
+
+    def _discard_stale_input(self, channel):
+        channel.resync = None
+
+        device = channel.device
+        while True:
+            try:
+                data = os.read(channel.fd, self._chunk_size)
+            except (BlockingIOError, InterruptedError, OSError):
+                break
+
+            if len(data) == 0:
+                break
+
+            device._framer.feed(data)
+
+        stale = device._framer.discard()
+        if len(stale) > 0:
+            device._logger('discard', stale)
+
+    def _disconnect(self, channel, exception):
+        if self._channels.get(channel.device) is channel:
+            del self._channels[channel.device]
+            self._selector.unregister(channel.fd)
+
+        self._fail(channel, exception)
+
+    def _fail(self, channel, exception):
+        commands = list(channel.in_flight) + list(channel.queued)
+        channel.in_flight.clear()
+        channel.queued.clear()
+        del channel.out[:]
+
+        for cmd in commands:
+            self._errback(channel, cmd, exception)
+
+    def _errback(self, channel, cmd, exception):
+        if cmd.errback is not None:
+            cmd.errback(channel.device, cmd.setting, exception)
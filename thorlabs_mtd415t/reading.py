@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides the Reading and ReadingArray classes which keep values
+read from a device together with their raw integer value, unit and
+acquisition time.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.reading import ReadingArray
+
+    temp_controller = MTD415TDevice('/dev/ttyUSB0', return_readings=True)
+    reading = temp_controller.temp
+    reading.value # => 15.02
+    reading.raw # => 15020
+    reading.age # => 0.0001
+
+    temps = ReadingArray('Te', '° C')
+    temps.append(reading)
+    temps.values # => array('d', [15.02])
+"""
+
+from array import array
+from time import monotonic
+
+
+class Reading(object):
+    """
+    Value read from a device.
+
+    Args:
+        setting (string): Setting name of the query which produced the value
+        raw (int): Raw integer value as returned by the device
+        value (float or int): Scaled value
+        unit (string): Unit of the scaled value
+        timestamp (float): Acquisition time in s (time.monotonic)
+    """
+
+    __slots__ = ('setting', 'raw', 'value', 'unit', 'timestamp')
+
+    def __init__(self, setting, raw, value, unit, timestamp):
+        self.setting = setting
+        self.raw = raw
+        self.value = value
+        self.unit = unit
+        self.timestamp = timestamp
+
+    def __float__(self):
+        return float(self.value)
+
+    def __int__(self):
+        return int(self.value)
+
+    def __repr__(self):
+        return 'Reading({!r}, {!r}, {!r}, {!r}, {!r})'.format(
+            self.setting, self.raw, self.value, self.unit, self.timestamp)
+
+    @property
+    def age(self):
+        """Time since acquisition in s (float)"""
+        return monotonic() - self.timestamp
+
+
+class ReadingArray(object):
+    """
+    Sequence of readings of a single setting backed by compact arrays of raw
+    values and timestamps.
+
+    Args:
+        setting (string): Setting name of the query which produced the values
+        unit (string): Unit of the scaled values
+        scale (float, optional): Raw values are divided by scale to obtain
+            scaled values, 1e3 by default, None for unscaled integer values
+    """
+
+    def __init__(self, setting, unit, scale=1e3):
+        self.setting = setting
+        self.unit = unit
+        self.scale = scale
+
+        self._raw = array('q')
+        self._timestamps = array('d')
+
+    def append(self, reading):
+        """
+        Append a reading.
+
+        Args:
+            reading (Reading): Reading of the same setting
+        """
+        self.append_raw(reading.raw, reading.timestamp)
+
+    def append_raw(self, raw, timestamp):
+        """
+        Append a raw value without creating a Reading object.
+
+        Args:
+            raw (int): Raw integer value as returned by the device
+            timestamp (float): Acquisition time in s (time.monotonic)
+        """
+        self._raw.append(raw)
+        self._timestamps.append(timestamp)
+
+    def extend(self, readings):
+        """
+        Append multiple readings.
+
+        Args:
+            readings (iterable): Readings of the same setting
+        """
+        for reading in readings:
+            self.append_raw(reading.raw, reading.timestamp)
+
+    def _value(self, raw):
+        return raw if self.scale is None else raw / self.scale
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            result = ReadingArray(self.setting, self.unit, self.scale)
+            result._raw = self._raw[idx]
+            result._timestamps = self._timestamps[idx]
+
+            return result
+
+        raw = self._raw[idx]
+        return Reading(self.setting, raw, self._value(raw), self.unit,
+                       self._timestamps[idx])
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @property
+    def raw(self):
+        """Raw integer values (array)"""
+        return self._raw
+
+    @property
+    def timestamps(self):
+        """Acquisition times in s (array)"""
+        return self._timestamps
+
+    @property
+    def values(self):
+        """Scaled values (array)"""
+        if self.scale is None:
+            return array('q', self._raw)
+
+        scale = self.scale
+        return array('d', (raw / scale for raw in self._raw))
@@ -0,0 +1,232 @@
+"""
+This module provides the RecordingSerial and ReplaySerial transports which
+capture the serial traffic of a device with timing and play it back without
+the hardware, e. g. for benchmarks and regression tests of polling code
+against real traffic.
+
+Recordings are compact binary files: an 8 byte magic and a version, followed
+by one record per write or read call. Each record has a kind (write or
+read), the time since the start of the recording in ns and the data. Reads
+which returned nothing (timeouts) are recorded as well.
+
+On replay, writes are compared with the recording and reads return the
+recorded data. The delay of each read after the preceding write is
+reproduced, at real speed, scaled or without any delay.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.recording import RecordingSerial, ReplaySerial
+
+    # capture
+    temp_controller = MTD415TDevice('/dev/ttyUSB0')
+    with RecordingSerial(temp_controller._serial, 'traffic.rec') as serial:
+        temp_controller._serial = serial
+        poll(temp_controller)
+
+    # replay at twice the speed
+    temp_controller = MTD415TDevice('loop://')
+    temp_controller._serial = ReplaySerial('traffic.rec', speed=2.0)
+    poll(temp_controller)
+"""
+
+import struct
+from time import perf_counter, sleep
+
+from .helpers import perf_counter_ns
+
+_MAGIC = b'MTD415TC'
+_VERSION = 1
+_HEADER = struct.Struct('<8sH')
+
+# kind, time since start in ns, data length
+_RECORD = struct.Struct('<BQI')
+
+WRITE = 0
+READ = 1
+
+
+class ReplayError(RuntimeError):
+    """Raised if the replayed traffic deviates from the recording"""
+    pass
+
+
+def iter_records(path):
+    """
+    Iterate over the records of a recording.
+
+    Args:
+        path (string): Path of the recording
+
+    Yields:
+        tuple: Kind (WRITE or READ), time since start in ns and data (bytes)
+    """
+    with open(path, 'rb') as f:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size or _HEADER.unpack(header)[0] != _MAGIC:
+            raise ValueError('{} is not a recording'.format(path))
+
+        magic, version = _HEADER.unpack(header)
+        if version != _VERSION:
+            raise ValueError('unsupported recording version {}'.format(
+                version))
+
+        while True:
+            record = f.read(_RECORD.size)
+            if len(record) < _RECORD.size:
+                return
+
+            kind, time, length = _RECORD.unpack(record)
+            yield kind, time, f.read(length)
+
+
+class RecordingSerial(object):
+    """
+    Serial transport which records all writes and reads of the wrapped
+    serial connection. Other attributes are passed through.
+
+    Args:
+        serial: Serial connection, e. g. SerialDevice._serial
+        path (string): Path of the recording, overwritten if it exists
+    """
+
+    def __init__(self, serial, path):
+        object.__setattr__(self, '_serial', serial)
+        object.__setattr__(self, '_file', open(path, 'wb'))
+        object.__setattr__(self, '_start', perf_counter_ns())
+
+        self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+
+    def _record(self, kind, data):
+        self._file.write(_RECORD.pack(kind, perf_counter_ns() - self._start,
+                                      len(data)))
+        self._file.write(data)
+
+    def write(self, data):
+        result = self._serial.write(data)
+        self._record(WRITE, data)
+
+        return result
+
+    def read(self, size=1):
+        data = self._serial.read(size)
+        self._record(READ, data)
+
+        return data
+
+    def stop(self):
+        """Finish the recording, the wrapped connection stays open"""
+        if not self._file.closed:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def __getattr__(self, name):
+        # the file descriptor would let the line framer wait on the port
+        # directly, reads which time out would not be recorded
+        if name == 'fileno':
+            raise AttributeError(name)
+
+        return getattr(self._serial, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._serial, name, value)
+
+
+class ReplaySerial(object):
+    """
+    Serial transport which plays back a recording.
+
+    Args:
+        path (string): Path of the recording
+        speed (float, optional): Replay speed relative to the recording, 1
+            by default, None replays without delays
+        strict (boolean, optional): Raise ReplayError if written data
+            differs from the recording, True by default
+    """
+
+    def __init__(self, path, speed=1.0, strict=True):
+        self.port = 'replay://{}'.format(path)
+        self.is_open = True
+        self.timeout = None
+
+        self._records = list(iter_records(path))
+        self._position = 0
+        self._pending = b''
+        self._speed = speed
+        self._strict = strict
+
+        # real and recorded time of the latest write, read delays are
+        # reproduced relative to it
+        self._anchor = perf_counter()
+        self._anchor_recorded = 0
+
+    def open(self):
+        self.is_open = True
+
+    def close(self):
+        self.is_open = False
+
+    def _next(self, kind):
+        if self._position >= len(self._records):
+            raise ReplayError('end of recording')
+
+        record = self._records[self._position]
+        if record[0] != kind:
+            raise ReplayError('expected {} at record {}'.format(
+                'write' if record[0] == WRITE else 'read', self._position))
+
+        self._position += 1
+        return record
+
+    def _due(self, time):
+        # real time at which a recorded event is due
+        if self._speed is None:
+            return self._anchor
+
+        return self._anchor + (time - self._anchor_recorded) / 1e9 / \
+            self._speed
+
+    def write(self, data):
+        _, time, recorded = self._next(WRITE)
+        if self._strict and bytes(data) != recorded:
+            raise ReplayError('wrote {!r}, recording has {!r}'.format(
+                bytes(data), recorded))
+
+        self._anchor = perf_counter()
+        self._anchor_recorded = time
+
+        return len(data)
+
+    def read(self, size=1):
+        if len(self._pending) == 0:
+            _, time, self._pending = self._next(READ)
+
+            delay = self._due(time) - perf_counter()
+            if delay > 0:
+                sleep(delay)
+
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+    @property
+    def in_waiting(self):
+        if len(self._pending) > 0:
+            return len(self._pending)
+
+        if self._position >= len(self._records):
+            return 0
+
+        kind, time, data = self._records[self._position]
+        if kind != READ or self._due(time) > perf_counter():
+            return 0
+
+        return len(data)
+
+    @property
+    def remaining(self):
+        """Number of records which have not been replayed yet (int)"""
+        return len(self._records) - self._position
@@ -0,0 +1,148 @@
+"""
+This module provides the ConnectionRegistry class which shares one serial
+connection per port among all device objects of a process.
+
+Connections are reference counted. Idle connections (without references)
+stay open, so short-lived device objects for the same port do not pay the
+cost of opening and configuring the port again, until they are closed
+explicitly.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.registry import default_registry
+
+    with MTD415TDevice('/dev/ttyUSB0', shared=True) as temp_controller:
+        temp_controller.temp # => 15.02
+
+    # the same connection is reused
+    with MTD415TDevice('/dev/ttyUSB0', shared=True) as temp_controller:
+        temp_controller.temp_setpoint = 15.0
+
+    default_registry.close_all()
+"""
+
+import threading
+
+from .framing import LineFramer
+
+
+class Connection(object):
+    """
+    Serial connection shared by all device objects of a port. Commands and
+    their responses must be exchanged while holding the lock.
+
+    Attributes:
+        url (string): Port URL
+        serial: Serial connection, e. g. serial.Serial instance
+        framer (LineFramer): Line framing of the received data
+        lock (threading.RLock): Lock for command/response exchanges
+        refcount (int): Number of references
+        resync (float): Stale input after a timeout is discarded before the
+            next command until the connection has been quiet for this time
+            in s, None if there was no timeout
+    """
+
+    def __init__(self, url, serial, framer):
+        self.url = url
+        self.serial = serial
+        self.framer = framer
+        self.lock = threading.RLock()
+        self.refcount = 0
+        self.resync = None
+
+
+class ConnectionRegistry(object):
+    """
+    Per-process registry of shared, reference counted serial connections.
+
+    Args:
+        keep_idle (boolean, optional): Keep connections without references
+            open until close_idle or close_all is called, True by default
+    """
+
+    def __init__(self, keep_idle=True):
+        self._connections = {}
+        self._lock = threading.Lock()
+        self._keep_idle = keep_idle
+
+    def acquire(self, url, read_chunk_size=4096, **kwargs):
+        """
+        Get a reference to the connection of a port, opening it if needed.
+        Settings of an existing connection are not changed.
+
+        Args:
+            url (string): Port URL, e. g. '/dev/ttyUSB0'
+            read_chunk_size (int, optional): Maximum number of bytes read at
+                once, 4096 by default
+            **kwargs: Arguments for serial.serial_for_url
+
+        Returns:
+            Connection: Shared connection
+        """
+        with self._lock:
+            connection = self._connections.get(url)
+
+            if connection is None:
+                from serial import serial_for_url
+
+                connection = Connection(url, serial_for_url(url, **kwargs),
+                                        LineFramer(chunk_size=read_chunk_size))
+                self._connections[url] = connection
+            elif not connection.serial.is_open:
+                connection.serial.open()
+
+            connection.refcount += 1
+
+            return connection
+
+    def release(self, connection):
+        """
+        Drop a reference to a connection.
+
+        Args:
+            connection (Connection): Shared connection
+        """
+        with self._lock:
+            if connection.refcount <= 0:
+                raise ValueError('connection {} has no references'.format(
+                    connection.url))
+
+            connection.refcount -= 1
+
+            if connection.refcount == 0 and not self._keep_idle:
+                self._close(connection)
+
+    def _close(self, connection):
+        del self._connections[connection.url]
+        connection.serial.close()
+
+    def close_idle(self):
+        """Close all connections without references"""
+        with self._lock:
+            for connection in list(self._connections.values()):
+                if connection.refcount == 0:
+                    self._close(connection)
+
+    def close_all(self):
+        """
+        Close all connections. Devices using them acquire a new connection on
+        next use.
+        """
+        with self._lock:
+            for connection in list(self._connections.values()):
+                self._close(connection)
+
+    def __contains__(self, url):
+        return url in self._connections
+
+    def __len__(self):
+        return len(self._connections)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close_all()
+
+
+default_registry = ConnectionRegistry()
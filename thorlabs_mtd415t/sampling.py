@@ -0,0 +1,202 @@
+"""
+This module provides the SynchronizedSampler class which samples several
+temperature controllers at the same instant, e. g. to measure thermal
+gradients across zones.
+
+Each device has a worker thread which waits on a barrier. When a sample is
+taken, all workers are released at once and send the pipelined read burst of
+their device. Request and response times are taken with perf_counter_ns, the
+spread between the devices is reported with every sample.
+
+Example:
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.sampling import SynchronizedSampler
+
+    devices = [MTD415TDevice(port, timeout=0.1) for port in ports]
+
+    with SynchronizedSampler(devices, reads=('temp',)) as sampler:
+        samples = sampler.sample()
+        [sample.values['temp'] for sample in samples] # => [15.02, 15.31]
+        samples.spread # => 0.00004
+"""
+
+import threading
+from collections import namedtuple
+
+from . import settings
+from .helpers import perf_counter_ns
+
+DeviceSample = namedtuple('DeviceSample', (
+    'index', 'values', 'request_ns', 'response_ns', 'error'))
+DeviceSample.__doc__ = """Sample of a device: values by property name (None
+if the read failed), perf_counter_ns time before the burst was sent and of
+each response by property name, error message or None"""
+
+
+class SampleSet(tuple):
+    """
+    Samples of all devices (tuple of DeviceSample, in device order) taken in
+    one synchronized burst.
+    """
+
+    @property
+    def spread(self):
+        """Time between the first and the last burst sent in s (float)"""
+        times = [sample.request_ns for sample in self
+                 if sample.request_ns is not None]
+        return (max(times) - min(times)) / 1e9 if len(times) > 0 else 0.0
+
+    @property
+    def midpoint_spread(self):
+        """Spread of the estimated sampling instants in s, the midpoint
+        between request and first response of each device (float)"""
+        times = [self._midpoint(sample) for sample in self
+                 if len(sample.response_ns) > 0]
+        return (max(times) - min(times)) / 1e9 if len(times) > 0 else 0.0
+
+    @staticmethod
+    def _midpoint(sample):
+        return (sample.request_ns + min(sample.response_ns.values())) // 2
+
+
+class SynchronizedSampler(object):
+    """
+    Synchronized sampling of several devices.
+
+    Args:
+        devices (list): Temperature controllers (MTD415TDevice)
+        reads (tuple, optional): Property names read in every sample,
+            ('temp',) by default
+        timeout (float, optional): Deadline for the responses of each
+            device in s, the device timeout by default
+    """
+
+    def __init__(self, devices, reads=('temp',), timeout=None):
+        readable = settings.readable()
+        for name in reads:
+            if name not in readable:
+                raise ValueError('{} cannot be sampled, use one of {}'.format(
+                    name, ', '.join(readable)))
+
+        self._devices = list(devices)
+        self._reads = tuple(reads)
+        self._timeout = timeout
+
+        self._settings = [settings.get(name) for name in self._reads]
+        self._cmds = [setting.query_command for setting in self._settings]
+
+        # workers and the sampling thread meet at the barriers before and
+        # after each burst
+        parties = len(self._devices) + 1
+        self._start = threading.Barrier(parties)
+        self._done = threading.Barrier(parties)
+        self._results = [None] * len(self._devices)
+        self._error = None
+        self._closed = False
+
+        self._threads = []
+        for index in range(len(self._devices)):
+            thread = threading.Thread(target=self._run, args=(index,))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, index):
+        while True:
+            try:
+                self._start.wait()
+            except threading.BrokenBarrierError:
+                return
+
+            if self._closed:
+                return
+
+            try:
+                self._results[index] = self._burst(index)
+            except Exception as e:
+                # errors other than IOError would never reach the barrier,
+                # the sampling thread re-raises them
+                self._error = e
+                self._done.abort()
+                return
+
+            try:
+                self._done.wait()
+            except threading.BrokenBarrierError:
+                return
+
+    def _burst(self, index):
+        device = self._devices[index]
+        reads = self._reads
+        timestamps = {}
+        timeout = self._timeout if self._timeout is not None \
+            else device.timeout
+
+        def stamp(idx):
+            timestamps['request' if idx is None else reads[idx]] = \
+                perf_counter_ns()
+
+        values = dict((name, None) for name in self._reads)
+        error = None
+        try:
+            responses = device._call(device._transact, self._cmds, timeout,
+                                     b'\n', stamp)
+
+            for setting, response in zip(self._settings, responses):
+                name = setting.name
+                try:
+                    values[name] = setting.from_raw(int(response))
+                except ValueError:
+                    error = 'invalid response {!r} for {}'.format(
+                        response, name)
+        except IOError as e:
+            error = str(e)
+
+        request = timestamps.pop('request', None)
+        return DeviceSample(index, values, request, timestamps, error)
+
+    def sample(self):
+        """
+        Send the read bursts of all devices at the same time and wait for
+        the responses.
+
+        Returns:
+            SampleSet: Samples of all devices
+
+        Raises:
+            RuntimeError: If the sampler has been closed
+            Exception: Errors of a read burst other than IOError, the sampler
+                is closed
+        """
+        if self._closed:
+            raise RuntimeError('sampler has been closed')
+
+        self._start.wait()
+        try:
+            self._done.wait()
+        except threading.BrokenBarrierError:
+            self.close()
+            if self._error is None:
+                raise RuntimeError('sampler has been closed')
+
+            raise self._error
+
+        return SampleSet(self._results)
+
+    def close(self):
+        """Stop the worker threads"""
+        if self._closed:
+            return
+
+        self._closed = True
+        self._start.abort()
+        self._done.abort()
+
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
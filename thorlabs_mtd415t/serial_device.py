@@ -13,58 +13,373 @@ n@darkwahoppong.com
 
 """
 
-from time import time
+import random
+from time import monotonic, sleep, time
+
+from .framing import LineFramer
+from .helpers import perf_counter_ns
+from .registry import Connection
+
+
+class ResponseTimeoutError(IOError):
+    """Raised if a device does not respond before the deadline"""
+    pass
+
+
+class ConnectionLostError(IOError):
+    """Raised if the connection to a device is lost and cannot be restored,
+    or if a command is failed because of a connection loss"""
+    pass
+
+
+class ReconnectPolicy(object):
+    """
+    Automatic reconnect after the serial connection has been lost, e. g. due
+    to a USB reset. The port is reopened with exponential backoff and random
+    jitter until it is available again or the deadline has passed.
+
+    Args:
+        deadline (float, optional): Maximum time for reconnecting in s, 0.5
+            by default
+        initial_delay (float, optional): Delay before the second attempt in
+            s, 5 ms by default
+        max_delay (float, optional): Maximum delay between attempts in s,
+            0.1 by default
+        queued (string, optional): Policy for commands affected by the
+            connection loss, 'replay' sends them again after reconnecting,
+            'fail' raises ConnectionLostError immediately for commands
+            waiting during the reconnect and for the failed command. 'replay'
+            by default
+    """
+
+    def __init__(self, deadline=0.5, initial_delay=5e-3, max_delay=0.1,
+                 queued='replay'):
+        if queued not in ('replay', 'fail'):
+            raise ValueError('queued must be \'replay\' or \'fail\'')
+
+        self.deadline = deadline
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.queued = queued
+
+    def delays(self):
+        """
+        Delays between attempts, the upper half of the delay is randomized
+        so that many devices on a reset hub do not reconnect in lockstep.
+
+        Yields:
+            float: Delay in s
+        """
+        delay = self.initial_delay
+        while True:
+            yield delay / 2 + random.uniform(0, delay / 2)
+            delay = min(2 * delay, self.max_delay)
 
 
 class SerialDevice(object):
     def __init__(self, port='/dev/ttyUSB0', baudrate=115200,
-                 max_log_length=100, **kwargs):
-        from serial import serial_for_url
+                 max_log_length=100, read_chunk_size=4096, timeout=None,
+                 shared=False, registry=None, reconnect=None, pacer=None,
+                 **kwargs):
+        self._port = port
+        self._serial_kwargs = dict(kwargs, baudrate=baudrate, timeout=timeout,
+                                   read_chunk_size=read_chunk_size)
+
+        # shared connections are handed out by a registry, one per port
+        self._shared = shared
+        self._registry = registry
+        self._connection = None
+
+        if shared:
+            self._acquire()
+        else:
+            from serial import serial_for_url
+
+            self._serial = serial_for_url(port, baudrate=baudrate,
+                                          timeout=timeout, **kwargs)
+            self._framer = LineFramer(chunk_size=read_chunk_size)
+
+            # state of the connection, not shared with other device objects
+            self._connection = Connection(port, self._serial, self._framer)
+            self._lock = self._connection.lock
+
+        # default deadline for reads in s, None blocks until a response arrives
+        self._timeout = timeout
+
+        # True for the default policy, None disables reconnecting
+        self._reconnect_policy = ReconnectPolicy() if reconnect is True \
+            else reconnect
+        self._reconnecting = False
+        self._generation = 0
 
-        self._serial = serial_for_url(port, baudrate=baudrate, **kwargs)
+        # adaptive gap between commands, see pacing module
+        self._pacer = pacer
 
+        # written data is assembled in a reusable buffer
+        self._write_buffer = bytearray()
+
+        # a maximum log length of 0 disables the log
         self._log = []
         self._max_log_length = max_log_length
 
+        # complete log written to disk in the background, see log_spill
+        self._spill = None
+        self._spill_index = None
+
     def _logger(self, kind, message):
+        if self._spill is not None:
+            self._spill.put(self._spill_index, kind, message)
+
+        if self._max_log_length == 0:
+            return
+
         log = self._log
 
         # remove first entry if log is too long
         if len(log) > self._max_log_length:
             log.pop(0)
 
+        # wall clock time for humans, monotonic time in ns to order and
+        # align entries, also across devices
         entry = {
             'kind': kind,
             'time': time(),
+            'monotonic_ns': perf_counter_ns(),
             'content': message
         }
 
         log.append(entry)
 
+    def _acquire(self):
+        if self._registry is None:
+            from .registry import default_registry
+            self._registry = default_registry
+
+        connection = self._registry.acquire(self._port,
+                                            **self._serial_kwargs)
+        self._connection = connection
+        self._serial = connection.serial
+        self._framer = connection.framer
+        self._lock = connection.lock
+
     def open(self):
         """
-        Open serial connection to device.
+        Open serial connection to device. Shared connections are acquired
+        from the registry.
         """
-        self._serial.open()
+        if not self._shared:
+            self._serial.open()
+            return
+
+        if self._connection is not None:
+            if self._serial.is_open:
+                return
+
+            # the connection has been closed by the registry
+            self._connection = None
+
+        self._acquire()
 
     def close(self):
         """
-        Close serial connection to device.
+        Close serial connection to device. Shared connections are released
+        and stay open while other device objects use them.
         """
-        self._serial.close()
+        if not self._shared:
+            self._serial.close()
+            return
+
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            if connection.refcount > 0:
+                self._registry.release(connection)
+
+    def __enter__(self):
+        if not self.is_open:
+            self.open()
+
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _call(self, func, *args):
+        # runs a complete command/response exchange while holding the lock
+        policy = self._reconnect_policy
+        if policy is None:
+            with self._lock:
+                return func(*args)
+
+        if policy.queued == 'fail' and self._reconnecting:
+            raise ConnectionLostError(
+                'Connection to {} is being restored'.format(self._port))
+
+        generation = self._generation
+        with self._lock:
+            if policy.queued == 'fail' and generation != self._generation:
+                raise ConnectionLostError(
+                    'Connection to {} was lost'.format(self._port))
 
-    def query(self, cmd):
+            try:
+                return func(*args)
+            except (ResponseTimeoutError, ConnectionLostError):
+                raise
+            except (IOError, OSError) as e:
+                # includes serial.SerialException
+                self.reconnect(reason=e)
+
+                if policy.queued == 'fail':
+                    raise ConnectionLostError(
+                        'Connection to {} was lost: {}'.format(self._port, e))
+
+                return func(*args)
+
+    def reconnect(self, reason=None):
+        """
+        Reopen the serial connection and restore the session, see
+        ReconnectPolicy. Called automatically if a reconnect policy is set.
+
+        Args:
+            reason (Exception, optional): Error which caused the reconnect,
+                for the log
+
+        Raises:
+            ConnectionLostError: If the connection could not be restored
+                before the deadline
+        """
+        policy = self._reconnect_policy or ReconnectPolicy()
+
+        with self._lock:
+            self._reconnecting = True
+            self._generation += 1
+            start = monotonic()
+            deadline = start + policy.deadline
+            delays = policy.delays()
+
+            try:
+                while True:
+                    try:
+                        self._reopen()
+                        self._restore_session(
+                            max(deadline - monotonic(), policy.initial_delay))
+                        break
+                    except ConnectionLostError:
+                        raise
+                    except (IOError, OSError) as e:
+                        error = e
+
+                    delay = next(delays)
+                    if monotonic() + delay > deadline:
+                        raise ConnectionLostError(
+                            'Could not reconnect to {} within {}s: {}'.format(
+                                self._port, policy.deadline, error))
+
+                    sleep(delay)
+            finally:
+                self._reconnecting = False
+
+            self._logger('reconnect', {
+                'reason': None if reason is None else str(reason),
+                'duration': monotonic() - start
+            })
+
+    def _reopen(self):
+        try:
+            self._serial.close()
+        except (IOError, OSError):
+            pass
+
+        self._serial.open()
+
+        # partial lines received before the connection loss are incomplete
+        self._framer.clear()
+        self._connection.resync = None
+
+    def _restore_session(self, timeout):
+        # called after reopening the connection, subclasses restore state
+        # which was lost with the connection
+        pass
+
+    def query(self, cmd, timeout=None):
         """
         Send command to device and immediately read response
 
         Args:
             cmd (bytes): Command
+            timeout (float, optional): Deadline for the response in s, the
+                                       device timeout by default
 
         Returns:
             bytes: The response from the device
+
+        Raises:
+            ResponseTimeoutError: If there is no response before the deadline
         """
+        return self._call(self._query, cmd, timeout)
+
+    def _query(self, cmd, timeout=None):
         self.write(cmd)
-        return self.read()
+        return self.read(timeout=timeout)
+
+    def transact(self, cmds, timeout=None, line_ending=b'\n'):
+        """
+        Send several commands at once and read one response per command
+        (pipelining).
+
+        Args:
+            cmds (list): Commands (bytes)
+            timeout (float, optional): Deadline for all responses in s, the
+                                       device timeout by default
+
+        Returns:
+            list: The responses from the device (bytes)
+
+        Raises:
+            ResponseTimeoutError: If the responses do not arrive before the
+                                  deadline
+        """
+        if len(cmds) == 0:
+            return []
+
+        if timeout is None:
+            timeout = self._timeout
+
+        return self._call(self._transact, cmds, timeout, line_ending)
+
+    def _transact(self, cmds, timeout=None, line_ending=b'\n', stamp=None):
+        # stamp is called with None immediately before the first command is
+        # written and with the index of each response after it has been read
+        pacer = self._pacer
+        if pacer is not None and pacer.gap > 0:
+            # the device needs a gap between commands, write them one by one
+            # without waiting for responses
+            for idx, cmd in enumerate(cmds):
+                self._write_lines((cmd,), line_ending,
+                                  stamp if idx == 0 else None)
+        else:
+            self._write_lines(cmds, line_ending, stamp)
+
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = monotonic() + timeout
+
+        responses = []
+        try:
+            for idx in range(len(cmds)):
+                responses.append(self.read(
+                    timeout=None if deadline is None
+                    else max(0, deadline - monotonic())))
+
+                if stamp is not None:
+                    stamp(idx)
+        except ResponseTimeoutError:
+            # late responses arrive within about the deadline of the batch
+            if timeout is not None:
+                self._stale(timeout)
+            raise
+
+        return responses
 
     def write(self, data, line_ending=b'\n'):
         """
@@ -73,28 +388,113 @@ class SerialDevice(object):
         Args:
             data (bytes): Data
         """
+        self._write_lines((data,), line_ending)
+
+    def _write_lines(self, lines, line_ending=b'\n', stamp=None):
+        # all lines are sent with a single write from the reusable buffer
         if not self.is_open:
             self.open()
 
-        string = data + line_ending
-        self._logger('write', string)
+        if self._connection.resync is not None:
+            self._discard_stale_input()
 
-        self._serial.write(string)
+        buffer = self._write_buffer
+        del buffer[:]
+        for line in lines:
+            buffer += line
+            buffer += line_ending
 
-    def read(self):
+        if self._max_log_length > 0 or self._spill is not None:
+            self._logger('write', bytes(buffer))
+
+        if self._pacer is not None:
+            self._pacer.wait()
+
+        # stale input and the pacer gap are not part of the request time
+        if stamp is not None:
+            stamp(None)
+
+        self._serial.write(buffer)
+
+    def read(self, timeout=None):
+        """
+        Read the next line from the device. Bytes received after the line are
+        buffered for subsequent reads.
+
+        Args:
+            timeout (float, optional): Deadline for the line in s, the device
+                                       timeout by default
+
+        Returns:
+            bytes: The line including line ending
+
+        Raises:
+            ResponseTimeoutError: If there is no complete line before the
+                                  deadline
+        """
         if not self.is_open:
             self.open()
 
-        result = self._serial.readline()
+        if timeout is None:
+            timeout = self._timeout
+
+        result = self._framer.readline(self._serial, timeout)
+        if result is None:
+            self._stale(timeout)
+            raise ResponseTimeoutError(
+                'No response within {}s'.format(timeout))
+
         self._logger('read', result)
 
+        if self._pacer is not None:
+            self._pacer.record(result)
+
         return result
 
+    def _stale(self, quiet):
+        # input received after a timeout is stale and discarded before the
+        # next command is sent, also by other device objects sharing the
+        # connection
+        connection = self._connection
+        connection.resync = max(quiet, connection.resync or 0)
+
+    def _discard_stale_input(self):
+        connection = self._connection
+        quiet, connection.resync = connection.resync, None
+
+        # late responses to timed out commands would otherwise be read as
+        # responses to the following commands
+        stale = self._framer.discard(self._serial, quiet)
+        if len(stale) > 0:
+            self._logger('discard', stale)
+
     @property
     def is_open(self):
         """Status of the serial connection (boolean)"""
+        if self._shared and self._connection is None:
+            return False
+
         return self._serial.is_open
 
+    @property
+    def shared(self):
+        """Uses a connection shared with other device objects (boolean)"""
+        return self._shared
+
+    @property
+    def pacer(self):
+        """Adaptive command pacer (AdaptivePacer or None)"""
+        return self._pacer
+
+    @property
+    def timeout(self):
+        """Default deadline for responses in s (float or None)"""
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, value):
+        self._timeout = value
+
     @property
     def log(self):
         """Log entries (list)"""
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides the registry of the settings of the temperature
+controller. Each setting is defined once with its command, scale, unit,
+range and volatility. The properties of MTD415TDevice are generated from the
+registry, and the same metadata is used for bulk validation, conversion of
+arrays of values and batched reads.
+
+Values are sent to and received from the device as integers, most settings
+in thousandths of their unit (scale 1e3).
+
+Example:
+    from thorlabs_mtd415t import settings
+
+    settings.get('temp_setpoint').to_raw(20.5) # => 20500
+    settings.validate_config({'p_gain': 1.5, 'i_gain': 0.1})
+    # => {'p_gain': 1500, 'i_gain': 100}
+    settings.readable(volatile=False) # => ['tec_current_limit', ...]
+"""
+
+from .helpers import validate_is_float_or_int, validate_is_in_range
+
+
+class Setting(object):
+    """
+    Definition of a setting.
+
+    Args:
+        name (string): Property name, e. g. 'temp_setpoint'
+        command (string): Command, e. g. 'T'
+        unit (string): Unit of the value
+        doc (string): Docstring of the property
+        scale (float, optional): Raw value per unit, 1e3 by default, None
+            for integer settings without scaling
+        value_range (tuple, optional): Minimum and maximum value of writable
+            settings, None for read-only settings
+        label (string, optional): Human readable name for error messages
+        range_unit (string, optional): Unit in range error messages
+        volatile (boolean, optional): The value changes by itself, e. g.
+            measured values, False by default
+        retry (boolean, optional): Retry reads after 'unknown command', True
+            by default
+    """
+
+    def __init__(self, name, command, unit, doc, scale=1e3, value_range=None,
+                 label=None, range_unit='', volatile=False, retry=True):
+        self.name = name
+        self.command = command
+        self.unit = unit
+        self.doc = doc
+        self.scale = scale
+        self.value_range = value_range
+        self.label = label or name
+        self.range_unit = range_unit
+        self.volatile = volatile
+        self.retry = retry
+
+        self.query_command = command.encode('ascii') + b'?'
+
+    @property
+    def writable(self):
+        """Setting can be written (boolean)"""
+        return self.value_range is not None
+
+    def quantize(self, value):
+        """
+        Convert a value to the raw integer sent to the device, without
+        validation.
+
+        Args:
+            value (float): Value
+
+        Returns:
+            int: Raw value
+        """
+        if self.scale is None:
+            return int(value)
+
+        return round(value*self.scale)
+
+    def to_raw(self, value):
+        """
+        Validate a value and convert it to the raw integer sent to the
+        device.
+
+        Args:
+            value (float): Value
+
+        Returns:
+            int: Raw value
+
+        Raises:
+            ValueError: If the setting is read-only or the value is not a
+                number in range
+        """
+        if not self.writable:
+            raise ValueError('{} cannot be written'.format(self.label))
+
+        validate_is_float_or_int(value, self.label)
+
+        # integer settings are truncated before the range check
+        if self.scale is None:
+            value = int(value)
+
+        validate_is_in_range(value, self.value_range[0], self.value_range[1],
+                             self.label, self.range_unit)
+
+        return self.quantize(value)
+
+    def from_raw(self, raw):
+        """
+        Convert a raw integer received from the device.
+
+        Args:
+            raw (int): Raw value
+
+        Returns:
+            float: Value (int for settings without scaling)
+        """
+        return raw if self.scale is None else raw / self.scale
+
+    def to_raw_many(self, values):
+        """
+        Validate and convert many values at once, e. g. a setpoint ramp.
+
+        Args:
+            values (iterable): Values
+
+        Returns:
+            list: Raw values (int)
+
+        Raises:
+            ValueError: If any value is invalid
+        """
+        return [self.to_raw(value) for value in values]
+
+    def from_raw_many(self, raws):
+        """
+        Convert many raw integers at once.
+
+        Args:
+            raws (iterable): Raw values
+
+        Returns:
+            list: Values
+        """
+        if self.scale is None:
+            return [int(raw) for raw in raws]
+
+        scale = self.scale
+        return [raw / scale for raw in raws]
+
+    def __repr__(self):
+        return '<Setting {} ({})>'.format(self.name, self.command)
+
+
+SETTINGS = (
+    Setting('tec_current_limit', 'L', 'A',
+            'TEC current limit in A (float, >= 0.200 and <= 2.000)',
+            value_range=(0.2, 2), label='TEC current limit', range_unit=' A'),
+    Setting('tec_current', 'A', 'A', 'TEC current in A (float)',
+            volatile=True),
+    Setting('tec_voltage', 'U', 'V', 'TEC voltage in V (float)',
+            volatile=True, retry=False),
+    Setting('temp', 'Te', '° C', 'Current temperature in ° C (float)',
+            volatile=True),
+    Setting('temp_setpoint', 'T', '° C',
+            'Temperature setpoint in ° C (float, >= 5.000 and <= 45.000)',
+            value_range=(5, 45), label='Temperature setpoint',
+            range_unit='° C'),
+    Setting('status_temp_window', 'W', 'K',
+            'Temperature window for the status pin in K (float, >= 1e-3 and '
+            '<= 32.768)',
+            value_range=(1e-3, 32.768), label='Status temperature window',
+            range_unit='° C'),
+    Setting('status_delay', 'd', 's',
+            'Delay for changing the status pin in s (int, >=1 and <= 32768)',
+            scale=None, value_range=(1, 32768), label='Status delay',
+            range_unit=' s'),
+    Setting('critical_gain', 'G', 'A/K',
+            'Critical gain in A/K (float, >=10e-3 and <= 100)',
+            value_range=(10e-3, 100), label='Critical gain',
+            range_unit=' A/K'),
+    Setting('critical_period', 'O', 's',
+            'Critical period in s (float, >=100e-3 and <= 100.000)',
+            value_range=(100e-3, 100e3), label='Critical period',
+            range_unit=' s'),
+    Setting('cycling_time', 'C', 's',
+            'Cycling time in s (float, >= 1e-3 and <= 1.000)',
+            value_range=(1e-3, 1), label='Cycling time', range_unit=' s'),
+    Setting('p_gain', 'P', 'A/K',
+            'Proportional gain in A/K (float, >=0 and <= 100.000)',
+            value_range=(0, 100), label='P gain', range_unit=' A/K'),
+    Setting('i_gain', 'I', 'A/(K x s)',
+            'Integrator gain in A/(K x s) (float, >=0 and <= 100.000)',
+            value_range=(0, 100), label='I gain', range_unit=' A/(K x s)'),
+    Setting('d_gain', 'D', '(A x s)/K',
+            'Differential gain in (A x s)/K (float, >=0 and <= 100.000)',
+            value_range=(0, 100), label='D gain', range_unit=' (A x s)/K')
+)
+
+_BY_NAME = dict((setting.name, setting) for setting in SETTINGS)
+
+
+def get(name):
+    """
+    Look up a setting.
+
+    Args:
+        name (string): Property name
+
+    Returns:
+        Setting: Setting
+
+    Raises:
+        ValueError: If there is no such setting
+    """
+    try:
+        return _BY_NAME[name]
+    except KeyError:
+        raise ValueError('unknown setting {!r}'.format(name))
+
+
+def readable(volatile=None):
+    """
+    Names of the settings which can be read, e. g. for batched snapshots.
+
+    Args:
+        volatile (boolean, optional): Only volatile (True) or only
+            non-volatile (False) settings, all by default
+
+    Returns:
+        list: Property names in registry order
+    """
+    return [setting.name for setting in SETTINGS
+            if volatile is None or setting.volatile == volatile]
+
+
+def writable():
+    """
+    Names of the settings which can be written.
+
+    Returns:
+        list: Property names in registry order
+    """
+    return [setting.name for setting in SETTINGS if setting.writable]
+
+
+def validate_config(config):
+    """
+    Validate a whole configuration at once and convert it to raw values.
+    All problems are reported together.
+
+    Args:
+        config (dict): Values by property name
+
+    Returns:
+        dict: Raw values by property name
+
+    Raises:
+        ValueError: If any setting is unknown, read-only or invalid
+    """
+    raw = {}
+    errors = []
+
+    for name in sorted(config):
+        try:
+            raw[name] = get(name).to_raw(config[name])
+        except ValueError as e:
+            errors.append(str(e))
+
+    if len(errors) > 0:
+        raise ValueError('invalid configuration: {}'.format('; '.join(
+            errors)))
+
+    return raw
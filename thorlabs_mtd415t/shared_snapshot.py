@@ -0,0 +1,287 @@
+"""
+This module provides the SnapshotPublisher and SnapshotReader classes which
+share the latest temperature and TEC current of many temperature controllers
+with other local processes through shared memory.
+
+The publisher owns the devices and writes one fixed-size slot per device.
+Each slot is protected by a sequence counter (seqlock): the writer makes the
+counter odd before and even after updating the slot, readers retry if the
+counter is odd or has changed while reading. Readers never block the writer
+and never cause serial traffic. Requires Python >= 3.8.
+
+Example:
+    # owning process
+    from thorlabs_mtd415t import MTD415TDevice
+    from thorlabs_mtd415t.shared_snapshot import SnapshotPublisher
+
+    devices = [MTD415TDevice(port) for port in ports]
+    publisher = SnapshotPublisher('mtd415t', len(devices))
+    publisher.start(devices, interval=0.5)
+
+    # any other process
+    from thorlabs_mtd415t.shared_snapshot import SnapshotReader
+
+    reader = SnapshotReader('mtd415t')
+    reader.read(0) # => Snapshot(uid='ABC', temp=15.02, tec_current=0.12,
+                   #             timestamp=12345.6)
+"""
+
+import os
+import struct
+from collections import namedtuple
+from time import monotonic
+
+_MAGIC = b'MTD415T1'
+_HEADER = struct.Struct('<8sII')
+_SEQ = struct.Struct('<I')
+_PAYLOAD = struct.Struct('<16sddd')
+
+# slots are aligned to cache lines
+_SLOT_SIZE = 64
+
+Snapshot = namedtuple('Snapshot', ('uid', 'temp', 'tec_current', 'timestamp'))
+Snapshot.__doc__ = """Latest values of a device, timestamp is the acquisition
+time in s (time.monotonic, comparable across processes)"""
+
+
+def _attach(name, create=False, size=0):
+    from multiprocessing.shared_memory import SharedMemory
+
+    if create:
+        return SharedMemory(name, create=True, size=size)
+
+    # the segment is owned by the publisher, the resource tracker of a
+    # reader would remove it when the reader exits
+    try:
+        return SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13
+        shm = SharedMemory(name)
+
+    if os.name == 'posix':
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, 'shared_memory')
+
+    return shm
+
+
+class SnapshotPublisher(object):
+    """
+    Writes snapshots of devices to a shared memory segment.
+
+    Args:
+        name (string): Name of the shared memory segment
+        slots (int): Number of devices
+    """
+
+    def __init__(self, name, slots):
+        self._shm = _attach(name, create=True,
+                            size=_HEADER.size + _SLOT_SIZE * (slots + 1))
+        self._buf = self._shm.buf
+        self._slots = slots
+        self._seqs = [0] * slots
+
+        _HEADER.pack_into(self._buf, 0, _MAGIC, slots, _SLOT_SIZE)
+
+        self._thread = None
+        self._stop = None
+
+    def _offset(self, index):
+        if index < 0 or index >= self._slots:
+            raise IndexError('slot index out of range')
+
+        # slots start at the first cache line after the header
+        return _SLOT_SIZE * (index + 1)
+
+    def publish(self, index, uid, temp, tec_current, timestamp=None):
+        """
+        Write a snapshot to a slot.
+
+        Args:
+            index (int): Slot index
+            uid (string): Unique device identifier (at most 16 characters)
+            temp (float): Temperature in degree C
+            tec_current (float): TEC current in A
+            timestamp (float, optional): Acquisition time in s
+                (time.monotonic), now by default
+        """
+        offset = self._offset(index)
+        if timestamp is None:
+            timestamp = monotonic()
+
+        buf = self._buf
+        seq = self._seqs[index]
+
+        _SEQ.pack_into(buf, offset, (seq + 1) & 0xffffffff)
+        _PAYLOAD.pack_into(buf, offset + _SEQ.size,
+                           (uid or '').encode('ascii'), temp, tec_current,
+                           timestamp)
+        seq = (seq + 2) & 0xffffffff
+        _SEQ.pack_into(buf, offset, seq)
+
+        self._seqs[index] = seq
+
+    def update(self, index, device):
+        """
+        Read temperature and TEC current of a device in a single pipelined
+        batch and publish them.
+
+        Args:
+            index (int): Slot index
+            device (MTD415TDevice): Temperature controller
+        """
+        uid = device.uid
+        temp, tec_current = device.transact(
+            [device._query_command('Te'), device._query_command('A')])
+        self.publish(index, uid, int(temp) / 1e3, int(tec_current) / 1e3)
+
+    def start(self, devices, interval=1.0):
+        """
+        Update the snapshots of all devices periodically in a background
+        thread. Devices which fail to respond keep their previous snapshot.
+
+        Args:
+            devices (list): Temperature controllers (MTD415TDevice), one per
+                slot
+            interval (float, optional): Update interval in s, 1 by default
+        """
+        import threading
+
+        if self._thread is not None:
+            raise RuntimeError('publisher has already been started')
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(list(devices), interval))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, devices, interval):
+        while not self._stop.is_set():
+            start = monotonic()
+            for index, device in enumerate(devices):
+                try:
+                    self.update(index, device)
+                except (ValueError, IOError):
+                    continue
+
+            self._stop.wait(max(0, interval - (monotonic() - start)))
+
+    def stop(self):
+        """Stop the background thread"""
+        if self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def close(self, unlink=True):
+        """
+        Stop updates and release the shared memory segment.
+
+        Args:
+            unlink (boolean, optional): Remove the segment, True by default
+        """
+        self.stop()
+
+        self._buf = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+class SnapshotReader(object):
+    """
+    Reads snapshots from a shared memory segment without locks.
+
+    Args:
+        name (string): Name of the shared memory segment
+        retries (int, optional): Maximum number of attempts to read a
+            consistent slot, 10000 by default
+    """
+
+    def __init__(self, name, retries=10000):
+        self._shm = _attach(name)
+        self._buf = self._shm.buf
+        self._retries = retries
+
+        magic, slots, slot_size = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC:
+            raise ValueError('{} is not a snapshot segment'.format(name))
+
+        self._slots = slots
+        self._slot_size = slot_size
+
+    def __len__(self):
+        return self._slots
+
+    def read(self, index):
+        """
+        Read the snapshot of a device.
+
+        Args:
+            index (int): Slot index
+
+        Returns:
+            Snapshot: Latest values, None if nothing has been published yet
+
+        Raises:
+            RuntimeError: If no consistent snapshot could be read, e. g. the
+                publisher died while writing
+        """
+        if index < 0 or index >= self._slots:
+            raise IndexError('slot index out of range')
+
+        buf = self._buf
+        offset = self._slot_size * (index + 1)
+        seq_unpack = _SEQ.unpack_from
+        payload_unpack = _PAYLOAD.unpack_from
+
+        for _ in range(self._retries):
+            seq, = seq_unpack(buf, offset)
+            if seq & 1:
+                continue
+
+            uid, temp, tec_current, timestamp = \
+                payload_unpack(buf, offset + 4)
+
+            if seq_unpack(buf, offset)[0] == seq:
+                if seq == 0:
+                    return None
+
+                return Snapshot(uid.rstrip(b'\0').decode('ascii'), temp,
+                                tec_current, timestamp)
+
+        raise RuntimeError('no consistent snapshot in slot {}'.format(index))
+
+    def read_all(self):
+        """
+        Read the snapshots of all devices.
+
+        Returns:
+            list: Snapshots (None for slots without snapshot)
+        """
+        return [self.read(index) for index in range(self._slots)]
+
+    def find(self, uid):
+        """
+        Find the slot of a device.
+
+        Args:
+            uid (string): Unique device identifier
+
+        Returns:
+            int: Slot index, None if the device is not published
+        """
+        for index in range(self._slots):
+            snapshot = self.read(index)
+            if snapshot is not None and snapshot.uid == uid:
+                return index
+
+        return None
+
+    def close(self):
+        """Detach from the shared memory segment"""
+        self._buf = None
+        self._shm.close()
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+"""
+This module provides a harness to search PID settings against a simulated
+thermal load, e. g. to preselect a few candidates for a new load before
+trying them on the hardware.
+
+Each candidate is a dict of settings (p_gain, i_gain, d_gain, cycling_time,
+tec_current_limit or critical_gain and critical_period). It is validated
+against the settings registry and a temperature step is simulated faster
+than real time. Runs are scored on settling time, overshoot and TEC current
+usage and are distributed over a process pool.
+
+The plant is a first-order thermal load with dead time driven by the TEC
+current. The controller is an ideal PID with the cycling time as sample
+time, current limit and conditional integration. This is a model of the
+load, not of the firmware, results rank candidates but do not predict the
+hardware exactly.
+
+Example:
+    from thorlabs_mtd415t.tuning import ThermalPlant, grid, sweep
+
+    plant = ThermalPlant(time_constant=40, heating=0.8, dead_time=1.5)
+    candidates = grid(p_gain=[0.5, 1, 2, 4], i_gain=[0.01, 0.05, 0.1])
+    results = sweep(candidates, plant, step=(22, 30))
+    results[0].candidate # => {'i_gain': 0.05, 'p_gain': 1}
+
+    # or from the command line
+    # python -m thorlabs_mtd415t.tuning --random 500 --top 5
+"""
+
+import itertools
+import math
+import random
+from collections import deque, namedtuple
+
+from . import settings
+from .emulator import DEFAULT_SETTINGS
+
+# settings used by the simulation and their defaults
+PID_SETTINGS = ('p_gain', 'i_gain', 'd_gain', 'cycling_time',
+                'tec_current_limit')
+
+# ranges of random searches, sampled logarithmically
+DEFAULT_RANGES = {
+    'p_gain': (0.05, 20.0),
+    'i_gain': (1e-3, 2.0),
+    'd_gain': (1e-3, 20.0)
+}
+
+DEFAULT_WEIGHTS = {'settling_time': 1.0, 'overshoot': 1.0, 'current': 0.1}
+
+StepResult = namedtuple('StepResult', (
+    'candidate', 'settling_time', 'overshoot', 'mean_current',
+    'peak_current', 'score'))
+StepResult.__doc__ = """Result of a simulated step: settling time in s (None if
+the temperature did not settle), overshoot in K, mean and peak absolute TEC
+current in A, score (lower is better)"""
+
+
+def _default(name):
+    setting = settings.get(name)
+    return setting.from_raw(DEFAULT_SETTINGS[setting.command])
+
+
+class ThermalPlant(object):
+    """
+    First-order thermal load with dead time.
+
+    Args:
+        time_constant (float, optional): Time constant of the relaxation to
+            ambient temperature in s, 30 by default
+        heating (float, optional): Temperature rate per TEC current in K/(A x
+            s), 0.5 by default
+        ambient (float, optional): Ambient temperature in ° C, 22 by default
+        dead_time (float, optional): Delay between TEC current and sensor in
+            s, 0.5 by default
+    """
+
+    def __init__(self, time_constant=30.0, heating=0.5, ambient=22.0,
+                 dead_time=0.5):
+        self.time_constant = time_constant
+        self.heating = heating
+        self.ambient = ambient
+        self.dead_time = dead_time
+
+    def __repr__(self):
+        return ('ThermalPlant(time_constant={!r}, heating={!r}, ambient={!r},'
+                ' dead_time={!r})').format(self.time_constant, self.heating,
+                                           self.ambient, self.dead_time)
+
+
+def ziegler_nichols(critical_gain, critical_period):
+    """
+    Classic Ziegler-Nichols PID gains from the critical gain and period.
+
+    Args:
+        critical_gain (float): Critical gain in A/K
+        critical_period (float): Critical period in s
+
+    Returns:
+        dict: p_gain, i_gain and d_gain
+    """
+    p_gain = 0.6 * critical_gain
+
+    return {
+        'p_gain': p_gain,
+        'i_gain': 2 * p_gain / critical_period,
+        'd_gain': p_gain * critical_period / 8
+    }
+
+
+def _resolve(candidate):
+    # validated PID settings of a candidate, defaults for missing ones
+    settings.validate_config(candidate)
+
+    resolved = dict((name, _default(name)) for name in PID_SETTINGS)
+    if 'critical_gain' in candidate or 'critical_period' in candidate:
+        resolved.update(ziegler_nichols(
+            candidate.get('critical_gain', _default('critical_gain')),
+            candidate.get('critical_period', _default('critical_period'))))
+
+    resolved.update((name, value) for name, value in candidate.items()
+                    if name in PID_SETTINGS)
+
+    # derived gains are limited like written ones
+    for name in ('p_gain', 'i_gain', 'd_gain'):
+        low, high = settings.get(name).value_range
+        resolved[name] = min(max(resolved[name], low), high)
+
+    return resolved
+
+
+def simulate(candidate, plant=None, step=(22.0, 30.0), duration=300.0,
+             window=0.1, weights=None):
+    """
+    Simulate a setpoint step with the settings of a candidate.
+
+    Args:
+        candidate (dict): Settings by property name
+        plant (ThermalPlant, optional): Thermal load, default plant by
+            default
+        step (tuple, optional): Initial temperature and setpoint in ° C,
+            (22, 30) by default
+        duration (float, optional): Simulated time in s, 300 by default
+        window (float, optional): Temperature window for the settling time
+            in K, 0.1 by default
+        weights (dict, optional): Weights of the normalized settling time,
+            overshoot and mean current in the score, DEFAULT_WEIGHTS by
+            default
+
+    Returns:
+        StepResult: Result
+
+    Raises:
+        ValueError: If a setting of the candidate is invalid
+    """
+    pid = _resolve(candidate)
+    plant = plant or ThermalPlant()
+    weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+
+    dt = pid['cycling_time']
+    limit = pid['tec_current_limit']
+    p_gain, i_gain, d_gain = pid['p_gain'], pid['i_gain'], pid['d_gain']
+
+    start, setpoint = step
+    direction = 1 if setpoint >= start else -1
+    steps = int(round(duration / dt))
+
+    # exact discretization of the first-order load for a constant current
+    # within each cycle
+    decay = math.exp(-dt / plant.time_constant)
+    gain = plant.heating * plant.time_constant * (1 - decay)
+    ambient = plant.ambient
+    delayed = deque([0.0] * int(round(plant.dead_time / dt)))
+
+    temp = start
+    integral = 0.0
+    previous = start
+    settled_since = None
+    overshoot = 0.0
+    total_current = 0.0
+    peak_current = 0.0
+
+    for idx in range(steps):
+        error = setpoint - temp
+
+        # derivative on measurement, setpoint steps do not kick
+        derivative = -(temp - previous) / dt
+        previous = temp
+
+        output = p_gain * error + i_gain * integral + d_gain * derivative
+        current = min(max(output, -limit), limit)
+
+        # conditional integration, the integrator does not wind up while
+        # the current is limited
+        if current == output or error * output < 0:
+            integral += error * dt
+
+        delayed.append(current)
+        applied = delayed.popleft()
+
+        temp = ambient + (temp - ambient) * decay + gain * applied
+
+        total_current += abs(current)
+        peak_current = max(peak_current, abs(current))
+        overshoot = max(overshoot, (temp - setpoint) * direction)
+
+        if abs(temp - setpoint) <= window:
+            if settled_since is None:
+                settled_since = (idx + 1) * dt
+        else:
+            settled_since = None
+
+    mean_current = total_current / steps if steps > 0 else 0.0
+    amplitude = max(abs(setpoint - start), window)
+
+    settling = settled_since if settled_since is not None else duration
+    score = weights['settling_time'] * settling / duration + \
+        weights['overshoot'] * overshoot / amplitude + \
+        weights['current'] * mean_current / limit
+
+    return StepResult(dict(candidate), settled_since, overshoot,
+                      mean_current, peak_current, score)
+
+
+def _simulate(args):
+    # entry point of the worker processes
+    candidate, kwargs = args
+    return simulate(candidate, **kwargs)
+
+
+def grid(**axes):
+    """
+    All combinations of the given values.
+
+    Args:
+        **axes: Values (list) by property name
+
+    Returns:
+        list: Candidates (dict)
+    """
+    names = sorted(axes)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(axes[name] for name in names))]
+
+
+def random_candidates(count, seed=None, ranges=None):
+    """
+    Random candidates, values are sampled logarithmically between the
+    limits.
+
+    Args:
+        count (int): Number of candidates
+        seed (int, optional): Seed of the random generator
+        ranges (dict, optional): Lower and upper limit (tuple) by property
+            name, DEFAULT_RANGES by default
+
+    Returns:
+        list: Candidates (dict)
+    """
+    rand = random.Random(seed)
+    ranges = ranges or DEFAULT_RANGES
+    names = sorted(ranges)
+
+    candidates = []
+    for _ in range(count):
+        candidate = {}
+        for name in names:
+            low, high = ranges[name]
+            candidate[name] = round(math.exp(rand.uniform(
+                math.log(low), math.log(high))), 3)
+        candidates.append(candidate)
+
+    return candidates
+
+
+def sweep(candidates, plant=None, processes=None, **kwargs):
+    """
+    Simulate candidates in a process pool and rank them.
+
+    Args:
+        candidates (list): Candidates (dict)
+        plant (ThermalPlant, optional): Thermal load, default plant by
+            default
+        processes (int, optional): Number of worker processes, all cores by
+            default, 1 runs in the calling process
+        **kwargs: Arguments for simulate
+
+    Returns:
+        list: Results (StepResult) sorted by score, best first
+
+    Raises:
+        ValueError: If a setting of any candidate is invalid, before any
+            simulation
+    """
+    candidates = list(candidates)
+    for candidate in candidates:
+        _resolve(candidate)
+
+    kwargs['plant'] = plant
+    jobs = [(candidate, kwargs) for candidate in candidates]
+
+    if processes == 1 or len(jobs) <= 1:
+        results = [_simulate(job) for job in jobs]
+    else:
+        import os
+        from concurrent.futures import ProcessPoolExecutor
+
+        processes = processes or os.cpu_count() or 1
+        chunksize = max(1, len(jobs) // (4 * processes))
+        with ProcessPoolExecutor(max_workers=processes) as ex:
+            results = list(ex.map(_simulate, jobs, chunksize=chunksize))
+
+    return sorted(results, key=lambda result: result.score)
+
+
+def _parse_axis(value):
+    name, sep, values = value.partition('=')
+    if sep != '=' or values == '':
+        raise ValueError('invalid grid axis {!r}, expected '
+                         'name=value,value,...'.format(value))
+
+    return name, [float(v) for v in values.split(',')]
+
+
+def main(argv=None, out=None):
+    import argparse
+    import sys
+
+    out = out or sys.stdout
+
+    parser = argparse.ArgumentParser(
+        prog='python -m thorlabs_mtd415t.tuning',
+        description='Search PID settings against a simulated thermal load.')
+    parser.add_argument('--grid', action='append', default=[],
+                        metavar='NAME=V1,V2,...',
+                        help='grid axis, repeat for several settings')
+    parser.add_argument('--random', type=int, default=200,
+                        help='number of random candidates without --grid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=float, default=22.0)
+    parser.add_argument('--setpoint', type=float, default=30.0)
+    parser.add_argument('--duration', type=float, default=300.0)
+    parser.add_argument('--time-constant', type=float, default=30.0)
+    parser.add_argument('--heating', type=float, default=0.5)
+    parser.add_argument('--dead-time', type=float, default=0.5)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    try:
+        if len(args.grid) > 0:
+            candidates = grid(**dict(_parse_axis(axis)
+                                     for axis in args.grid))
+        else:
+            candidates = random_candidates(args.random, args.seed)
+
+        plant = ThermalPlant(time_constant=args.time_constant,
+                             heating=args.heating, ambient=args.start,
+                             dead_time=args.dead_time)
+        results = sweep(candidates, plant, processes=args.processes,
+                        step=(args.start, args.setpoint),
+                        duration=args.duration)
+    except ValueError as e:
+        sys.stderr.write('tuning: error: {}\n'.format(e))
+        return 1
+
+    out.write('{:>8} {:>10} {:>11} {:>10} {:>9}  {}\n'.format(
+        'score', 'settling s', 'overshoot K', 'mean A', 'peak A',
+        'candidate'))
+    for result in results[:args.top]:
+        settling = '-' if result.settling_time is None \
+            else '{:.2f}'.format(result.settling_time)
+        out.write('{:>8.4f} {:>10} {:>11.3f} {:>10.3f} {:>9.3f}  {}\n'.format(
+            result.score, settling, result.overshoot, result.mean_current,
+            result.peak_current, ' '.join(
+                '{}={}'.format(name, value)
+                for name, value in sorted(result.candidate.items()))))
+
+    return 0
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,228 @@
+"""
+This module provides NumPy-backed batch conversions for large amounts of
+data, e. g. responses of pipelined polling, recorded or spilled logs and
+setpoint or gain schedules. NumPy is optional, install it with
+
+    $ pip install thorlabs-mtd415t[numpy]
+
+Responses are parsed from the raw bytes without decoding them line by line,
+values are scaled and quantized as whole arrays with the same rounding as
+the setters of MTD415TDevice.
+
+Example:
+    from thorlabs_mtd415t import vectorized
+
+    raw = vectorized.parse_responses(b'15020\\n15031\\n15027\\n')
+    vectorized.from_raw(raw, 'temp') # => array([15.02 , 15.031, 15.027])
+
+    ramp = numpy.linspace(20, 25, 501)
+    vectorized.to_raw(ramp, 'temp_setpoint') # => array([20000, ...])
+"""
+
+import warnings
+
+from . import settings
+
+_INT32_MIN = -2**31
+_INT32_MAX = 2**31 - 1
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('NumPy is required for vectorized conversions, '
+                          'install thorlabs-mtd415t[numpy]')
+
+    return numpy
+
+
+def parse_responses(buffer, invalid=None):
+    """
+    Parse newline-separated integer responses into an array.
+
+    Args:
+        buffer (bytes): Responses, e. g. the joined reads of a batch, a
+            missing final newline is allowed
+        invalid (int, optional): Value for responses which are not integers,
+            e. g. 'unknown command', invalid responses raise ValueError by
+            default
+
+    Returns:
+        numpy.ndarray: Raw values (int32), one per response
+
+    Raises:
+        ValueError: If a response is not an integer within the int32 range
+            and no invalid value is given
+    """
+    np = _numpy()
+
+    data = np.frombuffer(bytes(buffer), dtype=np.uint8)
+    if len(data) > 0 and data[-1] != 10:
+        data = np.append(data, np.uint8(10))
+
+    newline = data == 10
+    ends = np.flatnonzero(newline)
+    count = len(ends)
+    if count == 0:
+        return np.zeros(0, dtype=np.int32)
+
+    # fast path for buffers of plain numbers only, the text parser of numpy
+    # also splits at other whitespace, skips empty lines and stops at
+    # anything which is not a number
+    plain = ((data >= 48) & (data <= 57)) | (data == 45) | newline
+    values = None
+    if plain.all() and ends[0] > 0 and (np.diff(ends) > 1).all():
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                values = np.fromstring(data.tobytes(), dtype=np.int64,
+                                       sep='\n')
+        except (ValueError, DeprecationWarning):
+            pass
+
+    if values is not None and len(values) == count and \
+            (values >= _INT32_MIN).all() and (values <= _INT32_MAX).all():
+        return values.astype(np.int32)
+
+    return _parse_masked(np, data, newline, ends, invalid)
+
+
+def _parse_masked(np, data, newline, ends, invalid):
+    # digit by digit parser which marks invalid responses
+    count = len(ends)
+
+    starts = np.empty(count, dtype=np.intp)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+
+    # ignore carriage returns before newlines
+    line_ends = ends.copy()
+    has_cr = (ends > starts) & (data[ends - 1] == 13)
+    line_ends[has_cr] -= 1
+
+    # line number and position from the end of the line of every byte
+    line = np.cumsum(newline) - newline
+    position = line_ends[line] - np.arange(len(data)) - 1
+
+    negative = data[starts] == 45
+    first = starts + negative
+    digit = (data >= 48) & (data <= 57)
+
+    # a byte is part of the number if it lies between the sign and the line
+    # end, every such byte needs to be a digit
+    in_number = (np.arange(len(data)) >= first[line]) & (position >= 0)
+    wrong = np.bincount(line[in_number & ~digit], minlength=count)
+    digits = line_ends - first
+    valid = (wrong == 0) & (digits > 0) & (digits <= 10)
+
+    use = in_number & digit & valid[line]
+    powers = np.int64(10) ** np.arange(10, dtype=np.int64)
+    weights = (data[use].astype(np.int64) - 48) * powers[position[use]]
+
+    # sums of at most 10 digits are exact in float64
+    values = np.bincount(line[use], weights=weights, minlength=count)
+    values = np.rint(values).astype(np.int64)
+    values[negative] *= -1
+
+    valid &= (values >= _INT32_MIN) & (values <= _INT32_MAX)
+
+    if not valid.all():
+        if invalid is None:
+            idx = int(np.flatnonzero(~valid)[0])
+            response = bytes(data[starts[idx]:ends[idx]])
+            raise ValueError('invalid response {!r} at index {}'.format(
+                response, idx))
+
+        values[~valid] = invalid
+
+    return values.astype(np.int32)
+
+
+def from_raw(raw, name):
+    """
+    Scale raw values of a setting.
+
+    Args:
+        raw (array_like): Raw values as returned by the device
+        name (string): Property name, e. g. 'temp'
+
+    Returns:
+        numpy.ndarray: Values (float64, int64 for settings without scaling)
+    """
+    np = _numpy()
+    setting = settings.get(name)
+
+    if setting.scale is None:
+        return np.asarray(raw, dtype=np.int64)
+
+    return np.asarray(raw, dtype=np.float64) / setting.scale
+
+
+def from_raw_columns(raw, names):
+    """
+    Scale the columns of a table of raw values at once, e. g. the responses
+    of many pipelined batches reshaped to one row per batch.
+
+    Args:
+        raw (array_like): Raw values, one column per setting
+        names (list): Property names of the columns
+
+    Returns:
+        numpy.ndarray: Values (float64)
+    """
+    np = _numpy()
+
+    scales = np.array([settings.get(name).scale or 1 for name in names],
+                      dtype=np.float64)
+
+    return np.asarray(raw, dtype=np.float64) / scales
+
+
+def to_raw(values, name):
+    """
+    Validate values of a setting against its range and quantize them with
+    the same rounding as the setters, e. g. before uploading a schedule.
+
+    Args:
+        values (array_like): Values
+        name (string): Property name, e. g. 'temp_setpoint'
+
+    Returns:
+        numpy.ndarray: Raw values (int32)
+
+    Raises:
+        ValueError: If the setting is read-only or any value is not finite
+            or out of range
+    """
+    np = _numpy()
+    setting = settings.get(name)
+
+    if not setting.writable:
+        raise ValueError('{} cannot be written'.format(setting.label))
+
+    values = np.asarray(values, dtype=np.float64)
+
+    bad = ~np.isfinite(values)
+    if bad.any():
+        raise ValueError('{} must be finite (index {})'.format(
+            setting.label, int(np.flatnonzero(bad.ravel())[0])))
+
+    # integer settings are truncated before the range check
+    if setting.scale is None:
+        values = np.trunc(values)
+
+    min_val, max_val = setting.value_range
+    for bad, message in ((values < min_val, '>= {}'.format(min_val)),
+                         (values > max_val, '<= {}'.format(max_val))):
+        if bad.any():
+            raise ValueError('{} must be {}{} ({} values, first at index '
+                             '{})'.format(setting.label, message,
+                                          setting.range_unit, int(bad.sum()),
+                                          int(np.flatnonzero(bad.ravel())[0])))
+
+    if setting.scale is None:
+        return values.astype(np.int32)
+
+    # numpy.rint rounds half to even like round
+    return np.rint(values * setting.scale).astype(np.int32)